@@ -6,11 +6,11 @@ from .models import AuctionListing, Comments, Bid, Category
 
 @admin.register(AuctionListing)
 class AuctionListingAdmin(admin.ModelAdmin):
-    list_display = ('title', 'seller', 'starting_bid', 'current_price', 'is_active', 'category')  
+    list_display = ('title', 'seller', 'starting_bid', 'current_price', 'bid_count', 'is_active', 'category')  
     search_fields = ('title', 'seller__username', 'category__category_name') 
     list_filter = ('is_active', 'category', 'seller')
     ordering = ('-id',)
-    readonly_fields = ('current_price',) 
+    readonly_fields = ('current_price', 'highest_bid', 'bid_count') 
 
 @admin.register(Comments)
 class CommentsAdmin(admin.ModelAdmin):
@@ -27,6 +27,10 @@ class BidAdmin(admin.ModelAdmin):
     list_filter = ('bidder', 'listing') 
     ordering = ('-id',)  
 
+    def has_change_permission(self, request, obj=None):
+        # Bids are append-only; see auctions.ledger
+        return False
+
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
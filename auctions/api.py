@@ -0,0 +1,256 @@
+"""JSON API for listings, bids, comments, categories and watchlists.
+
+Reads go through field-limited ``.values()`` queries and never build model
+instances. Collections are paged with the same ``?before=<id>`` cursors as the
+HTML feed, and bid histories, which can grow without bound, are streamed.
+Listing detail responses carry an ``ETag`` built from the listing's cache
+version stamp and a ``Last-Modified`` from ``updated_at``, so a client that
+already has the current copy gets a 304 before anything is serialized.
+
+Writes use the same services as the HTML views (``auctions.bidding`` and the
+import validation in ``auctions.transfer``). They take JSON bodies, need a
+logged-in session and, like every other POST on the site, a CSRF token.
+"""
+
+import json
+from functools import wraps
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import condition, require_GET, require_http_methods
+
+from . import bidding, caching, directory, ledger, transfer
+from .models import AuctionListing, Bid, Comments
+from .pagination import keyset_page, parse_cursor, timeline_page
+from .ratelimit import rate_limit
+
+PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+# Rows fetched per query while streaming a collection
+STREAM_CHUNK_SIZE = 500
+
+LISTING_FIELDS = (
+    "id", "title", "description", "starting_bid", "current_price", "bid_count",
+    "watcher_count", "image_url", "category_id", "seller__username", "is_active", "end_time",
+)
+
+
+def error(message, status=400):
+    return JsonResponse({"error": message}, status=status)
+
+
+def api_login_required(view):
+    # login_required redirects to the login page, which a JSON client can't use
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return error("Authentication required.", status=401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def json_body(request):
+    try:
+        body = json.loads(request.body or b"{}")
+    except ValueError:
+        return None
+    return body if isinstance(body, dict) else None
+
+
+def page_size(request):
+    try:
+        return min(max(int(request.GET.get("limit", PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        return PAGE_SIZE
+
+
+def next_url(request, url, next_cursor):
+    """``url`` with the request's filters and page size, moved on to ``?before=next_cursor``."""
+    if not next_cursor:
+        return None
+    query = request.GET.copy()
+    query["before"] = next_cursor
+    return f"{url}?{query.urlencode()}"
+
+
+def page(request, queryset, url):
+    """One cursor page of a ``.values()`` queryset with a link to the next."""
+    rows, next_cursor = keyset_page(queryset, parse_cursor(request.GET.get("before")), page_size(request))
+    return rows, next_url(request, url, next_cursor)
+
+
+def stream_json(key, rows):
+    """Stream ``{"<key>": [rows...]}`` without holding the rows in memory."""
+    encoder = DjangoJSONEncoder()
+    yield f'{{"{key}": ['
+    for n, row in enumerate(rows):
+        yield ("," if n else "") + encoder.encode(row)
+    yield "]}"
+
+
+def listing_row(row):
+    row["seller"] = row.pop("seller__username")
+    row["url"] = reverse("api_listing", args=(row["id"],))
+    return row
+
+
+@require_http_methods(["GET", "POST"])
+def listings(request):
+    if request.method == "POST":
+        return create_listing(request)
+
+    queryset = AuctionListing.objects.values(*LISTING_FIELDS)
+    if request.GET.get("status") != "all":
+        queryset = queryset.filter(is_active=True)
+    category_id = parse_cursor(request.GET.get("category"))
+    if category_id is not None:
+        queryset = queryset.filter(category_id=category_id)
+    rows, next_url = page(request, queryset, reverse("api_listings"))
+    return JsonResponse({"listings": [listing_row(row) for row in rows], "next": next_url})
+
+
+@api_login_required
+def create_listing(request):
+    body = json_body(request)
+    if body is None:
+        return error("Expected a JSON object.")
+    try:
+        listing, category_name = transfer.listing_from_row(body, request.user, timezone.now())
+    except transfer.RowError as exception:
+        return error(str(exception))
+    category = directory.find_category(category_name=category_name)
+    if category is None:
+        return error("Category does not exist.")
+    listing.category_id = category["id"]
+    listing.save()
+    return JsonResponse({"id": listing.id, "url": reverse("api_listing", args=(listing.id,))}, status=201)
+
+
+def listing_etag(request, listing_id):
+    # Bumped by every write to the listing, its bids and its comments
+    return f'W/"{listing_id}-{caching.listing_version(listing_id)}"'
+
+
+def listing_last_modified(request, listing_id):
+    return AuctionListing.objects.filter(pk=listing_id).values_list("updated_at", flat=True).first()
+
+
+@require_GET
+@condition(etag_func=listing_etag, last_modified_func=listing_last_modified)
+def listing(request, listing_id):
+    row = AuctionListing.objects.filter(pk=listing_id).values(*LISTING_FIELDS).first()
+    if row is None:
+        return error("No such listing.", status=404)
+    row = listing_row(row)
+    row["bids_url"] = reverse("api_listing_bids", args=(listing_id,))
+    row["comments_url"] = reverse("api_listing_comments", args=(listing_id,))
+    row["history_url"] = reverse("api_listing_history", args=(listing_id,))
+    return JsonResponse(row)
+
+
+@require_http_methods(["GET", "POST"])
+@rate_limit("bids", json=True)
+def listing_bids(request, listing_id):
+    if request.method == "POST":
+        return place_bid(request, listing_id)
+    if not AuctionListing.objects.filter(pk=listing_id).exists():
+        return error("No such listing.", status=404)
+
+    # Highest first; every accepted bid beat the one before, so this is also newest first
+    rows = (
+        Bid.objects.filter(listing_id=listing_id).order_by("-id")
+        .values("id", "bid_amount", "bidder__username")
+        .iterator(chunk_size=STREAM_CHUNK_SIZE)
+    )
+    return StreamingHttpResponse(
+        stream_json("bids", ({"id": row["id"], "amount": row["bid_amount"], "bidder": row["bidder__username"]}
+                             for row in rows)),
+        content_type="application/json",
+    )
+
+
+@require_GET
+def listing_history(request, listing_id):
+    # Chart data from the bid rollups; ?since=<ISO date> limits it to recent buckets
+    since = parse_datetime(request.GET["since"]) if request.GET.get("since") else None
+    if since is not None and timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    buckets = ledger.price_history(listing_id, since)
+    if not buckets and not AuctionListing.objects.filter(pk=listing_id).exists():
+        return error("No such listing.", status=404)
+    return JsonResponse({"bucket_seconds": ledger.bucket_seconds(), "buckets": buckets})
+
+
+@api_login_required
+def place_bid(request, listing_id):
+    body = json_body(request)
+    if body is None:
+        return error("Expected a JSON object.")
+    try:
+        amount = bidding.parse_bid_amount(str(body.get("amount") or ""))
+    except bidding.BidError as exception:
+        return error(str(exception))
+    try:
+        bid = bidding.place_bid(listing_id, request.user, amount)
+    except bidding.BidError as exception:
+        # Outbid or closed
+        return error(str(exception), status=409 if AuctionListing.objects.filter(pk=listing_id).exists() else 404)
+    return JsonResponse({"id": bid.id, "amount": bid.bid_amount}, status=201)
+
+
+@require_http_methods(["GET", "POST"])
+@rate_limit("comments", json=True)
+def listing_comments(request, listing_id):
+    if request.method == "POST":
+        return add_comment(request, listing_id)
+    # Newest first, like the listing page
+    queryset = Comments.objects.filter(listing_id=listing_id).values("id", "message", "author__username", "created_at")
+    rows, next_cursor = timeline_page(queryset, parse_cursor(request.GET.get("before")), page_size(request))
+    url = reverse("api_listing_comments", args=(listing_id,))
+    return JsonResponse({
+        "comments": [{"id": row["id"], "message": row["message"], "author": row["author__username"],
+                      "created_at": row["created_at"]}
+                     for row in rows],
+        "next": next_url(request, url, next_cursor),
+    })
+
+
+@api_login_required
+def add_comment(request, listing_id):
+    body = json_body(request)
+    message = (body or {}).get("message")
+    if not isinstance(message, str) or not message.strip():
+        return error("A non-empty message is required.")
+    if not AuctionListing.objects.filter(pk=listing_id).exists():
+        return error("No such listing.", status=404)
+    comment = Comments.objects.create(listing_id=listing_id, author=request.user, message=message.strip())
+    return JsonResponse({"id": comment.id}, status=201)
+
+
+@require_GET
+def categories(request):
+    return JsonResponse({"categories": directory.category_directory()})
+
+
+@require_GET
+@api_login_required
+def watchlist(request):
+    queryset = request.user.listing_watchlist.values(*LISTING_FIELDS)
+    rows, next_url = page(request, queryset, reverse("api_watchlist"))
+    return JsonResponse({"listings": [listing_row(row) for row in rows], "next": next_url})
+
+
+@require_http_methods(["PUT", "DELETE"])
+@rate_limit("watchlist", methods=("PUT", "DELETE"), json=True)
+@api_login_required
+def watchlist_item(request, listing_id):
+    if not AuctionListing.objects.filter(pk=listing_id).exists():
+        return error("No such listing.", status=404)
+    if request.method == "PUT":
+        request.user.listing_watchlist.add(listing_id)
+    else:
+        request.user.listing_watchlist.remove(listing_id)
+    return JsonResponse({"listing_id": listing_id, "watching": request.method == "PUT"})
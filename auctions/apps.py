@@ -1,5 +1,15 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
 
 
 class AuctionsConfig(AppConfig):
     name = 'auctions'
+
+    def ready(self):
+        # Connects the cache invalidation receivers
+        from . import signals
+        post_migrate.connect(signals.install_search_index, sender=self)
+
+        from commerce.database import configure_connection
+        connection_created.connect(configure_connection, dispatch_uid="commerce.database")
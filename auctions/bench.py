@@ -0,0 +1,367 @@
+"""Helpers shared by the benchmark management commands and stress tests."""
+
+import asyncio
+import itertools
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, connections
+from django.db.models import Max, OuterRef, Subquery
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from . import bidding, ledger, watchlists
+from .models import AuctionListing, Bid, Category, Comments, User
+
+BENCH_PASSWORD = "benchmark"
+
+
+@contextmanager
+def scratch_database():
+    """Run the block against a freshly migrated throwaway database.
+
+    SQLite gets a real file rather than the test runner's in-memory database so
+    that locking behaves the way it does in production.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        test_settings = connection.settings_dict.setdefault("TEST", {})
+        old_test_name = test_settings.get("NAME")
+        if connection.vendor == "sqlite":
+            test_settings["NAME"] = os.path.join(directory, "bench.sqlite3")
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            test_settings["NAME"] = old_test_name
+
+
+def run_bid_stress(listing_id, bidders, bids_per_bidder, step=Decimal("0.01")):
+    """Have every bidder fire ``bids_per_bidder`` bids at one listing at once.
+
+    Bidder ``i`` of ``n`` bids ``(k * n + i + 1) * step`` on its ``k``-th try, so
+    every amount is distinct and the highest possible price is known up front.
+    Returns counters plus the wall time and accepted bids per second.
+    """
+    accepted = []
+    rejected = []
+    errors = []
+    lock = threading.Lock()
+    start = threading.Barrier(len(bidders))
+
+    def bid(index, bidder):
+        start.wait()
+        try:
+            for k in range(bids_per_bidder):
+                amount = (k * len(bidders) + index + 1) * step
+                try:
+                    bidding.place_bid(listing_id, bidder, amount)
+                except bidding.BidError:
+                    with lock:
+                        rejected.append(amount)
+                else:
+                    with lock:
+                        accepted.append(amount)
+        except Exception as error:
+            with lock:
+                errors.append(error)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=bid, args=(i, bidder)) for i, bidder in enumerate(bidders)]
+    began = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+
+    attempts = len(bidders) * bids_per_bidder
+    return {
+        "attempts": attempts,
+        "accepted": len(accepted),
+        "rejected": len(rejected),
+        "errors": errors,
+        "highest_amount": attempts * step,
+        "seconds": elapsed,
+        "bids_per_second": len(accepted) / elapsed if elapsed else 0.0,
+    }
+
+
+def seed(users=100, listings=1000, bids=5, comments=5, watchers=3, categories=10, seed=0, chunk=5000):
+    """Fill the database with a reproducible marketplace.
+
+    ``bids``, ``comments`` and ``watchers`` are per listing. Everything is
+    written with ``bulk_create`` and the denormalised bid columns are filled
+    in afterwards, so seeding a million rows takes seconds rather than hours.
+    Every user's password is ``BENCH_PASSWORD``.
+    """
+    rng = random.Random(seed)
+    password = make_password(BENCH_PASSWORD)
+    User.objects.bulk_create(
+        [User(username=f"bench{i}", email=f"bench{i}@example.com", password=password) for i in range(users)],
+        batch_size=chunk,
+    )
+    user_ids = list(User.objects.filter(username__startswith="bench").values_list("id", flat=True))
+    Category.objects.bulk_create([Category(category_name=f"Category {i}") for i in range(categories)])
+    category_ids = list(Category.objects.values_list("id", flat=True))
+
+    AuctionListing.objects.bulk_create(
+        (
+            AuctionListing(
+                title=f"Listing {i}",
+                description=f"Benchmark listing number {i}",
+                starting_bid=Decimal(rng.randint(1, 100)),
+                seller_id=rng.choice(user_ids),
+                category_id=rng.choice(category_ids),
+            )
+            for i in range(listings)
+        ),
+        batch_size=chunk,
+    )
+    listing_ids = list(AuctionListing.objects.values_list("id", flat=True))
+
+    def rows(make):
+        # Generate rows lazily and hand them to bulk_create in fixed-size chunks
+        iterator = (row for listing_id in listing_ids for row in make(listing_id))
+        while batch := list(itertools.islice(iterator, chunk)):
+            yield batch
+
+    for batch in rows(lambda listing_id: (
+        Bid(listing_id=listing_id, bidder_id=rng.choice(user_ids), bid_amount=Decimal(200 + n))
+        for n in range(bids)
+    )):
+        Bid.objects.bulk_create(batch)
+    for batch in rows(lambda listing_id: (
+        Comments(listing_id=listing_id, author_id=rng.choice(user_ids), message=f"Comment {n}")
+        for n in range(comments)
+    )):
+        Comments.objects.bulk_create(batch)
+    Watch = AuctionListing.watchlist.through
+    for batch in rows(lambda listing_id: (
+        Watch(auctionlisting_id=listing_id, user_id=user_id)
+        for user_id in rng.sample(user_ids, min(watchers, len(user_ids)))
+    )):
+        Watch.objects.bulk_create(batch)
+    # bulk_create skips the signal that maintains the watcher counts
+    watchlists.recount_watchers(AuctionListing.objects.all())
+
+    ledger.rollup_bids(Bid.objects.all())
+    bidding.repair_bid_stats(AuctionListing.objects.all())
+    AuctionListing.objects.filter(bid_count__gt=0).update(current_price=Subquery(
+        Bid.objects.filter(listing=OuterRef("pk")).values("listing").annotate(top=Max("bid_amount")).values("top")
+    ))
+    return {"users": user_ids, "listings": listing_ids, "categories": category_ids}
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, query_counts, statuses):
+    latencies = sorted(latencies)
+    total = sum(latencies)
+    return {
+        "requests": len(latencies),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "mean_ms": round(total / len(latencies) * 1000, 3),
+        "requests_per_second": round(len(latencies) / total, 1) if total else None,
+        "queries_mean": round(sum(query_counts) / len(query_counts), 2),
+        "queries_max": max(query_counts),
+        "statuses": {str(status): statuses.count(status) for status in sorted(set(statuses))},
+    }
+
+
+def default_routes(data, rng):
+    """Requests for each benchmarked route, as ``name -> callable(client)``.
+
+    Listings, categories and bid amounts are picked from ``data`` (as returned
+    by ``seed``); bids only ever go up, so each one is accepted.
+    """
+    amounts = itertools.count(10_000)
+
+    def listing_id():
+        return rng.choice(data["listings"])
+
+    return {
+        "index": lambda client: client.get(reverse("index")),
+        "listing": lambda client: client.get(reverse("listing", args=(listing_id(),))),
+        "place_bid": lambda client: client.post(
+            reverse("place_bid", args=(listing_id(),)), {"bid": str(next(amounts))}
+        ),
+        "watchlist": lambda client: client.get(reverse("watchlist")),
+        "categories": lambda client: client.get(reverse("categories")),
+        "category_listings": lambda client: client.get(
+            reverse("category_listings", args=(rng.choice(data["categories"]),))
+        ),
+    }
+
+
+def run_routes(routes, requests=200, warmup=10, user=None):
+    """Drive every route through the Django test client and summarise it.
+
+    Each route gets ``warmup`` untimed requests (to fill caches the way a
+    running site would have them) and then ``requests`` timed ones. Returns
+    ``route name -> summary`` with latency percentiles, requests per second
+    and SQL queries per request. Rate limits are off, as one client posting
+    hundreds of bids would otherwise be measuring 429s.
+    """
+    client = Client()
+    if user is not None:
+        client.force_login(user)
+
+    results = {}
+    with override_settings(AUCTIONS_RATE_LIMITS={}):
+        for name, request in routes.items():
+            for _ in range(warmup):
+                request(client)
+            latencies, query_counts, statuses = [], [], []
+            for _ in range(requests):
+                with CaptureQueriesContext(connection) as queries:
+                    began = time.perf_counter()
+                    response = request(client)
+                    latencies.append(time.perf_counter() - began)
+                query_counts.append(len(queries))
+                statuses.append(response.status_code)
+            results[name] = summarize(latencies, query_counts, statuses)
+    return results
+
+
+def read_paths(data, rng, count):
+    """``count`` GET paths spread over the pages served by async views."""
+    routes = [
+        lambda: reverse("index"),
+        lambda: reverse("listing", args=(rng.choice(data["listings"]),)),
+        lambda: reverse("watchlist"),
+        lambda: reverse("categories"),
+        lambda: reverse("category_listings", args=(rng.choice(data["categories"]),)),
+    ]
+    return [rng.choice(routes)() for _ in range(count)]
+
+
+def run_wsgi(application, paths, concurrency, cookie=""):
+    """Serve ``paths`` through a WSGI application from ``concurrency`` threads.
+
+    This is what a threaded WSGI server does: every in-flight request holds a
+    thread until its response is built. Returns latencies, statuses and the
+    wall time for the whole run.
+    """
+    factory = RequestFactory()
+    pending = iter(paths)
+    latencies, statuses = [], []
+    lock = threading.Lock()
+
+    def worker():
+        try:
+            while True:
+                with lock:
+                    path = next(pending, None)
+                if path is None:
+                    return
+                status = []
+                began = time.perf_counter()
+                body = application(
+                    factory.get(path, HTTP_COOKIE=cookie).environ,
+                    lambda line, headers, exc_info=None: status.append(int(line.split()[0])),
+                )
+                try:
+                    for _ in body:
+                        pass
+                finally:
+                    body.close()
+                elapsed = time.perf_counter() - began
+                with lock:
+                    latencies.append(elapsed)
+                    statuses.append(status[0])
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    began = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses, time.perf_counter() - began
+
+
+def run_asgi(application, paths, concurrency, cookie=""):
+    """Serve ``paths`` through an ASGI application with ``concurrency`` requests in flight.
+
+    Requests are driven straight through the ASGI protocol on one event loop,
+    the way an ASGI server would, without any network in between.
+    """
+    pending = iter(paths)
+    latencies, statuses = [], []
+
+    async def request(path):
+        status = []
+        finished = asyncio.Event()
+        messages = [{"type": "http.request", "body": b"", "more_body": False}]
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await finished.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+            elif not message.get("more_body"):
+                finished.set()
+
+        await application({
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"host", b"testserver"), (b"cookie", cookie.encode())],
+            "client": ("127.0.0.1", 0),
+            "server": ("testserver", 80),
+        }, receive, send)
+        return status[0]
+
+    async def worker():
+        for path in pending:
+            began = time.perf_counter()
+            statuses.append(await request(path))
+            latencies.append(time.perf_counter() - began)
+
+    async def main():
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    began = time.perf_counter()
+    asyncio.run(main())
+    return latencies, statuses, time.perf_counter() - began
+
+
+def summarize_throughput(latencies, statuses, seconds):
+    """Like ``summarize`` but for concurrent runs, where throughput comes from wall time."""
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "requests_per_second": round(len(latencies) / seconds, 1) if seconds else None,
+        "statuses": {str(status): statuses.count(status) for status in sorted(set(statuses))},
+    }
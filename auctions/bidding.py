@@ -0,0 +1,167 @@
+"""Bid placement.
+
+The old view read ``current_price``, compared it in Python and saved the whole
+listing back, so two bidders arriving together could both pass the check and
+the lower bid could overwrite the higher price. Here the comparison is part of
+the ``UPDATE`` statement itself, so the database decides who wins and only the
+columns that actually changed are written.
+"""
+
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Max, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import ledger, notifications
+from .events import publish_listing_event
+from .models import AuctionListing, Bid, BidRollup, UserBidState
+
+CENTS = Decimal("0.01")
+
+
+def amount_limit(model, field_name):
+    """The smallest amount too large for a ``DecimalField``'s integer digits."""
+    field = model._meta.get_field(field_name)
+    return Decimal(10) ** (field.max_digits - field.decimal_places)
+
+
+class BidError(Exception):
+    """A bid was rejected. The message is safe to show to the bidder."""
+
+
+def parse_bid_amount(value):
+    """Turn the submitted form value into a two-place ``Decimal``."""
+    if not value:
+        raise BidError("Please enter a bid amount.")
+    try:
+        amount = Decimal(value)
+    except InvalidOperation:
+        raise BidError("Enter a valid number.")
+    limit = amount_limit(Bid, "bid_amount")
+    if not amount.is_finite() or abs(amount) >= limit:
+        raise BidError("Enter a valid number.")
+    amount = amount.quantize(CENTS)
+    # Rounding can carry 99999999.999 up to the limit
+    if abs(amount) >= limit:
+        raise BidError("Enter a valid number.")
+    return amount
+
+
+def soft_close(now):
+    """The ``end_time`` to write for a bid placed at ``now``.
+
+    With ``AUCTIONS_SOFT_CLOSE_SECONDS`` set, a bid within that many seconds
+    of the end pushes the end back to ``AUCTIONS_SOFT_CLOSE_EXTENSION``
+    seconds after the bid, so sniping in the final second just prolongs the
+    auction. Auctions without an end time are left alone.
+    """
+    window = getattr(settings, "AUCTIONS_SOFT_CLOSE_SECONDS", 0)
+    if not window:
+        return F("end_time")
+    extended = now + timedelta(seconds=getattr(settings, "AUCTIONS_SOFT_CLOSE_EXTENSION", window))
+    # Never moves the end earlier, whatever the two settings are
+    return Case(
+        When(end_time__lt=min(now + timedelta(seconds=window), extended), then=Value(extended)),
+        default=F("end_time"),
+    )
+
+
+def place_bid(listing_id, bidder, amount):
+    """Record ``amount`` as the new price of the listing if it beats the current one.
+
+    Returns the saved ``Bid`` or raises ``BidError``.
+    """
+    amount = Decimal(amount).quantize(CENTS)
+    with transaction.atomic():
+        # The price check and the write are one statement: concurrent bids are
+        # applied one at a time and a lower bid no longer matches once a higher
+        # one has gone in.
+        now = timezone.now()
+        open_for_bids = Q(is_active=True) & (Q(end_time__isnull=True) | Q(end_time__gt=now))
+        updated = AuctionListing.objects.filter(open_for_bids, pk=listing_id).filter(
+            Q(current_price__lt=amount) | Q(current_price__isnull=True, starting_bid__lt=amount)
+        ).update(current_price=amount, bid_count=F("bid_count") + 1, updated_at=now, end_time=soft_close(now))
+
+        if not updated:
+            if AuctionListing.objects.filter(pk=listing_id).exclude(open_for_bids).exists():
+                raise BidError("This listing is closed.")
+            raise BidError("Bid must be higher than the current price.")
+
+        bid = Bid.objects.create(listing_id=listing_id, bidder=bidder, bid_amount=amount, created_at=now)
+        ledger.record_bid(listing_id, amount, now)
+        # Only bids that beat the price get this far, so the new bid is the highest
+        AuctionListing.objects.filter(pk=listing_id).update(highest_bid=bid)
+        # ...and its bidder now leads, with this as their highest bid
+        leading = UserBidState.objects.filter(listing_id=listing_id, is_leading=True)
+        previous_leader_id = leading.values_list("user_id", flat=True).first()
+        leading.update(is_leading=False)
+        UserBidState.objects.bulk_create(
+            [UserBidState(listing_id=listing_id, user=bidder, max_bid=amount, is_leading=True)],
+            update_conflicts=True,
+            unique_fields=["user", "listing"],
+            update_fields=["max_bid", "is_leading"],
+        )
+
+        notifications.bid_placed(listing_id, bidder, amount, previous_leader_id)
+
+        bid_count, end_time = AuctionListing.objects.values_list("bid_count", "end_time").get(pk=listing_id)
+        event = {"type": "bid", "price": str(amount), "bid_count": bid_count}
+        if end_time is not None:
+            # Soft close may just have moved it
+            event["end_time"] = end_time.isoformat()
+        publish_listing_event(listing_id, event)
+        return bid
+
+
+def repair_bid_stats(listings):
+    """Recompute ``highest_bid`` and ``bid_count`` for ``listings``.
+
+    Runs as a single ``UPDATE`` with correlated subqueries, which the
+    ``(listing, -bid_amount)`` index answers without sorting. The count comes
+    from the rollups, which still include bids that ``compact_bids`` removed.
+    Returns the number of listings updated.
+    """
+    bids = Bid.objects.filter(listing=OuterRef("pk"))
+    rollups = BidRollup.objects.filter(listing=OuterRef("pk")).values("listing")
+    return listings.update(
+        highest_bid=Subquery(bids.order_by("-bid_amount", "id").values("id")[:1]),
+        bid_count=Coalesce(Subquery(rollups.annotate(n=Sum("bids")).values("n")), 0),
+    )
+
+
+def rebuild_user_bid_states(batch_size=5000):
+    """Recompute every ``UserBidState`` row from the bids.
+
+    One grouped query yields each user's highest bid per listing and whether
+    it is the listing's ``highest_bid``; the rows replace the table in
+    ``bulk_create`` batches inside one transaction. Returns the row count.
+    """
+    states = (
+        Bid.objects.values("listing_id", "bidder_id")
+        .annotate(
+            max_bid=Max("bid_amount"),
+            is_leading=Max(Case(When(listing__highest_bid=F("id"), then=1), default=0)),
+        )
+        .order_by()
+        .iterator(chunk_size=batch_size)
+    )
+    created = 0
+    with transaction.atomic():
+        UserBidState.objects.all().delete()
+        batch = []
+        for state in states:
+            batch.append(UserBidState(
+                listing_id=state["listing_id"],
+                user_id=state["bidder_id"],
+                max_bid=state["max_bid"],
+                is_leading=bool(state["is_leading"]),
+            ))
+            if len(batch) == batch_size:
+                created += len(UserBidState.objects.bulk_create(batch))
+                batch = []
+        created += len(UserBidState.objects.bulk_create(batch))
+    return created
@@ -0,0 +1,210 @@
+"""Browsing listings: filters, sort orders and facet counts.
+
+The index and category pages filter by category, price range and status and
+sort by newest, price or number of bids. Each sort order has a partial index
+over active listings, site-wide and per category, ending with the sort key and
+id (see ``AuctionListing.Meta``), so a page is a range scan of one index. The
+price sorted and filtered on is ``AuctionListing.price``, a generated column,
+as an expression would have to match the index's exactly. Pages are keyset
+paginated like the rest of the site: the cursor is the id of the last listing
+shown, and the next page starts after that listing's sort key.
+
+Facet counts (listings per category, listings per price band) come from one
+query grouped by category. Each facet ignores its own filter, so the category
+counts say how many listings each category has in the chosen price range and
+the band counts how many the chosen category has in each band. That query
+reads every listing with the chosen status, so its rows are cached for
+``AUCTIONS_FACET_TIMEOUT`` seconds; they do not depend on the category, so
+every category page shares them.
+
+Closed listings are not indexed this way; browsing them falls back to the
+category index and a sort.
+"""
+
+from decimal import Decimal, InvalidOperation
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Subquery, Value
+from django.db.models.functions import Greatest, Least
+
+from . import directory
+from .models import AuctionListing
+from .pagination import parse_cursor
+
+# name -> (label, field, descending); every sort breaks ties by id the same way
+SORTS = {
+    "newest": ("Newest", "id", True),
+    "price": ("Price: low to high", "price", False),
+    "-price": ("Price: high to low", "price", True),
+    "bids": ("Most bids", "bid_count", True),
+}
+
+STATUSES = {
+    "active": ("Active", True),
+    "closed": ("Closed", False),
+    "all": ("All", None),
+}
+
+# Where one price band facet ends and the next begins; the last is open-ended
+PRICE_BANDS = (Decimal(10), Decimal(50), Decimal(100), Decimal(500))
+
+CENT = Decimal("0.01")
+
+DEFAULTS = {"sort": "newest", "status": "active", "min_price": None, "max_price": None}
+
+
+def parse_price(value):
+    try:
+        price = Decimal(value)
+    except (TypeError, ValueError, InvalidOperation):
+        return None
+    return price if price.is_finite() and price >= 0 else None
+
+
+def browse_params(query, category_id=None):
+    """Read the filters and sort order from a query string, ignoring junk.
+
+    ``category_id`` comes from the URL on category pages and from
+    ``?category=`` elsewhere.
+    """
+    sort = query.get("sort")
+    status = query.get("status")
+    return {
+        "category_id": category_id if category_id is not None else parse_cursor(query.get("category")),
+        "category_in_url": category_id is not None,
+        "min_price": parse_price(query.get("min_price")),
+        "max_price": parse_price(query.get("max_price")),
+        "status": status if status in STATUSES else DEFAULTS["status"],
+        "sort": sort if sort in SORTS else DEFAULTS["sort"],
+    }
+
+
+def query_string(params, **extra):
+    """The query string for ``params`` plus ``extra``, leaving out defaults.
+
+    The category is left out on category pages, where it is part of the URL.
+    """
+    values = {name: params[name] for name in DEFAULTS if params[name] not in (None, DEFAULTS[name])}
+    if params["category_id"] is not None and not params["category_in_url"]:
+        values["category"] = params["category_id"]
+    values.update((name, value) for name, value in extra.items() if value is not None)
+    return urlencode(values)
+
+
+def _price_range(min_price, max_price):
+    q = Q()
+    if min_price is not None:
+        q &= Q(price__gte=min_price)
+    if max_price is not None:
+        q &= Q(price__lte=max_price)
+    return q
+
+
+def _band_label(low, high):
+    if low is None:
+        return f"Under £{high + CENT}"
+    return f"£{low}+" if high is None else f"£{low}–£{high}"
+
+
+def _bands():
+    """``(min_price, max_price, Q)`` per band, with the same inclusive bounds as the price filter."""
+    lows = (None,) + PRICE_BANDS
+    highs = tuple(bound - CENT for bound in PRICE_BANDS) + (None,)
+    return [(low, high, _price_range(low, high)) for low, high in zip(lows, highs)]
+
+
+def _status(queryset, status):
+    is_active = STATUSES[status][1]
+    return queryset if is_active is None else queryset.filter(is_active=is_active)
+
+
+def listings(params, before=None):
+    """The listings matching ``params`` in its sort order, after listing ``before``.
+
+    Page it with ``pagination.ordered_page()``.
+    """
+    _, field, descending = SORTS[params["sort"]]
+    queryset = _status(AuctionListing.objects.all(), params["status"])
+    if params["category_id"] is not None:
+        queryset = queryset.filter(category_id=params["category_id"])
+    min_price, max_price = params["min_price"], params["max_price"]
+
+    if before is not None and field == "id":
+        queryset = queryset.filter(id__lt=before)
+    elif before is not None:
+        # As in pagination._older_than, the cursor row's key comes from a
+        # subquery so the page stays one query
+        key = Subquery(AuctionListing.objects.filter(pk=before).values(field)[:1])
+        bound = key
+        # An index range scan takes one lower and one upper bound, so a price
+        # limit on the same side as the cursor is folded into its bound
+        if field == "price" and descending and max_price is not None:
+            bound, max_price = Least(key, Value(max_price)), None
+        elif field == "price" and not descending and min_price is not None:
+            bound, min_price = Greatest(key, Value(min_price)), None
+        if descending:
+            queryset = queryset.filter(**{f"{field}__lte": bound}).exclude(**{field: key, "id__gte": before})
+        else:
+            queryset = queryset.filter(**{f"{field}__gte": bound}).exclude(**{field: key, "id__lte": before})
+
+    queryset = queryset.filter(_price_range(min_price, max_price))
+    return queryset.order_by(f"-{field}", "-id") if descending else queryset.order_by(field, "id")
+
+
+def _facet_query(params):
+    in_range = _price_range(params["min_price"], params["max_price"])
+    bands = {f"band{n}": Count("id", filter=q) for n, (_, _, q) in enumerate(_bands())}
+    return (
+        _status(AuctionListing.objects, params["status"])
+        .values("category_id").annotate(in_range=Count("id", filter=in_range), **bands).order_by()
+    )
+
+
+def _facets(rows, params):
+    counts = {row["category_id"]: row for row in rows}
+    categories = [
+        {**category, "count": counts[category["id"]]["in_range"] if category["id"] in counts else 0}
+        for category in directory.category_directory()
+    ]
+    chosen = [row for category_id, row in counts.items()
+              if params["category_id"] is None or category_id == params["category_id"]]
+    prices = [
+        {"min_price": low, "max_price": high, "label": _band_label(low, high),
+         "count": sum(row[f"band{n}"] for row in chosen),
+         "selected": (low, high) == (params["min_price"], params["max_price"]),
+         "query": query_string({**params, "min_price": low, "max_price": high})}
+        for n, (low, high, _) in enumerate(_bands())
+    ]
+    return {"categories": categories, "prices": prices}
+
+
+def _facet_key(params):
+    return f"auctions:facets:{params['status']}:{params['min_price']}:{params['max_price']}"
+
+
+def _facet_timeout():
+    return getattr(settings, "AUCTIONS_FACET_TIMEOUT", 60)
+
+
+def facet_counts(params):
+    """``{"categories": [...], "prices": [...]}`` for the filters in ``params``."""
+    key = _facet_key(params)
+    rows = cache.get(key)
+    if rows is None:
+        rows = list(_facet_query(params))
+        cache.set(key, rows, _facet_timeout())
+    return _facets(rows, params)
+
+
+async def afacet_counts(params):
+    """Async ``facet_counts()``."""
+    key = _facet_key(params)
+    rows = await cache.aget(key)
+    if rows is None:
+        rows = [row async for row in _facet_query(params)]
+        await cache.aset(key, rows, _facet_timeout())
+    # The category names come from the cached directory, which may query
+    return await sync_to_async(_facets)(rows, params)
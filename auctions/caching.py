@@ -0,0 +1,142 @@
+"""Per-listing object and fragment cache.
+
+Every cached value for a listing is keyed by the listing id and a version
+stamp. Writes never delete cached values; they bump the stamp (see
+``auctions.signals``) and the old entries simply stop being read and age out of
+the cache. Hit and miss counters are kept per cached object so the timeout and
+the cache size can be tuned from real traffic.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+# The cached objects whose hit/miss counters are reported by cache_stats()
+CACHED_OBJECTS = ("listing", "comments")
+
+
+def _version_key(listing_id):
+    return f"auctions:listing:{listing_id}:version"
+
+
+def _value_key(listing_id, version, name):
+    return f"auctions:listing:{listing_id}:{version}:{name}"
+
+
+def _stats_key(name, outcome):
+    return f"auctions:stats:{name}:{outcome}"
+
+
+def listing_version(listing_id):
+    """Return the current version stamp of a listing, creating one if needed."""
+    key = _version_key(listing_id)
+    version = cache.get(key)
+    if version is None:
+        # A fresh stamp can never match entries written under an evicted one
+        version = time.time_ns()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_listing_version(listing_id):
+    """Invalidate everything cached for a listing.
+
+    The stamp is bumped straight away and again once the surrounding
+    transaction commits, so a reader that cached the old rows while the write
+    was in flight cannot keep serving them.
+    """
+    key = _version_key(listing_id)
+    cache.set(key, time.time_ns(), None)
+    transaction.on_commit(lambda: cache.set(key, time.time_ns(), None))
+
+
+async def alisting_version(listing_id):
+    key = _version_key(listing_id)
+    version = await cache.aget(key)
+    if version is None:
+        version = time.time_ns()
+        if not await cache.aadd(key, version, None):
+            version = await cache.aget(key, version)
+    return version
+
+
+def _count(name, outcome):
+    key = _stats_key(name, outcome)
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # The counter was evicted between add() and incr()
+        cache.set(key, 1, None)
+
+
+async def _acount(name, outcome):
+    key = _stats_key(name, outcome)
+    await cache.aadd(key, 0, None)
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        await cache.aset(key, 1, None)
+
+
+def cached(listing_id, name, build):
+    """Return the ``name`` object of a listing, calling ``build()`` on a miss."""
+    key = _value_key(listing_id, listing_version(listing_id), name)
+    value = cache.get(key)
+    if value is not None:
+        _count(name, "hits")
+        return value
+
+    _count(name, "misses")
+    value = build()
+    cache.set(key, value, getattr(settings, "AUCTIONS_CACHE_TIMEOUT", 600))
+    return value
+
+
+async def acached(listing_id, name, build):
+    """Async ``cached()``; ``build`` is a coroutine function."""
+    key = _value_key(listing_id, await alisting_version(listing_id), name)
+    value = await cache.aget(key)
+    if value is not None:
+        await _acount(name, "hits")
+        return value
+
+    await _acount(name, "misses")
+    value = await build()
+    await cache.aset(key, value, getattr(settings, "AUCTIONS_CACHE_TIMEOUT", 600))
+    return value
+
+
+async def aget_cached(listing_id, name):
+    """The cached ``name`` object of a listing, or ``None``; only hits are counted.
+
+    Async views use this to fetch a template fragment up front. On a miss the
+    template's ``listingcache`` tag renders it and counts the miss.
+    """
+    value = await cache.aget(_value_key(listing_id, await alisting_version(listing_id), name))
+    if value is not None:
+        await _acount(name, "hits")
+    return value
+
+
+def cache_stats():
+    """Hit and miss counts, plus the hit ratio, for every cached object."""
+    keys = [_stats_key(name, outcome) for name in CACHED_OBJECTS for outcome in ("hits", "misses")]
+    counts = cache.get_many(keys)
+    stats = {}
+    for name in CACHED_OBJECTS:
+        hits = counts.get(_stats_key(name, "hits"), 0)
+        misses = counts.get(_stats_key(name, "misses"), 0)
+        stats[name] = {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / (hits + misses) if hits + misses else None,
+        }
+    return stats
+
+
+def reset_cache_stats():
+    cache.delete_many([_stats_key(name, outcome) for name in CACHED_OBJECTS for outcome in ("hits", "misses")])
@@ -0,0 +1,124 @@
+"""Closing auctions, one listing or thousands at a time.
+
+Closing used to save each listing twice (once for ``is_active``, once for the
+winner). Here a whole batch is locked, its winners are looked up with one query
+through the maintained ``highest_bid`` column, and every row is written with a
+single ``bulk_update``.
+
+Listings with an end time are closed by ``close_expired`` (one pass, e.g. from
+cron) or, in a long-running worker, by a ``deadline_scheduler`` that sleeps
+until the next one ends.
+"""
+
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import directory, notifications
+from .caching import bump_listing_version
+from .events import publish_listing_event
+from .models import AuctionListing, Bid
+from .scheduling import DeadlineScheduler
+
+
+def close_listings(listings):
+    """Close the listings matched by ``listings`` and return them.
+
+    ``listings`` must only match active listings; it may be sliced. Rows
+    another worker is already closing are skipped rather than waited on.
+    """
+    with transaction.atomic():
+        batch = list(listings.select_for_update(skip_locked=True))
+        if not batch:
+            return []
+
+        winners = {
+            bid_id: (bidder_id, username)
+            for bid_id, bidder_id, username in Bid.objects.filter(
+                pk__in=[listing.highest_bid_id for listing in batch if listing.highest_bid_id]
+            ).values_list("id", "bidder_id", "bidder__username")
+        }
+        now = timezone.now()
+        for listing in batch:
+            listing.is_active = False
+            listing.updated_at = now
+            listing.winner_id, winner_name = winners.get(listing.highest_bid_id, (None, None))
+            publish_listing_event(listing.id, {
+                "type": "closed",
+                "price": str(listing.current_price or listing.starting_bid),
+                "bid_count": listing.bid_count,
+                "winner": winner_name,
+            })
+        AuctionListing.objects.bulk_update(batch, ["is_active", "winner", "updated_at"])
+        notifications.listings_closed(batch)
+
+        # bulk_update sends no signals, so invalidate caches and counters here
+        for listing in batch:
+            bump_listing_version(listing.id)
+        for category_id, closed in Counter(listing.category_id for listing in batch).items():
+            directory.adjust_active_listings(category_id, -closed)
+
+    return batch
+
+
+def _timestamp(when):
+    return datetime.fromtimestamp(when, tz=dt_timezone.utc)
+
+
+def load_deadlines(until):
+    """``(end time, id)`` of active listings ending by ``until``, as timestamps.
+
+    For ``DeadlineScheduler``; the ``(is_active, end_time)`` index makes this a
+    range scan over the upcoming deadlines.
+    """
+    return [
+        (end_time.timestamp(), listing_id)
+        for end_time, listing_id in AuctionListing.objects.filter(
+            is_active=True, end_time__lte=_timestamp(until)
+        ).values_list("end_time", "id")
+    ]
+
+
+def close_due(listing_ids, now):
+    """Close those of ``listing_ids`` that have ended by ``now`` (a timestamp).
+
+    Returns ``(end time, id)`` for the ones still open because their end time
+    moved, e.g. after a soft-close extension, so the scheduler can requeue them.
+    Listings skipped because another worker is closing them are not returned.
+    """
+    closed = close_listings(
+        AuctionListing.objects.filter(pk__in=listing_ids, is_active=True, end_time__lte=_timestamp(now))
+    )
+    remaining = set(listing_ids) - {listing.id for listing in closed}
+    if not remaining:
+        return []
+    return [
+        (end_time.timestamp(), listing_id)
+        for end_time, listing_id in AuctionListing.objects.filter(
+            pk__in=remaining, is_active=True, end_time__gt=_timestamp(now)
+        ).values_list("end_time", "id")
+    ]
+
+
+def deadline_scheduler(batch_size=500, horizon=300.0, refresh_interval=30.0, **kwargs):
+    """A ``DeadlineScheduler`` that closes listings in this database."""
+    return DeadlineScheduler(load_deadlines, close_due, horizon=horizon, refresh_interval=refresh_interval,
+                             batch_size=batch_size, **kwargs)
+
+
+def close_expired(now=None, batch_size=500):
+    """Close every listing whose end time has passed, ``batch_size`` at a time.
+
+    Returns the number of listings closed.
+    """
+    now = now or timezone.now()
+    closed = 0
+    while True:
+        batch = close_listings(
+            AuctionListing.objects.filter(is_active=True, end_time__lte=now).order_by("end_time", "id")[:batch_size]
+        )
+        closed += len(batch)
+        if len(batch) < batch_size:
+            return closed
@@ -0,0 +1,81 @@
+"""Cached category directory with active-listing counts.
+
+The category list and the per-category counters are cached separately. Names
+change only when a category is added or edited, while the counters move every
+time a listing opens or closes, so they are kept as individual cache counters
+and adjusted with atomic ``incr``/``decr`` instead of re-counting the listings.
+If anything is missing from the cache the whole directory is rebuilt with one
+grouped query. Everything expires after ``AUCTIONS_DIRECTORY_TIMEOUT``
+seconds (``incr`` keeps the expiry), so a counter that drifts, say because a
+rebuild raced an adjustment, is only wrong until the next rebuild.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .models import Category
+
+NAMES_KEY = "auctions:categories:names"
+
+
+def _count_key(category_id):
+    return f"auctions:categories:{category_id}:active"
+
+
+def _timeout():
+    return getattr(settings, "AUCTIONS_DIRECTORY_TIMEOUT", 3600)
+
+
+def _rebuild():
+    categories = list(
+        Category.objects.annotate(
+            active_listings=Count("listings", filter=Q(listings__is_active=True))
+        ).order_by("category_name")
+    )
+    cache.set(NAMES_KEY, [(category.id, category.category_name) for category in categories], _timeout())
+    cache.set_many({_count_key(category.id): category.active_listings for category in categories}, _timeout())
+    return [
+        {"id": category.id, "category_name": category.category_name, "active_listings": category.active_listings}
+        for category in categories
+    ]
+
+
+def category_directory():
+    """Every category, ordered by name, as dicts with an ``active_listings`` count."""
+    names = cache.get(NAMES_KEY)
+    if names is None:
+        return _rebuild()
+    counts = cache.get_many([_count_key(category_id) for category_id, _ in names])
+    if len(counts) < len(names):
+        return _rebuild()
+    return [
+        {"id": category_id, "category_name": name, "active_listings": counts[_count_key(category_id)]}
+        for category_id, name in names
+    ]
+
+
+def find_category(category_id=None, category_name=None):
+    """Look a category up in the directory by id or by name."""
+    for category in category_directory():
+        if category["id"] == category_id or category["category_name"] == category_name:
+            return category
+    return None
+
+
+def adjust_active_listings(category_id, delta):
+    """Add ``delta`` to a category's active-listing count once the transaction commits."""
+    def adjust():
+        try:
+            cache.incr(_count_key(category_id), delta)
+        except ValueError:
+            # Not cached: the next read rebuilds the directory from the database
+            pass
+
+    transaction.on_commit(adjust)
+
+
+def invalidate_directory():
+    """Forget the cached directory, e.g. after categories are added or renamed."""
+    transaction.on_commit(lambda: cache.delete(NAMES_KEY))
@@ -0,0 +1,124 @@
+"""Live listing events for the Server-Sent Events stream.
+
+Bids and closings publish a small event per listing once their transaction
+commits, and every open ``/listing/<id>/events`` stream that is subscribed to
+that listing receives it. The default ``InProcessBroker`` fans events out
+inside one server process. With several worker processes, set
+``AUCTIONS_EVENT_BROKER`` to ``auctions.events.RedisBroker`` so events travel
+through any Redis-compatible server.
+"""
+
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+def listing_channel(listing_id):
+    return f"auctions:listing:{listing_id}"
+
+
+class Subscription:
+    """One subscriber's queue of events, bound to the event loop it was made on."""
+
+    def __init__(self, broker, channel, max_pending):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(max_pending)
+
+    def deliver(self, event):
+        # Called on the subscriber's loop. A client too slow to keep up loses its
+        # oldest events rather than holding up the publisher or everyone else.
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """Publish/subscribe between the threads and event loops of one process."""
+
+    def __init__(self, max_pending=100):
+        self.max_pending = max_pending
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel, self.max_pending)
+        with self._lock:
+            self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscriptions.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[subscription.channel]
+
+    def subscriber_count(self, channel):
+        with self._lock:
+            return len(self._subscriptions.get(channel, ()))
+
+    def publish(self, channel, event):
+        """Send ``event`` to every subscriber of ``channel``. Safe from any thread."""
+        with self._lock:
+            subscribers = list(self._subscriptions.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # The subscriber's event loop has shut down without unsubscribing
+                self.unsubscribe(subscription)
+
+
+class RedisBroker(InProcessBroker):
+    """Fan events out across processes through a Redis-compatible server.
+
+    Publishing goes to the server; one listener thread per process receives
+    every listing event and hands it to the local subscribers, so the number of
+    server connections does not grow with the number of open streams.
+    Needs the ``redis`` package and ``AUCTIONS_EVENT_REDIS_URL``.
+    """
+
+    def __init__(self, max_pending=100):
+        super().__init__(max_pending)
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured("RedisBroker needs the 'redis' package.")
+        self._redis = redis.Redis.from_url(getattr(settings, "AUCTIONS_EVENT_REDIS_URL", "redis://localhost:6379/0"))
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.psubscribe(listing_channel("*"))
+        threading.Thread(target=self._listen, args=(pubsub,), daemon=True).start()
+
+    def _listen(self, pubsub):
+        for message in pubsub.listen():
+            super().publish(message["channel"].decode(), json.loads(message["data"]))
+
+    def publish(self, channel, event):
+        self._redis.publish(channel, json.dumps(event))
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    broker_class = import_string(getattr(settings, "AUCTIONS_EVENT_BROKER", "auctions.events.InProcessBroker"))
+    return broker_class()
+
+
+def publish_listing_event(listing_id, event):
+    """Publish ``event`` for a listing once the current transaction commits."""
+    transaction.on_commit(lambda: get_broker().publish(listing_channel(listing_id), event))
@@ -0,0 +1,265 @@
+"""Listing image thumbnails.
+
+Listing pages used to embed whatever ``image_url`` the seller typed, at full
+size, straight from the other site. Now each new or changed image URL is
+queued as a pending ``ListingImage`` and the ``process_images`` worker fetches
+it once, outside any request, and saves WebP and JPEG thumbnails at each of
+``AUCTIONS_IMAGE_WIDTHS`` into the default (media) storage. Templates then
+offer those through ``srcset`` and lazy loading, and fall back to the original
+URL until the thumbnails exist.
+
+Fetching goes through ``AUCTIONS_IMAGE_FETCHER``, a dotted path to a callable
+that takes a URL and returns the image bytes, so tests can read local files.
+The default fetcher only connects to public addresses: the URL comes from the
+seller, and the worker must not become a way to reach the internal network or
+a cloud metadata service. The check runs when each connection is made,
+redirects included, on the address actually connected to, so a DNS name that
+changes its answer between a check and the request gets nowhere.
+Generating thumbnails needs Pillow.
+"""
+
+import http.client
+import io
+import ipaddress
+import socket
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils.module_loading import import_string
+
+from .caching import bump_listing_version
+from .models import ListingImage
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover - optional dependency
+    Image = None
+
+# Output formats, best first; browsers without WebP use the JPEGs
+FORMATS = {"webp": "WEBP", "jpeg": "JPEG"}
+
+
+class ImageError(Exception):
+    """The image could not be fetched or decoded. Stored on the ``ListingImage``."""
+
+
+def is_public_address(address):
+    """Whether an IP address is on the public internet (not private, loopback, link-local, ...)."""
+    ip = ipaddress.ip_address(address)
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def _create_public_connection(address, timeout=socket._GLOBAL_DEFAULT_TIMEOUT, source_address=None):
+    """``socket.create_connection()``, refusing hosts with any non-public address."""
+    host, port = address
+    addresses = [info[4][0] for info in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)]
+    if not all(is_public_address(ip) for ip in addresses):
+        raise ImageError("Image URLs must point to a public address.")
+    error = None
+    for ip in dict.fromkeys(addresses):
+        try:
+            return socket.create_connection((ip, port), timeout, source_address)
+        except OSError as exc:
+            error = exc
+    raise error
+
+
+class _PublicHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = _create_public_connection
+
+
+class _PublicHTTPSConnection(http.client.HTTPSConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = _create_public_connection
+
+
+class _PublicHTTPHandler(urllib.request.HTTPHandler):
+    def http_open(self, req):
+        return self.do_open(_PublicHTTPConnection, req)
+
+
+class _PublicHTTPSHandler(urllib.request.HTTPSHandler):
+    def https_open(self, req):
+        return self.do_open(_PublicHTTPSConnection, req, context=self._context)
+
+
+class _HTTPRedirectHandler(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        # urllib would follow a redirect to ftp://, which skips the address check
+        if not newurl.lower().startswith(("http://", "https://")):
+            raise ImageError("Only http and https image URLs are supported.")
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+# No proxies: a proxy would make the connection, and the address check, for us
+_opener = urllib.request.build_opener(
+    urllib.request.ProxyHandler({}), _PublicHTTPHandler, _PublicHTTPSHandler, _HTTPRedirectHandler
+)
+
+
+def fetch_url(url):
+    """Default fetcher: download ``url`` over HTTP(S) from a public address, refusing oversized files."""
+    if not url.lower().startswith(("http://", "https://")):
+        raise ImageError("Only http and https image URLs are supported.")
+    limit = getattr(settings, "AUCTIONS_IMAGE_MAX_BYTES", 10 * 1024 * 1024)
+    try:
+        request = urllib.request.Request(url, headers={"User-Agent": "auctions-thumbnailer"})
+        with _opener.open(request, timeout=10) as response:
+            data = response.read(limit + 1)
+    except (OSError, ValueError, http.client.HTTPException) as error:
+        # ValueError and InvalidURL (an HTTPException) come from malformed URLs
+        raise ImageError(f"Could not fetch the image: {error}")
+    if len(data) > limit:
+        raise ImageError("The image is too large.")
+    return data
+
+
+@lru_cache(maxsize=None)
+def _fetcher(path):
+    return import_string(path)
+
+
+def fetch(url):
+    return _fetcher(getattr(settings, "AUCTIONS_IMAGE_FETCHER", "auctions.images.fetch_url"))(url)
+
+
+def widths():
+    return sorted(getattr(settings, "AUCTIONS_IMAGE_WIDTHS", (320, 640, 1024)))
+
+
+def max_pixels():
+    return getattr(settings, "AUCTIONS_IMAGE_MAX_PIXELS", 40_000_000)
+
+
+def queue_image(listing, created=False):
+    """Queue the listing's image for thumbnailing if it is new or has changed."""
+    if created:
+        if listing.image_url:
+            ListingImage.objects.create(listing=listing, source_url=listing.image_url)
+        return
+    if not listing.image_url:
+        ListingImage.objects.filter(listing=listing).delete()
+        return
+    ListingImage.objects.exclude(source_url=listing.image_url).filter(listing=listing).delete()
+    ListingImage.objects.get_or_create(listing=listing, defaults={"source_url": listing.image_url})
+
+
+def make_thumbnails(data):
+    """``{width: {format: bytes}}`` for every configured width up to the original's."""
+    if Image is None:
+        raise ImageError("Thumbnails need Pillow, which is not installed.")
+    try:
+        original = Image.open(io.BytesIO(data))
+        # Opening reads only the header; refuse decompression bombs before decoding
+        if original.width * original.height > max_pixels():
+            raise ImageError("The image has too many pixels.")
+        original.load()
+        original = original.convert("RGB")
+
+        thumbnails = {}
+        # Never upscale; a small original still gets one (original-sized) thumbnail
+        sizes = [width for width in widths() if width < original.width] + [min(original.width, widths()[-1])]
+        for width in sorted(set(sizes)):
+            resized = original.resize((width, max(1, round(original.height * width / original.width))),
+                                      Image.Resampling.LANCZOS)
+            thumbnails[width] = {}
+            for extension, pil_format in FORMATS.items():
+                output = io.BytesIO()
+                resized.save(output, pil_format, quality=80)
+                thumbnails[width][extension] = output.getvalue()
+    except ImageError:
+        raise
+    except Exception as error:
+        raise ImageError(f"Not a readable image: {error}")
+    return thumbnails
+
+
+def store_thumbnails(image, thumbnails):
+    """Save the thumbnails to media storage; returns ``{width: {format: name}}``."""
+    names = {}
+    for width, files in thumbnails.items():
+        names[str(width)] = {}
+        for extension, data in files.items():
+            name = f"listings/{image.listing_id}/{image.pk}-{width}.{extension}"
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            names[str(width)][extension] = default_storage.save(name, ContentFile(data))
+    return names
+
+
+def process_pending(batch_size=20, workers=4):
+    """Fetch and thumbnail up to ``batch_size`` pending images. Returns ``(ready, failed)``.
+
+    Downloads run on ``workers`` threads; decoding and saving happen here.
+    """
+    pending = list(ListingImage.objects.filter(status=ListingImage.PENDING).order_by("id")[:batch_size])
+
+    def download(image):
+        try:
+            return fetch(image.source_url)
+        except ImageError as error:
+            return error
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        downloads = list(pool.map(download, pending))
+
+    ready = failed = 0
+    for image, data in zip(pending, downloads):
+        try:
+            if isinstance(data, ImageError):
+                raise data
+            image.thumbnails = store_thumbnails(image, make_thumbnails(data))
+        except ImageError as error:
+            image.status, image.error = ListingImage.FAILED, str(error)[:255]
+            failed += 1
+        else:
+            image.status, image.error = ListingImage.READY, ""
+            ready += 1
+        # The seller may have changed the URL meanwhile; that row was replaced
+        updated = ListingImage.objects.filter(pk=image.pk, source_url=image.source_url).update(
+            status=image.status, error=image.error, thumbnails=image.thumbnails
+        )
+        if updated:
+            bump_listing_version(image.listing_id)
+    return ready, failed
+
+
+def image_sources(image_url, status=None, thumbnails=None):
+    """What to put in ``<img>``/``<source>`` for a listing image, or None if it has none.
+
+    Returns ``src`` plus, once thumbnails exist, a JPEG ``srcset`` and a WebP
+    ``webp_srcset``.
+    """
+    if not image_url:
+        return None
+    if status != ListingImage.READY or not thumbnails:
+        return {"src": image_url, "srcset": "", "webp_srcset": ""}
+    by_width = sorted(thumbnails.items(), key=lambda item: int(item[0]))
+
+    def srcset(extension):
+        return ", ".join(f"{default_storage.url(files[extension])} {width}w" for width, files in by_width)
+
+    return {
+        "src": default_storage.url(by_width[0][1]["jpeg"]),
+        "srcset": srcset("jpeg"),
+        "webp_srcset": srcset("webp"),
+    }
+
+
+def listing_image_sources(listing):
+    """``image_sources`` for a listing instance (select_related("image") to avoid a query)."""
+    try:
+        image = listing.image
+    except ObjectDoesNotExist:
+        return image_sources(listing.image_url)
+    return image_sources(listing.image_url, image.status, image.thumbnails)
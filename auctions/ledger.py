@@ -0,0 +1,115 @@
+"""Bid history: the raw bid ledger and its per-minute rollups.
+
+Bids are only ever appended (``Bid.save`` refuses to change one), each with the
+time it was placed. Alongside them ``place_bid`` keeps a ``BidRollup`` row per
+listing and time bucket (``AUCTIONS_BID_BUCKET_SECONDS``, a minute by default)
+holding the number of bids and the highest price in the bucket, so price
+charts and bid velocity come from a handful of rollup rows rather than a scan
+of the bids.
+
+Because the rollups already count every bid, old raw bids can be dropped:
+``compact_bids`` (the ``compact_bids`` command) deletes the bids of long-closed
+listings except each bidder's highest, which is all the winner, the "My bids"
+dashboard and ``rebuild_user_bid_states`` need.
+"""
+
+import itertools
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max
+
+from .models import AuctionListing, Bid, BidRollup
+
+
+def bucket_seconds():
+    return getattr(settings, "AUCTIONS_BID_BUCKET_SECONDS", 60)
+
+
+def bucket_start(when):
+    """The start of the rollup bucket that ``when`` falls in."""
+    timestamp = when.timestamp()
+    return datetime.fromtimestamp(timestamp - timestamp % bucket_seconds(), tz=dt_timezone.utc)
+
+
+def record_bid(listing_id, amount, when):
+    """Count an accepted bid in its rollup bucket.
+
+    Called by ``place_bid`` after it has updated the listing row, so bids on
+    one listing get here one at a time and the update-or-insert cannot race.
+    """
+    bucket = bucket_start(when)
+    # Every accepted bid beats the last, so it is also the bucket's highest
+    if not BidRollup.objects.filter(listing_id=listing_id, bucket=bucket).update(
+        bids=F("bids") + 1, max_price=amount
+    ):
+        BidRollup.objects.create(listing_id=listing_id, bucket=bucket, bids=1, max_price=amount)
+
+
+def rollup_bids(bids, batch_size=5000):
+    """Add bids that bypassed ``place_bid`` (bulk inserts) to the rollups.
+
+    Returns the number of bids counted.
+    """
+    counted = 0
+    rows = bids.order_by().values_list("listing_id", "created_at", "bid_amount").iterator(chunk_size=batch_size)
+    while batch := list(itertools.islice(rows, batch_size)):
+        totals = {}
+        for listing_id, created_at, amount in batch:
+            key = (listing_id, bucket_start(created_at))
+            count, highest = totals.get(key, (0, amount))
+            totals[key] = (count + 1, max(highest, amount))
+
+        with transaction.atomic():
+            existing = {
+                (rollup.listing_id, rollup.bucket): rollup
+                for rollup in BidRollup.objects.select_for_update().filter(
+                    listing_id__in={listing_id for listing_id, _ in totals},
+                    bucket__in={bucket for _, bucket in totals},
+                )
+            }
+            for key, rollup in existing.items():
+                if key in totals:
+                    count, highest = totals.pop(key)
+                    rollup.bids += count
+                    rollup.max_price = max(rollup.max_price, highest)
+            BidRollup.objects.bulk_update(existing.values(), ["bids", "max_price"])
+            BidRollup.objects.bulk_create(
+                BidRollup(listing_id=listing_id, bucket=bucket, bids=count, max_price=highest)
+                for (listing_id, bucket), (count, highest) in totals.items()
+            )
+        counted += len(batch)
+    return counted
+
+
+def price_history(listing_id, since=None):
+    """The listing's rollup buckets, oldest first, as chart-ready dicts."""
+    rollups = BidRollup.objects.filter(listing_id=listing_id)
+    if since is not None:
+        rollups = rollups.filter(bucket__gte=bucket_start(since))
+    return [
+        {"start": bucket, "bids": bids, "max_price": max_price}
+        for bucket, bids, max_price in rollups.order_by("bucket").values_list("bucket", "bids", "max_price")
+    ]
+
+
+def compact_bids(before, batch_size=1000):
+    """Delete raw bids placed before ``before`` on closed listings, keeping
+    each bidder's highest bid per listing. Returns ``(bids, listings)``.
+    """
+    listings = AuctionListing.objects.filter(is_active=False, bids__created_at__lt=before).order_by("id")
+    deleted = compacted = 0
+    last_id = 0
+    # Walk the listings by id rather than holding a cursor open while deleting
+    while batch := list(listings.filter(id__gt=last_id).values_list("id", flat=True).distinct()[:batch_size]):
+        last_id = batch[-1]
+        # Amounts only go up on a listing, so a bidder's highest bid is their latest
+        keep = Bid.objects.filter(listing_id__in=batch).values("listing_id", "bidder_id").annotate(
+            top=Max("id")
+        ).values("top")
+        with transaction.atomic():
+            count, _ = Bid.objects.filter(listing_id__in=batch, created_at__lt=before).exclude(pk__in=keep).delete()
+        deleted += count
+        compacted += len(batch)
+    return deleted, compacted
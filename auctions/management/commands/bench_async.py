@@ -0,0 +1,59 @@
+import json
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from auctions.bench import read_paths, run_asgi, run_wsgi, scratch_database, seed, summarize_throughput
+from auctions.models import User
+from commerce.asgi import application as asgi_application
+from commerce.wsgi import application as wsgi_application
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a scratch database and serve the same mix of read-heavy pages through the "
+        "WSGI handler from a thread per in-flight request and through the ASGI handler "
+        "on one event loop, printing latency and requests/sec at each concurrency level as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("concurrency", nargs="*", type=int, default=[1, 10, 100],
+                            help="Requests in flight at once.")
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--listings", type=int, default=1000)
+        parser.add_argument("--requests", type=int, default=1000, help="Requests per run.")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed for data and requests.")
+
+    def handle(self, *args, **options):
+        scale = {"users": options["users"], "listings": options["listings"]}
+        results = {}
+
+        setup_test_environment(debug=False)
+        try:
+            with scratch_database():
+                cache.clear()
+                data = seed(**scale, seed=options["seed"])
+                client = Client()
+                client.force_login(User.objects.get(pk=data["users"][0]))
+                cookie = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+
+                for concurrency in options["concurrency"]:
+                    paths = read_paths(data, random.Random(options["seed"]), options["requests"])
+                    results[concurrency] = {
+                        "wsgi": summarize_throughput(*run_wsgi(wsgi_application, paths, concurrency, cookie)),
+                        "asgi": summarize_throughput(*run_asgi(asgi_application, paths, concurrency, cookie)),
+                    }
+        finally:
+            teardown_test_environment()
+            cache.clear()
+
+        self.stdout.write(json.dumps({
+            "created": timezone.now().isoformat(),
+            "scale": scale,
+            "concurrency": results,
+        }, indent=2))
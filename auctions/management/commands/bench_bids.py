@@ -0,0 +1,63 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from auctions.bench import run_bid_stress, scratch_database
+from auctions.models import AuctionListing, Category, User
+
+# Connection setups to compare: SQLite as Django configures it out of the
+# box, and with the PRAGMAs from commerce/database.py
+CONFIGURATIONS = {
+    "default": {},
+    "tuned": None,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure bids/sec with many concurrent bidders on one listing in a scratch database, "
+        "with SQLite's default settings and with the tuned PRAGMAs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bidders", type=int, default=8)
+        parser.add_argument("--bids", type=int, default=50, help="Bids per bidder.")
+        parser.add_argument("--only", choices=sorted(CONFIGURATIONS), help="Measure one configuration.")
+
+    def handle(self, *args, **options):
+        names = [options["only"]] if options["only"] else list(CONFIGURATIONS)
+        for name in names:
+            pragmas = CONFIGURATIONS[name]
+            with override_settings(SQLITE_PRAGMAS=settings.SQLITE_PRAGMAS if pragmas is None else pragmas):
+                self.stdout.write(f"{name}: ", ending="")
+                self.measure(options["bidders"], options["bids"])
+
+    def measure(self, bidder_count, bids):
+        with scratch_database():
+            seller = User.objects.create_user("seller")
+            bidders = [User.objects.create_user(f"bidder{i}") for i in range(bidder_count)]
+            listing = AuctionListing.objects.create(
+                title="Benchmark",
+                description="Contended listing",
+                starting_bid=Decimal("0.00"),
+                seller=seller,
+                category=Category.objects.create(category_name="Benchmark"),
+            )
+
+            result = run_bid_stress(listing.id, bidders, bids)
+            listing.refresh_from_db()
+
+        lost = result["highest_amount"] != listing.current_price
+        self.stdout.write(
+            f"{result['attempts']} bids from {len(bidders)} bidders in {result['seconds']:.2f}s: "
+            f"{result['accepted']} accepted ({result['bids_per_second']:.0f}/sec), "
+            f"{result['rejected']} outbid, {len(result['errors'])} errors"
+        )
+        if result["errors"]:
+            self.stderr.write(f"First error: {result['errors'][0]!r}")
+        if lost:
+            self.stderr.write(
+                f"Lost update: final price {listing.current_price}, expected {result['highest_amount']}"
+            )
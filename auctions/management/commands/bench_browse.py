@@ -0,0 +1,112 @@
+import random
+import re
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from auctions import browse
+from auctions.pagination import ordered_page
+from auctions.bench import scratch_database
+from auctions.models import AuctionListing, Category, User
+
+# Index names in SQLite's EXPLAIN QUERY PLAN and PostgreSQL's EXPLAIN
+INDEX_USED = re.compile(r"USING (?:COVERING )?INDEX (\w+)|Index (?:Only )?Scan (?:Backward )?using (\w+)")
+SORTED = re.compile(r"TEMP B-TREE FOR ORDER BY|^\s*(?:->\s*)?Sort\b", re.MULTILINE)
+
+PRICE_RANGES = {"any price": {}, "£50-£200": {"min_price": "50", "max_price": "200"}}
+
+
+def plan_summary(plan):
+    """The indexes a plan reads and whether it sorts, e.g. ``listing_active_price_idx``."""
+    indexes = [first or second for first, second in INDEX_USED.findall(plan)]
+    if SORTED.search(plan):
+        return f"{', '.join(dict.fromkeys(indexes)) or 'table scan'} + sort"
+    # With no index and no sort SQLite is walking the table in rowid (id) order
+    return ", ".join(dict.fromkeys(indexes)) or "table scan in id order"
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the browse pages (every sort order, with and without a category and price range) and their "
+        "facet counts at growing table sizes in a scratch database, and show which index each query uses."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("sizes", nargs="*", type=int, default=[10_000, 100_000],
+                            help="Listing counts to measure at.")
+        parser.add_argument("--categories", type=int, default=20)
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per query.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        with scratch_database():
+            seller = User.objects.create_user("seller")
+            Category.objects.bulk_create(
+                Category(category_name=f"Category {n}") for n in range(options["categories"])
+            )
+            category_ids = list(Category.objects.values_list("id", flat=True))
+
+            for size in sorted(options["sizes"]):
+                self.seed(size, seller, category_ids, rng)
+                # Give the planner row counts, as a long-running database would have
+                with connection.cursor() as cursor:
+                    cursor.execute("ANALYZE")
+                self.stdout.write(f"{size} listings:")
+                self.measure(category_ids[0], options["repeat"])
+
+    def seed(self, size, seller, category_ids, rng, chunk=10_000):
+        existing = AuctionListing.objects.count()
+        for start in range(existing, size, chunk):
+            listings = []
+            for _ in range(start, min(start + chunk, size)):
+                starting_bid = Decimal(rng.randint(100, 100_000)) / 100
+                bids = rng.choice([0, 0, 1, 2, 5, 10, 30])
+                listings.append(AuctionListing(
+                    title="Benchmark",
+                    description="Browse benchmark listing",
+                    starting_bid=starting_bid,
+                    current_price=starting_bid + bids * 5 if bids else None,
+                    bid_count=bids,
+                    is_active=rng.random() < 0.7,
+                    seller=seller,
+                    category_id=rng.choice(category_ids),
+                ))
+            AuctionListing.objects.bulk_create(listings)
+
+    def measure(self, category_id, repeat):
+        for scope, scope_category in (("all categories", None), ("one category", category_id)):
+            for range_name, price_range in PRICE_RANGES.items():
+                for sort in browse.SORTS:
+                    params = browse.browse_params({"sort": sort, **price_range}, category_id=scope_category)
+                    # A cursor halfway through the results, for a deep page
+                    ids = list(browse.listings(params).values_list("id", flat=True))
+                    middle = ids[len(ids) // 2] if ids else None
+
+                    first = self.time(lambda: ordered_page(browse.listings(params)), repeat)
+                    deep = self.time(lambda: ordered_page(browse.listings(params, middle)), repeat)
+                    self.stdout.write(
+                        f"  {scope:14} {range_name:9} {sort:7} first page {first * 1000:7.2f} ms  "
+                        f"deep page {deep * 1000:7.2f} ms  "
+                        f"{plan_summary(browse.listings(params, middle)[:25].explain())}"
+                    )
+
+                if scope_category is not None:
+                    continue  # Every category page shares the facet query
+                params = browse.browse_params(price_range)
+                # The grouped query itself; the pages cache its rows
+                facets = self.time(lambda: list(browse._facet_query(params)), repeat)
+                self.stdout.write(
+                    f"  {'facet counts':14} {range_name:9} grouped query {facets * 1000:7.2f} ms  "
+                    f"{plan_summary(browse._facet_query(params).explain())}"
+                )
+
+    def time(self, run, repeat):
+        best = None
+        for _ in range(repeat):
+            began = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - began
+            best = elapsed if best is None else min(best, elapsed)
+        return best
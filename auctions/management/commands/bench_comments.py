@@ -0,0 +1,79 @@
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from auctions.bench import scratch_database
+from auctions.models import AuctionListing, Category, Comments, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the listing page with a growing number of comments in a scratch database. "
+        "Only the newest page of comments is rendered, so the time should stay flat."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("sizes", nargs="*", type=int, default=[10, 1_000, 10_000, 100_000],
+                            help="Comment counts to measure at.")
+        parser.add_argument("--requests", type=int, default=20, help="Timed requests per size.")
+
+    def handle(self, *args, **options):
+        setup_test_environment(debug=False)
+        try:
+            with scratch_database():
+                self.measure(sorted(options["sizes"]), options["requests"])
+        finally:
+            teardown_test_environment()
+            cache.clear()
+
+    def measure(self, sizes, requests):
+        seller = User.objects.create_user("seller")
+        authors = [User.objects.create_user(f"author{i}") for i in range(20)]
+        listing = AuctionListing.objects.create(
+            title="Benchmark",
+            description="Much discussed listing",
+            starting_bid=Decimal("1.00"),
+            seller=seller,
+            category=Category.objects.create(category_name="Benchmark"),
+        )
+        url = reverse("listing", args=(listing.id,))
+        client = Client()
+        start = timezone.now() - timedelta(days=365)
+
+        for size in sizes:
+            existing = Comments.objects.count()
+            for offset in range(existing, size, 10_000):
+                Comments.objects.bulk_create([
+                    Comments(listing=listing, author=authors[n % len(authors)], message=f"Comment {n}",
+                             created_at=start + timedelta(seconds=n))
+                    for n in range(offset, min(offset + 10_000, size))
+                ])
+
+            latencies = []
+            for _ in range(requests):
+                # Cold cache every time, so the comments are loaded and rendered
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    began = time.perf_counter()
+                    response = client.get(url)
+                    latencies.append(time.perf_counter() - began)
+            assert response.status_code == 200, response.status_code
+
+            # What the page used to do: load every comment
+            began = time.perf_counter()
+            list(listing.comments.select_related("author").order_by("id"))
+            unpaged = time.perf_counter() - began
+
+            self.stdout.write(
+                f"{size:>8} comments: listing page p50 {statistics.median(latencies) * 1000:7.2f} ms "
+                f"({len(queries)} queries); loading them all {unpaged * 1000:9.2f} ms"
+            )
@@ -0,0 +1,77 @@
+import json
+import random
+import subprocess
+import sys
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from auctions.bench import default_routes, run_routes, scratch_database, seed
+from auctions.models import User
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a scratch database at the given scale, drive the auction routes through the "
+        "Django test client and print p50/p95/p99 latency, requests/sec and queries per "
+        "route as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--listings", type=int, default=1000)
+        parser.add_argument("--bids", type=int, default=5, help="Bids per listing.")
+        parser.add_argument("--comments", type=int, default=5, help="Comments per listing.")
+        parser.add_argument("--watchers", type=int, default=3, help="Watchers per listing.")
+        parser.add_argument("--requests", type=int, default=200, help="Timed requests per route.")
+        parser.add_argument("--warmup", type=int, default=10, help="Untimed requests per route.")
+        parser.add_argument("--routes", nargs="*", help="Only run these routes.")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed for data and requests.")
+        parser.add_argument("--output", help="Also write the JSON report to this file.")
+
+    def handle(self, *args, **options):
+        scale = {name: options[name] for name in ("users", "listings", "bids", "comments", "watchers")}
+
+        setup_test_environment(debug=False)
+        try:
+            with scratch_database():
+                cache.clear()
+                data = seed(**scale, seed=options["seed"])
+                routes = default_routes(data, random.Random(options["seed"]))
+                if options["routes"]:
+                    unknown = set(options["routes"]) - set(routes)
+                    if unknown:
+                        sys.exit(f"Unknown routes: {', '.join(sorted(unknown))}")
+                    routes = {name: routes[name] for name in options["routes"]}
+                results = run_routes(
+                    routes,
+                    requests=options["requests"],
+                    warmup=options["warmup"],
+                    user=User.objects.get(pk=data["users"][0]),
+                )
+        finally:
+            teardown_test_environment()
+            cache.clear()
+
+        report = json.dumps({
+            "commit": current_commit(),
+            "created": timezone.now().isoformat(),
+            "scale": scale,
+            "requests": options["requests"],
+            "routes": results,
+        }, indent=2)
+        self.stdout.write(report)
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                output.write(report + "\n")
@@ -0,0 +1,82 @@
+import itertools
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from auctions.bench import scratch_database
+from auctions.models import AuctionListing, Category, User
+from auctions.search import fallback_search, fts_available, search_listings
+
+WORDS = (
+    "antique brass lamp oak table vintage leather chair silver watch ceramic vase wool rug "
+    "walnut desk copper kettle glass bowl linen quilt marble clock velvet sofa iron bench "
+    "porcelain teapot crystal chandelier bronze statue maple dresser pewter jug cotton throw"
+).split()
+
+SYLLABLES = "ka lo mi ren tor va shi quen dal bex pur ion sel ma gro tiv".split()
+
+QUERIES = ["lamp", "vintage oak", "silver watch", "porcel", "marble clock velvet", "nomatch"]
+
+
+def vocabulary(rng, size=20_000):
+    """The descriptive words plus a long tail of made-up ones, so most terms are rare."""
+    words = set(WORDS)
+    while len(words) < size:
+        words.add("".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+    return sorted(words)
+
+
+class Command(BaseCommand):
+    help = "Compare FTS5 search with the icontains fallback at growing table sizes in a scratch database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("sizes", nargs="*", type=int, default=[100_000, 1_000_000],
+                            help="Listing counts to measure at.")
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per query.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        with scratch_database():
+            if not fts_available():
+                self.stderr.write("FTS5 search needs SQLite; only the fallback will be measured.")
+            seller = User.objects.create_user("seller")
+            category = Category.objects.create(category_name="Benchmark")
+
+            words = vocabulary(rng)
+            for size in sorted(options["sizes"]):
+                self.seed(size, seller, category, rng, words)
+                self.stdout.write(f"{size} listings:")
+                for query in QUERIES:
+                    fts = self.time(lambda: search_listings(query), options["repeat"])
+                    fallback = self.time(lambda: list(fallback_search(query)[:21]), options["repeat"])
+                    self.stdout.write(
+                        f"  {query!r:24} fts {fts * 1000:8.2f} ms   icontains {fallback * 1000:8.2f} ms"
+                    )
+
+    def seed(self, size, seller, category, rng, words, chunk=10_000):
+        # Zipf-like: a few words are common, most are rare, as in real listings
+        weights = list(itertools.accumulate(1 / rank for rank in range(1, len(words) + 1)))
+        rng.shuffle(words)
+        existing = AuctionListing.objects.count()
+        for start in range(existing, size, chunk):
+            AuctionListing.objects.bulk_create([
+                AuctionListing(
+                    title=" ".join(rng.choices(words, cum_weights=weights, k=3))[:64],
+                    description=" ".join(rng.choices(words, cum_weights=weights, k=10))[:100],
+                    starting_bid=Decimal("1.00"),
+                    seller=seller,
+                    category=category,
+                )
+                for _ in range(start, min(start + chunk, size))
+            ])
+
+    def time(self, run, repeat):
+        best = None
+        for _ in range(repeat):
+            began = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - began
+            best = elapsed if best is None else min(best, elapsed)
+        return best
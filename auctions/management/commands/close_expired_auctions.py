@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import OperationalError
+
+from auctions.closing import close_expired, deadline_scheduler
+
+
+class Command(BaseCommand):
+    help = (
+        "Close every auction whose end time has passed and record its winner. "
+        "Run it from cron, or pass --loop to keep it running and close each auction as it ends."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500,
+                            help="Listings closed per transaction.")
+        parser.add_argument("--loop", action="store_true",
+                            help="Keep running, sleeping until the next auction ends.")
+        parser.add_argument("--interval", type=float, default=30.0,
+                            help="Seconds between looking for newly listed deadlines with --loop.")
+        parser.add_argument("--horizon", type=float, default=300.0,
+                            help="How far ahead deadlines are loaded with --loop, in seconds.")
+
+    def handle(self, *args, **options):
+        if not options["loop"]:
+            closed = close_expired(batch_size=options["batch_size"])
+            if closed or options["verbosity"] > 1:
+                self.stdout.write(f"Closed {closed} expired auctions.")
+            return
+
+        scheduler = deadline_scheduler(
+            batch_size=options["batch_size"],
+            horizon=max(options["horizon"], options["interval"]),
+            refresh_interval=options["interval"],
+        )
+        while True:
+            try:
+                closed = scheduler.run_once()
+            except OperationalError as error:
+                # e.g. SQLite's "database is locked" under heavy bidding; the
+                # failed batch is still open and is reloaded by the next refresh
+                self.stderr.write(f"Closing failed, retrying: {error}")
+                scheduler.sleep(options["interval"])
+                continue
+            if closed or options["verbosity"] > 1:
+                self.stdout.write(f"Closed {closed} expired auctions.")
+            scheduler.sleep(max(0.0, scheduler.next_wakeup() - scheduler.clock()))
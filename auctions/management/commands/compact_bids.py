@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from auctions.ledger import compact_bids
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete raw bids older than --days on closed listings, keeping each bidder's highest. "
+        "Their counts and prices stay in the per-minute bid rollups."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=float, default=30, help="Keep bids newer than this many days.")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Listings compacted per transaction.")
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options["days"])
+        deleted, listings = compact_bids(before, options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Compacted {deleted} bids on {listings} listings."))
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from auctions.models import User
+from auctions.transfer import LISTING_FIELDS, file_format, import_listings, open_text
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream listings from a CSV or JSON Lines file (optionally gzipped, '-' for stdin) into "
+        f"the database for one seller. Columns: {', '.join(LISTING_FIELDS)}. Missing categories "
+        "are created; invalid rows are reported and skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--seller", required=True, help="Username the listings belong to.")
+        parser.add_argument("--format", choices=["csv", "jsonl"], help="Defaults to the file extension.")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows per bulk insert.")
+        parser.add_argument("--max-errors", type=int, default=20, help="Invalid rows to print.")
+
+    def handle(self, *args, **options):
+        try:
+            seller = User.objects.get(username=options["seller"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['seller']!r}.")
+        fmt = options["format"] or file_format(options["path"])
+        errors = []
+
+        def on_error(line, message):
+            if len(errors) < options["max_errors"]:
+                errors.append(f"line {line}: {message}")
+
+        began = time.perf_counter()
+        try:
+            with open_text(options["path"], "r") as stream:
+                imported, skipped = import_listings(stream, fmt, seller, options["batch_size"], on_error)
+        except OSError as error:
+            raise CommandError(error)
+        elapsed = time.perf_counter() - began
+
+        for error in errors:
+            self.stderr.write(error)
+        self.stdout.write(
+            f"Imported {imported} listings ({skipped} skipped) in {elapsed:.2f}s: "
+            f"{(imported + skipped) / elapsed if elapsed else 0:.0f} rows/sec"
+        )
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError
+
+from auctions import images
+from auctions.models import ListingImage
+
+
+class Command(BaseCommand):
+    help = (
+        "Fetch queued listing images and save WebP/JPEG thumbnails to media storage. "
+        "Run it from cron, or pass --loop to keep it running."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=20, help="Images fetched per round.")
+        parser.add_argument("--workers", type=int, default=4, help="Concurrent downloads.")
+        parser.add_argument("--retry-failed", action="store_true", help="Queue failed images again first.")
+        parser.add_argument("--loop", action="store_true",
+                            help="Keep running, checking every --interval seconds.")
+        parser.add_argument("--interval", type=float, default=10.0,
+                            help="Seconds between checks with --loop.")
+
+    def handle(self, *args, **options):
+        if images.Image is None:
+            raise CommandError("process_images needs Pillow (pip install Pillow).")
+        if options["retry_failed"]:
+            ListingImage.objects.filter(status=ListingImage.FAILED).update(status=ListingImage.PENDING, error="")
+
+        while True:
+            try:
+                ready = failed = 0
+                while True:
+                    batch = images.process_pending(options["batch_size"], options["workers"])
+                    ready, failed = ready + batch[0], failed + batch[1]
+                    if sum(batch) < options["batch_size"]:
+                        break
+            except OperationalError as error:
+                if not options["loop"]:
+                    raise
+                self.stderr.write(f"Processing failed, retrying: {error}")
+            else:
+                if ready or failed or options["verbosity"] > 1:
+                    self.stdout.write(f"Thumbnailed {ready} images, {failed} failed.")
+
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,64 @@
+import json
+import os
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from auctions.bench import percentile
+
+
+class Command(BaseCommand):
+    help = "Summarise the request profiling log by URL name, slowest total time first."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--log", default=settings.AUCTIONS_PROFILING_LOG,
+                            help="Profiling log to read; rotated copies (.1, .2, ...) are read too.")
+        parser.add_argument("--json", action="store_true", help="Print the summary as JSON.")
+
+    def handle(self, *args, **options):
+        paths = [options["log"]] + [f"{options['log']}.{n}" for n in range(1, 100)]
+        paths = [path for path in paths if os.path.exists(path)]
+        if not paths:
+            raise CommandError(f"No profiling log at {options['log']}; is AUCTIONS_PROFILING on?")
+
+        requests = defaultdict(list)
+        for path in paths:
+            with open(path) as log:
+                for line in log:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    requests[record.get("url_name") or record["path"]].append(record)
+
+        summary = []
+        for name, records in requests.items():
+            durations = sorted(record["duration_ms"] for record in records)
+            summary.append({
+                "url_name": name,
+                "requests": len(records),
+                "total_ms": round(sum(durations), 3),
+                "p50_ms": percentile(durations, 0.50),
+                "p95_ms": percentile(durations, 0.95),
+                "max_ms": durations[-1],
+                "queries_mean": round(sum(record["queries"] for record in records) / len(records), 2),
+                "sql_ms_mean": round(sum(record["sql_ms"] for record in records) / len(records), 3),
+                "duplicate_queries": sum(record["duplicate_queries"] for record in records),
+            })
+        summary.sort(key=lambda row: row["total_ms"], reverse=True)
+
+        if options["json"]:
+            self.stdout.write(json.dumps(summary, indent=2))
+            return
+
+        self.stdout.write(
+            f"{'url name':28} {'requests':>8} {'total ms':>10} {'p50 ms':>8} {'p95 ms':>8} "
+            f"{'max ms':>8} {'queries':>8} {'sql ms':>8} {'dups':>6}"
+        )
+        for row in summary:
+            self.stdout.write(
+                f"{row['url_name'][:28]:28} {row['requests']:8} {row['total_ms']:10.1f} {row['p50_ms']:8.1f} "
+                f"{row['p95_ms']:8.1f} {row['max_ms']:8.1f} {row['queries_mean']:8.1f} "
+                f"{row['sql_ms_mean']:8.2f} {row['duplicate_queries']:6}"
+            )
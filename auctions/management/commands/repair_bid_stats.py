@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+
+from auctions.bidding import repair_bid_stats
+from auctions.models import AuctionListing
+
+
+class Command(BaseCommand):
+    help = "Backfill or repair the highest_bid and bid_count columns of every listing."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000,
+                            help="Listings updated per statement.")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        last_id = AuctionListing.objects.aggregate(last=Max("id"))["last"] or 0
+        repaired = 0
+
+        # Walk the table in id ranges so each UPDATE holds its locks briefly
+        for start in range(0, last_id, batch_size):
+            repaired += repair_bid_stats(
+                AuctionListing.objects.filter(id__gt=start, id__lte=start + batch_size)
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Repaired bid stats for {repaired} listings."))
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError
+
+from auctions.notifications import deliver_all
+
+
+class Command(BaseCommand):
+    help = (
+        "Email every queued bid, comment and closing notification, one message per user "
+        "and listing. Run it from cron, or pass --loop to keep it running."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500,
+                            help="Notifications sent per transaction.")
+        parser.add_argument("--loop", action="store_true",
+                            help="Keep running, checking every --interval seconds.")
+        parser.add_argument("--interval", type=float, default=10.0,
+                            help="Seconds between checks with --loop.")
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                events, emails = deliver_all(batch_size=options["batch_size"])
+            except (OperationalError, OSError) as error:
+                # A locked database or an unreachable mail server; the batch stays queued
+                if not options["loop"]:
+                    raise
+                self.stderr.write(f"Sending failed, retrying: {error}")
+            else:
+                if events or options["verbosity"] > 1:
+                    self.stdout.write(f"Sent {emails} emails for {events} notifications.")
+
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
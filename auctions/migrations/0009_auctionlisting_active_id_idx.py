@@ -0,0 +1,17 @@
+# Generated by Django 5.0.14 on 2026-10-18 14:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0008_alter_auctionlisting_category'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auctionlisting',
+            index=models.Index(fields=['is_active', '-id'], name='listing_active_id_idx'),
+        ),
+    ]
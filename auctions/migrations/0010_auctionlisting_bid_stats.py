@@ -0,0 +1,41 @@
+# Generated by Django 5.0.14 on 2026-10-18 14:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_bid_stats(apps, schema_editor):
+    AuctionListing = apps.get_model('auctions', 'AuctionListing')
+    Bid = apps.get_model('auctions', 'Bid')
+    bids = Bid.objects.filter(listing=OuterRef('pk'))
+    AuctionListing.objects.update(
+        highest_bid=Subquery(bids.order_by('-bid_amount', 'id').values('id')[:1]),
+        bid_count=Coalesce(Subquery(bids.values('listing').annotate(n=Count('id')).values('n')), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0009_auctionlisting_active_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auctionlisting',
+            name='bid_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='auctionlisting',
+            name='highest_bid',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='auctions.bid'),
+        ),
+        migrations.AddIndex(
+            model_name='bid',
+            index=models.Index(fields=['listing', '-bid_amount'], name='bid_listing_amount_idx'),
+        ),
+        migrations.RunPython(backfill_bid_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+from auctions.search import FTS_TABLE, FTS_TRIGGERS, install_fts
+
+
+def create_search_index(apps, schema_editor):
+    install_fts(schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for trigger in FTS_TRIGGERS:
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0011_auctionlisting_end_time'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
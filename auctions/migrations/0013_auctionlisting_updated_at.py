@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-18 14:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0012_listing_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auctionlisting',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
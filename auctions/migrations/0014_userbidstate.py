@@ -0,0 +1,49 @@
+# Generated by Django 5.0.14 on 2026-10-18 14:43
+
+import itertools
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, F, Max, When
+
+
+def backfill_bid_states(apps, schema_editor):
+    Bid = apps.get_model('auctions', 'Bid')
+    UserBidState = apps.get_model('auctions', 'UserBidState')
+    states = Bid.objects.values('listing_id', 'bidder_id').annotate(
+        max_bid=Max('bid_amount'),
+        is_leading=Max(Case(When(listing__highest_bid=F('id'), then=1), default=0)),
+    ).order_by()
+    rows = (
+        UserBidState(listing_id=state['listing_id'], user_id=state['bidder_id'],
+                     max_bid=state['max_bid'], is_leading=bool(state['is_leading']))
+        for state in states.iterator(chunk_size=5000)
+    )
+    while batch := list(itertools.islice(rows, 5000)):
+        UserBidState.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0013_auctionlisting_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserBidState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('max_bid', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('is_leading', models.BooleanField(default=False)),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='auctions.auctionlisting')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bid_states', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='userbidstate',
+            constraint=models.UniqueConstraint(fields=('user', 'listing'), name='userbidstate_user_listing_uniq'),
+        ),
+        migrations.RunPython(backfill_bid_states, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.0.14 on 2026-10-18 14:48
+
+import itertools
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def queue_existing_images(apps, schema_editor):
+    AuctionListing = apps.get_model('auctions', 'AuctionListing')
+    ListingImage = apps.get_model('auctions', 'ListingImage')
+    rows = (
+        ListingImage(listing_id=listing_id, source_url=image_url)
+        for listing_id, image_url in AuctionListing.objects.exclude(image_url='')
+        .values_list('id', 'image_url').iterator(chunk_size=5000)
+    )
+    while batch := list(itertools.islice(rows, 5000)):
+        ListingImage.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0015_notification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_url', models.URLField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=8)),
+                ('thumbnails', models.JSONField(blank=True, default=dict)),
+                ('error', models.CharField(blank=True, max_length=255)),
+                ('listing', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='image', to='auctions.auctionlisting')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('status', 'pending')), fields=['id'], name='listingimage_pending_idx')],
+            },
+        ),
+        migrations.RunPython(queue_existing_images, migrations.RunPython.noop),
+    ]
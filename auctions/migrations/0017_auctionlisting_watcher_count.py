@@ -0,0 +1,29 @@
+# Generated by Django 5.0.14 on 2026-10-18 14:51
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+
+
+def count_watchers(apps, schema_editor):
+    AuctionListing = apps.get_model('auctions', 'AuctionListing')
+    Watch = AuctionListing.watchlist.through
+    AuctionListing.objects.filter(watchlist__isnull=False).distinct().update(watcher_count=Subquery(
+        Watch.objects.filter(auctionlisting_id=OuterRef('pk')).values('auctionlisting_id')
+        .annotate(watchers=Count('id')).values('watchers')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0016_listingimage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auctionlisting',
+            name='watcher_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_watchers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.14 on 2026-10-18 14:54
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0017_auctionlisting_watcher_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comments',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='comments',
+            index=models.Index(fields=['listing', 'created_at'], name='comment_listing_created_idx'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.0.14 on 2026-10-18 14:58
+
+import datetime
+import itertools
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def backfill_rollups(apps, schema_editor):
+    # Existing bids all got the same created_at above, so each listing has one bucket
+    Bid = apps.get_model('auctions', 'Bid')
+    BidRollup = apps.get_model('auctions', 'BidRollup')
+    size = getattr(settings, 'AUCTIONS_BID_BUCKET_SECONDS', 60)
+    rows = (
+        BidRollup(
+            listing_id=row['listing_id'],
+            bucket=row['created_at'] - datetime.timedelta(seconds=row['created_at'].timestamp() % size),
+            bids=row['bids'],
+            max_price=row['max_price'],
+        )
+        for row in Bid.objects.values('listing_id', 'created_at')
+        .annotate(bids=Count('id'), max_price=Max('bid_amount')).order_by().iterator(chunk_size=5000)
+    )
+    while batch := list(itertools.islice(rows, 5000)):
+        BidRollup.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0018_comments_created_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bid',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.CreateModel(
+            name='BidRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('bids', models.PositiveIntegerField(default=0)),
+                ('max_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bid_rollups', to='auctions.auctionlisting')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='bidrollup',
+            constraint=models.UniqueConstraint(fields=('listing', 'bucket'), name='bidrollup_listing_bucket_uniq'),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
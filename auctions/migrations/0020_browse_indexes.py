@@ -0,0 +1,39 @@
+# Generated by Django 5.0.14 on 2026-10-18 15:09
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0019_bid_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auctionlisting',
+            name='price',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.comparison.Coalesce('current_price', 'starting_bid'), output_field=models.DecimalField(decimal_places=2, max_digits=10)),
+        ),
+        migrations.AddIndex(
+            model_name='auctionlisting',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['category', '-id'], name='listing_cat_active_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auctionlisting',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['price', 'id'], name='listing_active_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auctionlisting',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['category', 'price', 'id'], name='listing_cat_active_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auctionlisting',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-bid_count', '-id'], name='listing_active_bids_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auctionlisting',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['category', '-bid_count', '-id'], name='listing_cat_active_bids_idx'),
+        ),
+    ]
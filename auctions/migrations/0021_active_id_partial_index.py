@@ -0,0 +1,21 @@
+# Generated by Django 5.0.14 on 2026-10-18 15:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0020_browse_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='auctionlisting',
+            name='listing_active_id_idx',
+        ),
+        migrations.AddIndex(
+            model_name='auctionlisting',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-id'], name='listing_active_id_idx'),
+        ),
+    ]
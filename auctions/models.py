@@ -1,5 +1,8 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
 
 class User(AbstractUser):
@@ -24,6 +27,42 @@ class AuctionListing(models.Model):
     seller = models.ForeignKey(User, on_delete=models.CASCADE, related_name="listings")
     watchlist = models.ManyToManyField(User, related_name="listing_watchlist")
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name="listings")
+    # Maintained by auctions.bidding so pages never have to sort the bids
+    highest_bid = models.ForeignKey("Bid", on_delete=models.SET_NULL, related_name="+", null=True, blank=True)
+    bid_count = models.PositiveIntegerField(default=0)
+    # What a listing sells for right now, the starting bid until someone bids;
+    # computed by the database so the browse pages can filter and sort on it
+    price = models.GeneratedField(
+        expression=Coalesce("current_price", "starting_bid"),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        db_persist=True,
+    )
+    # Maintained by auctions.signals whenever the watchlist changes
+    watcher_count = models.PositiveIntegerField(default=0)
+    # Optional; expired listings are closed by the close_expired_auctions command
+    end_time = models.DateTimeField(null=True, blank=True)
+    # Last-Modified for the API; bulk writers (bidding, closing) set it explicitly
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # The newest-first active listings feed. Partial, as a leading is_active
+            # column can't be used by SQLite, where Django filters on a bare
+            # "is_active". While most listings are active SQLite prefers walking
+            # the table in id order, which needs no sort either
+            models.Index(fields=["-id"], condition=Q(is_active=True), name="listing_active_id_idx"),
+            # Lets the closing worker find expired auctions without a table scan
+            models.Index(fields=["is_active", "end_time"], name="listing_active_end_idx"),
+            # Browsing active listings (auctions.browse) in each sort order, site-wide
+            # and per category. Partial, so closed listings cost them nothing
+            models.Index(fields=["category", "-id"], condition=Q(is_active=True), name="listing_cat_active_id_idx"),
+            models.Index(fields=["price", "id"], condition=Q(is_active=True), name="listing_active_price_idx"),
+            models.Index(fields=["category", "price", "id"], condition=Q(is_active=True),
+                         name="listing_cat_active_price_idx"),
+            models.Index(fields=["-bid_count", "-id"], condition=Q(is_active=True), name="listing_active_bids_idx"),
+            models.Index(fields=["category", "-bid_count", "-id"], condition=Q(is_active=True),
+                         name="listing_cat_active_bids_idx"),
+        ]
 
     def __str__(self):
         return self.title
@@ -33,11 +72,105 @@ class Bid(models.Model):
     bid_amount = models.DecimalField(max_digits=10, decimal_places=2)
     listing = models.ForeignKey(AuctionListing, on_delete=models.CASCADE, related_name="bids")
     bidder = models.ForeignKey(User, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["listing", "-bid_amount"], name="bid_listing_amount_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        # The bids are a ledger: the rollups and bid_count have counted this one already
+        if not self._state.adding:
+            raise ValueError("Bids are append-only and cannot be changed.")
+        super().save(*args, **kwargs)
+
+
+class BidRollup(models.Model):
+    """Bids per time bucket on a listing, kept by auctions.ledger."""
+    listing = models.ForeignKey(AuctionListing, on_delete=models.CASCADE, related_name="bid_rollups")
+    # Start of the bucket (AUCTIONS_BID_BUCKET_SECONDS long)
+    bucket = models.DateTimeField()
+    bids = models.PositiveIntegerField(default=0)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            # Also serves the chart query, a listing's buckets in order
+            models.UniqueConstraint(fields=["listing", "bucket"], name="bidrollup_listing_bucket_uniq"),
+        ]
+
+class ListingImage(models.Model):
+    """Thumbnails of a listing's image_url, made by auctions.images."""
+    PENDING = "pending"
+    READY = "ready"
+    FAILED = "failed"
+    STATUSES = [(PENDING, "Pending"), (READY, "Ready"), (FAILED, "Failed")]
+
+    listing = models.OneToOneField(AuctionListing, on_delete=models.CASCADE, related_name="image")
+    source_url = models.URLField()
+    status = models.CharField(max_length=8, choices=STATUSES, default=PENDING)
+    # {"<width>": {"webp": "<storage name>", "jpeg": "<storage name>"}}
+    thumbnails = models.JSONField(default=dict, blank=True)
+    error = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["id"], condition=models.Q(status="pending"), name="listingimage_pending_idx"),
+        ]
+
+class UserBidState(models.Model):
+    """Each user's standing on each listing they bid on, kept by auctions.bidding."""
+    listing = models.ForeignKey(AuctionListing, on_delete=models.CASCADE, related_name="+")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="bid_states")
+    max_bid = models.DecimalField(max_digits=10, decimal_places=2)
+    is_leading = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            # Also the index behind the dashboard query and the bid upsert
+            models.UniqueConstraint(fields=["user", "listing"], name="userbidstate_user_listing_uniq"),
+        ]
+
+class Notification(models.Model):
+    """A queued email event; sent and coalesced by auctions.notifications."""
+    OUTBID = "outbid"
+    BID = "bid"
+    COMMENT = "comment"
+    WON = "won"
+    CLOSED = "closed"
+    KINDS = [
+        (OUTBID, "You were outbid"),
+        (BID, "New bid"),
+        (COMMENT, "New comment"),
+        (WON, "You won"),
+        (CLOSED, "Auction closed"),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="notifications")
+    listing = models.ForeignKey(AuctionListing, on_delete=models.CASCADE, related_name="+")
+    kind = models.CharField(max_length=16, choices=KINDS)
+    detail = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Only the unsent rows, which is all the worker ever looks for
+            models.Index(fields=["id"], condition=models.Q(sent_at__isnull=True), name="notification_pending_idx"),
+        ]
 
 class Comments(models.Model):
     message = models.TextField()
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name="comments")
     listing = models.ForeignKey(AuctionListing, on_delete=models.CASCADE, related_name="comments")
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Serves a listing's comments newest first, one cursor page at a time
+            models.Index(fields=["listing", "created_at"], name="comment_listing_created_idx"),
+        ]
 
     def __str__(self):
         return f"{self.author.username}: {self.message[:20]}..."
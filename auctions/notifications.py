@@ -0,0 +1,137 @@
+"""Email notifications about bids, comments and closed auctions.
+
+Nothing is sent while a request is being served. Bidding, commenting and
+closing only insert ``Notification`` rows, in the same transaction as the
+change they describe, so a rolled-back bid never notifies anyone and a
+committed one always will. The ``send_notifications`` worker drains the queue
+in batches and sends one email per user and listing however many events piled
+up for them since the last run.
+"""
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import AuctionListing, Notification, UserBidState
+
+
+def _interested(listing_ids):
+    """``listing id -> user ids`` of the sellers and watchers of the listings."""
+    interested = defaultdict(set)
+    # One query: each listing's seller joined to its watchers (None if it has none)
+    for listing_id, seller_id, watcher_id in AuctionListing.objects.filter(pk__in=listing_ids).values_list(
+        "id", "seller_id", "watchlist"
+    ):
+        interested[listing_id].add(seller_id)
+        if watcher_id is not None:
+            interested[listing_id].add(watcher_id)
+    return interested
+
+
+def _enqueue(notifications):
+    Notification.objects.bulk_create(
+        Notification(user_id=user_id, listing_id=listing_id, kind=kind, detail=detail)
+        for user_id, listing_id, kind, detail in notifications
+    )
+
+
+def bid_placed(listing_id, bidder, amount, previous_leader_id):
+    """Tell the outbid leader, the seller and the watchers about a new bid."""
+    notifications = []
+    if previous_leader_id is not None and previous_leader_id != bidder.pk:
+        notifications.append((previous_leader_id, listing_id, Notification.OUTBID,
+                              f"{bidder.username} outbid you with £{amount}."))
+    for user_id in _interested([listing_id])[listing_id] - {bidder.pk, previous_leader_id}:
+        notifications.append((user_id, listing_id, Notification.BID, f"{bidder.username} bid £{amount}."))
+    _enqueue(notifications)
+
+
+def comment_posted(comment):
+    """Tell the seller and the watchers about a new comment."""
+    _enqueue(
+        (user_id, comment.listing_id, Notification.COMMENT, f"{comment.author.username}: {comment.message[:200]}")
+        for user_id in _interested([comment.listing_id])[comment.listing_id] - {comment.author_id}
+    )
+
+
+def listings_closed(listings):
+    """Tell the winners, sellers, watchers and bidders of closed listings."""
+    ids = [listing.id for listing in listings]
+    interested = _interested(ids)
+    for listing_id, user_id in UserBidState.objects.filter(listing_id__in=ids).values_list("listing_id", "user_id"):
+        interested[listing_id].add(user_id)
+
+    notifications = []
+    for listing in listings:
+        price = listing.current_price or listing.starting_bid
+        if listing.winner_id:
+            notifications.append((listing.winner_id, listing.id, Notification.WON, f"You won at £{price}."))
+        detail = f"Sold for £{price}." if listing.winner_id else "Closed without bids."
+        for user_id in interested[listing.id] - {listing.winner_id}:
+            notifications.append((user_id, listing.id, Notification.CLOSED, detail))
+    _enqueue(notifications)
+
+
+def email_for(user, listing, notifications):
+    """One email covering every pending event for a user on a listing."""
+    if len(notifications) == 1:
+        subject = f"{notifications[0].get_kind_display()}: {listing.title}"
+    else:
+        subject = f"{len(notifications)} updates on {listing.title}"
+    lines = [f"- {notification.get_kind_display()}: {notification.detail}" for notification in notifications]
+    return EmailMessage(subject, "\n".join(lines), settings.DEFAULT_FROM_EMAIL, [user.email])
+
+
+def deliver_pending(batch_size=500):
+    """Send the oldest ``batch_size`` pending notifications. Returns ``(events, emails)``.
+
+    Events queued for the same users and listings ride along, so a batch can
+    be somewhat larger than ``batch_size``.
+
+    Rows are marked sent in the transaction that sends them, so a failed send
+    rolls back and the batch is retried on the next run.
+    """
+    pending = Notification.objects.filter(sent_at__isnull=True)
+    with transaction.atomic():
+        oldest = list(pending.order_by("id").values_list("user_id", "listing_id")[:batch_size])
+        if not oldest:
+            return 0, 0
+        # Take every pending event of the same users and listings as well, so
+        # one email covers them all even when they straddle batches
+        batch = list(
+            pending.filter(user_id__in={user_id for user_id, _ in oldest},
+                           listing_id__in={listing_id for _, listing_id in oldest})
+            .select_for_update(skip_locked=True)
+            .select_related("user", "listing")
+            .order_by("id")
+        )
+
+        grouped = defaultdict(list)
+        for notification in batch:
+            grouped[notification.user_id, notification.listing_id].append(notification)
+        emails = [
+            email_for(notifications[0].user, notifications[0].listing, notifications)
+            for notifications in grouped.values()
+            # Users without an address are skipped but still marked as sent
+            if notifications[0].user.email
+        ]
+        if emails:
+            get_connection().send_messages(emails)
+
+        Notification.objects.filter(pk__in=[notification.pk for notification in batch]).update(
+            sent_at=timezone.now()
+        )
+    return len(batch), len(emails)
+
+
+def deliver_all(batch_size=500):
+    """Drain the queue. Returns ``(events, emails)``."""
+    events = emails = 0
+    while True:
+        sent = deliver_pending(batch_size)
+        events, emails = events + sent[0], emails + sent[1]
+        if not sent[0]:
+            return events, emails
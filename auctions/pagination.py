@@ -0,0 +1,73 @@
+"""Keyset (cursor) pagination helpers.
+
+OFFSET pagination makes the database walk every skipped row, so deep pages get
+slower as the table grows. Keyset pagination instead remembers the last id that
+was shown and asks for rows "before" it, which an index on the ordering columns
+answers directly no matter how far the reader has scrolled.
+"""
+
+from django.db.models import Subquery
+
+
+def parse_cursor(value):
+    """Turn a ``?before=`` query parameter into an id, ignoring junk."""
+    try:
+        cursor = int(value)
+    except (TypeError, ValueError):
+        return None
+    return cursor if cursor > 0 else None
+
+
+def _cut(rows, limit):
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    # .values() querysets hand back dicts, model querysets hand back instances
+    return rows, last["id"] if isinstance(last, dict) else last.id
+
+
+def ordered_page(queryset, limit=24):
+    """Return ``(rows, next_cursor)`` for a queryset already ordered and cut at the cursor.
+
+    One extra row is fetched to find out whether another page exists, so the
+    caller never needs a ``COUNT(*)``. The next cursor is the last row's id.
+    """
+    return _cut(list(queryset[:limit + 1]), limit)
+
+
+async def aordered_page(queryset, limit=24):
+    """Async ``ordered_page()`` for async views."""
+    return _cut([row async for row in queryset[:limit + 1]], limit)
+
+
+def keyset_page(queryset, before=None, limit=24):
+    """Return ``(rows, next_cursor)`` for ``queryset`` ordered newest first."""
+    if before is not None:
+        queryset = queryset.filter(id__lt=before)
+    return ordered_page(queryset.order_by("-id"), limit)
+
+
+def _older_than(queryset, before, field):
+    # The cursor row's timestamp comes from a subquery, so the page is still
+    # one query and the (..., field) index answers it as a range scan
+    stamp = Subquery(queryset.model._default_manager.filter(pk=before).values(field)[:1])
+    return queryset.filter(**{f"{field}__lte": stamp}).exclude(**{field: stamp, "id__gte": before})
+
+
+def timeline_page(queryset, before=None, limit=20, field="created_at"):
+    """``keyset_page()`` for rows ordered newest first by a timestamp ``field``.
+
+    Rows with the same timestamp are ordered by id. The cursor is still the id
+    of the last row shown.
+    """
+    if before is not None:
+        queryset = _older_than(queryset, before, field)
+    return ordered_page(queryset.order_by(f"-{field}", "-id"), limit)
+
+
+async def atimeline_page(queryset, before=None, limit=20, field="created_at"):
+    """Async ``timeline_page()`` for async views."""
+    if before is not None:
+        queryset = _older_than(queryset, before, field)
+    return await aordered_page(queryset.order_by(f"-{field}", "-id"), limit)
@@ -0,0 +1,170 @@
+"""Per-request timing and SQL instrumentation.
+
+``RequestProfilingMiddleware`` is listed in ``MIDDLEWARE`` but stays out of the
+request path unless ``AUCTIONS_PROFILING`` is on. When enabled it times every
+request, counts its SQL queries and their total time, spots repeated queries
+(the usual sign of an N+1 loop) and reports all of it in a ``Server-Timing``
+header. Each request is also written as one JSON line to the
+``auctions.profiling`` logger, and the slowest requests are kept in memory.
+
+The middleware works under WSGI and ASGI. Async views run their queries in
+``sync_to_async`` worker threads with connections of their own, so queries are
+attributed to requests through a context variable rather than by wrapping the
+calling thread's connections.
+"""
+
+import heapq
+import itertools
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger("auctions.profiling")
+
+
+class QueryRecorder:
+    """A database execute wrapper that times every query it sees."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+            self.statements[(sql, repr(params))] += 1
+
+    @property
+    def duplicates(self):
+        """Queries that repeat an earlier one exactly, parameters included."""
+        return sum(count - 1 for count in self.statements.values())
+
+    @property
+    def similar(self):
+        """Queries that repeat an earlier statement with different parameters."""
+        templates = Counter(sql for sql, _ in self.statements.elements())
+        return sum(count - 1 for count in templates.values()) - self.duplicates
+
+
+class SlowestRequests:
+    """Thread-safe store of the ``size`` slowest requests seen by this process."""
+
+    def __init__(self, size):
+        self.size = size
+        self._heap = []
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        entry = (record["duration_ms"], next(self._order), record)
+        with self._lock:
+            if len(self._heap) < self.size:
+                heapq.heappush(self._heap, entry)
+            elif entry > self._heap[0]:
+                heapq.heapreplace(self._heap, entry)
+
+    def records(self):
+        with self._lock:
+            return [record for _, _, record in sorted(self._heap, reverse=True)]
+
+    def clear(self):
+        with self._lock:
+            self._heap.clear()
+
+
+current_recorder = ContextVar("auctions_query_recorder", default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper that hands the query to the current request's recorder, if any."""
+    recorder = current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install_recorder(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def install_recorders():
+    """Wrap the calling thread's connections; new ones are wrapped as they connect."""
+    for connection in connections.all():
+        install_recorder(connection)
+
+
+slowest_requests = SlowestRequests(getattr(settings, "AUCTIONS_PROFILING_SLOWEST", 50))
+
+
+class RequestProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "AUCTIONS_PROFILING", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        connection_created.connect(install_recorder, dispatch_uid="auctions.profiling")
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        install_recorders()
+        recorder = QueryRecorder()
+        token = current_recorder.set(recorder)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        return self.report(request, response, recorder, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        # Runs on the thread this request's sync_to_async calls will use
+        await sync_to_async(install_recorders)()
+        recorder = QueryRecorder()
+        token = current_recorder.set(recorder)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        return self.report(request, response, recorder, time.perf_counter() - started)
+
+    def report(self, request, response, recorder, duration):
+        match = request.resolver_match
+        record = {
+            "method": request.method,
+            "path": request.path,
+            "url_name": match.view_name if match else None,
+            "status": response.status_code,
+            "duration_ms": round(duration * 1000, 3),
+            "queries": recorder.count,
+            "sql_ms": round(recorder.seconds * 1000, 3),
+            "duplicate_queries": recorder.duplicates,
+            "similar_queries": recorder.similar,
+        }
+        response["Server-Timing"] = ", ".join([
+            f"total;dur={record['duration_ms']}",
+            f'sql;dur={record["sql_ms"]};desc="{recorder.count} queries, {recorder.duplicates} duplicates"',
+        ])
+        slowest_requests.add(record)
+        logger.info(json.dumps(record))
+        return response
@@ -0,0 +1,114 @@
+"""Per-user and per-IP rate limits for the write endpoints.
+
+``@rate_limit("bids")`` caps how often one user, and separately one IP
+address, may POST to a view. Limits are set per scope in
+``AUCTIONS_RATE_LIMITS`` as ``(requests, seconds)``; a scope that is missing
+or ``None`` is unlimited.
+
+The state lives in the Django cache, never the database: each check is an
+``add`` and an atomic ``incr`` per counter plus one ``get_many``. A true token
+bucket needs a compare-and-set, which the cache API lacks, so it is
+approximated with a counter per fixed window, the previous window's count
+weighted by how much of it still overlaps the last ``seconds``. Like a token
+bucket this allows short bursts up to the limit and refills smoothly, without
+the double burst around a window boundary that a plain fixed window allows.
+Rejected requests are not counted, so a client that keeps hammering regains
+its allowance as soon as it slows down.
+"""
+
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+
+
+def _now():
+    return time.time()
+
+
+def get_limit(scope):
+    return getattr(settings, "AUCTIONS_RATE_LIMITS", {}).get(scope)
+
+
+def client_ip(request):
+    # REMOTE_ADDR is the proxy's address behind a reverse proxy; have the proxy
+    # set it from X-Forwarded-For rather than trusting the header here
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def identities(request):
+    """Who a request counts against: its IP address and, if logged in, its user."""
+    keys = [f"ip:{client_ip(request)}"]
+    if request.user.is_authenticated:
+        keys.append(f"user:{request.user.pk}")
+    return keys
+
+
+def _window_key(scope, identity, window):
+    return f"auctions:ratelimit:{scope}:{identity}:{window}"
+
+
+def _hit(key, timeout):
+    cache.add(key, 0, timeout)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(key, 1, timeout)
+        return 1
+
+
+def check(scope, keys):
+    """Count a request against every key; returns seconds to wait if it is over the limit, else None."""
+    limit = get_limit(scope)
+    if not limit:
+        return None
+    requests, period = limit
+    now = _now()
+    window = int(now // period)
+    # How much of the previous window still falls within the last ``period`` seconds
+    overlap = 1 - (now % period) / period
+
+    current = {key: _window_key(scope, key, window) for key in keys}
+    counts = {key: _hit(current[key], period * 2) for key in keys}
+    previous = cache.get_many([_window_key(scope, key, window - 1) for key in keys])
+    over = [
+        key for key in keys
+        if previous.get(_window_key(scope, key, window - 1), 0) * overlap + counts[key] > requests
+    ]
+    if not over:
+        return None
+
+    for key in keys:
+        try:
+            cache.decr(current[key])
+        except ValueError:
+            pass
+    # The previous window's weight has run out by the next boundary at the latest
+    return max(1, math.ceil(period - now % period))
+
+
+def rate_limit(scope, methods=("POST",), json=False):
+    """Reject ``methods`` requests over the scope's limit with a 429.
+
+    API views pass ``json=True`` to get the error as JSON.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method in methods:
+                retry_after = check(scope, identities(request))
+                if retry_after is not None:
+                    message = "Too many requests. Please slow down."
+                    if json:
+                        response = JsonResponse({"error": message}, status=429)
+                    else:
+                        response = HttpResponse(message, status=429, content_type="text/plain")
+                    response["Retry-After"] = str(retry_after)
+                    return response
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
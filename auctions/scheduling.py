@@ -0,0 +1,100 @@
+"""An in-process scheduler that closes auctions as their deadlines pass.
+
+Polling ``close_expired`` every few seconds either closes auctions late or
+keeps querying for deadlines that are nowhere near. ``DeadlineScheduler``
+instead loads the deadlines falling within the next ``horizon`` seconds into a
+heap, sleeps until the earliest one and hands every deadline that has come due
+to the closer in one batch. It reloads the upcoming deadlines every
+``refresh_interval`` seconds (an index range scan over the next few minutes,
+never the whole table) to pick up new listings.
+
+A deadline can move after it was loaded (soft close extends an auction when a
+late bid comes in). The heap is never searched: the closer checks each due
+listing against the database, and returns the ones that are not due after
+all with their new deadlines, which are pushed back onto the heap.
+
+Time comes from the ``clock`` and ``sleep`` callables, so tests can drive
+thousands of deadlines through a fake clock instantly.
+"""
+
+import heapq
+import time
+
+
+class DeadlineScheduler:
+    """Call ``close`` for keys whose deadline has passed, in batches.
+
+    ``load(until)`` returns ``(deadline, key)`` pairs for everything due by
+    ``until``. ``close(keys, now)`` closes the keys that are due and returns
+    ``(deadline, key)`` pairs for those whose deadline has moved on. Deadlines
+    and ``now`` are seconds since the epoch, as returned by ``clock``.
+    """
+
+    def __init__(self, load, close, clock=time.time, sleep=time.sleep,
+                 horizon=300.0, refresh_interval=30.0, batch_size=500):
+        if refresh_interval > horizon:
+            raise ValueError("refresh_interval must not exceed horizon, or deadlines could be missed.")
+        self.load = load
+        self.close = close
+        self.clock = clock
+        self.sleep = sleep
+        self.horizon = horizon
+        self.refresh_interval = refresh_interval
+        self.batch_size = batch_size
+        self._heap = []
+        # key -> the deadline its live heap entry is for; other entries are stale
+        self._deadlines = {}
+        self._next_refresh = None
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def schedule(self, key, deadline):
+        if self._deadlines.get(key) == deadline:
+            return
+        self._deadlines[key] = deadline
+        heapq.heappush(self._heap, (deadline, key))
+
+    def refresh(self):
+        now = self.clock()
+        for deadline, key in self.load(now + self.horizon):
+            self.schedule(key, deadline)
+        self._next_refresh = now + self.refresh_interval
+
+    def next_wakeup(self):
+        """When ``run_once`` next has anything to do."""
+        while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        if self._next_refresh is None:
+            return self.clock()
+        return min(self._heap[0][0], self._next_refresh) if self._heap else self._next_refresh
+
+    def run_due(self):
+        """Close everything due now. Returns the number of keys closed."""
+        closed = 0
+        while True:
+            now = self.clock()
+            due = []
+            while self._heap and self._heap[0][0] <= now and len(due) < self.batch_size:
+                deadline, key = heapq.heappop(self._heap)
+                if self._deadlines.get(key) == deadline:
+                    del self._deadlines[key]
+                    due.append(key)
+            if not due:
+                return closed
+            moved = list(self.close(due, now))
+            for deadline, key in moved:
+                self.schedule(key, deadline)
+            closed += len(due) - len(moved)
+
+    def run_once(self):
+        """Reload deadlines if it is time to, then close whatever is due."""
+        if self._next_refresh is None or self.clock() >= self._next_refresh:
+            self.refresh()
+        return self.run_due()
+
+    def run(self, stop=lambda: False):
+        """Keep closing auctions until ``stop()`` returns true."""
+        while not stop():
+            self.run_once()
+            self.sleep(max(0.0, self.next_wakeup() - self.clock()))
@@ -0,0 +1,138 @@
+"""Full-text search over listing titles and descriptions.
+
+On SQLite the listings are indexed by an FTS5 virtual table,
+``auctions_listing_fts``, which uses the listing table itself as its content
+and is kept in sync by triggers. Results are ranked with bm25, weighting title
+matches above description matches. Other databases fall back to
+``icontains`` filters, which scan the table.
+"""
+
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import AuctionListing
+
+FTS_TABLE = "auctions_listing_fts"
+LISTING_TABLE = AuctionListing._meta.db_table
+
+# Title matches count ten times as much as description matches
+RANK = f"bm25({FTS_TABLE}, 10.0, 1.0)"
+
+# The deepest page served; deeper pages would make SQLite rank and skip
+# every match before them, and a huge page overflows the OFFSET
+MAX_PAGE = 500
+
+# SQLite's largest integer; no listing or category has a larger id
+MAX_ID = 2 ** 63 - 1
+
+FTS_SCHEMA = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, description, content='{LISTING_TABLE}', content_rowid='id'
+    )""",
+]
+
+FTS_TRIGGERS = {
+    f"{FTS_TABLE}_insert": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON {LISTING_TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description);
+        END""",
+    f"{FTS_TABLE}_delete": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON {LISTING_TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+        END""",
+    f"{FTS_TABLE}_update": f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF title, description ON {LISTING_TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description);
+        END""",
+}
+
+
+def fts_available(using=connection):
+    return using.vendor == "sqlite"
+
+
+def install_fts(using=connection):
+    """Create the FTS5 table and its triggers if they are missing.
+
+    SQLite drops a table's triggers whenever Django rebuilds the table during a
+    migration, so this runs after every ``migrate`` as well as from the
+    migration that introduced search. The index is rebuilt from the listings
+    whenever a trigger had to be recreated.
+    """
+    if not fts_available(using):
+        return
+    with using.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        existing = {row[0] for row in cursor.fetchall()}
+        for statement in FTS_SCHEMA:
+            cursor.execute(statement)
+        if not existing.issuperset(FTS_TRIGGERS):
+            for statement in FTS_TRIGGERS.values():
+                cursor.execute(statement)
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def match_expression(query):
+    """Turn free text into an FTS5 query: every word must match, as a prefix.
+
+    Words are quoted, so FTS5 operators typed by users are searched for
+    literally rather than parsed.
+    """
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", query))
+
+
+def search_listings(query, category_id=None, active_only=True, page=1, per_page=20):
+    """Return ``(listings, has_next)`` for one page of search results."""
+    page = min(page, MAX_PAGE)
+    offset = (page - 1) * per_page
+    if not re.search(r"\w", query or ""):
+        return [], False
+    if category_id is not None and category_id > MAX_ID:
+        return [], False
+
+    if fts_available():
+        ids = _fts_ids(query, category_id, active_only, offset, per_page + 1)
+        listings = AuctionListing.objects.in_bulk(ids[:per_page])
+        results = [listings[listing_id] for listing_id in ids[:per_page] if listing_id in listings]
+        return results, len(ids) > per_page
+
+    results = list(fallback_search(query, category_id, active_only)[offset:offset + per_page + 1])
+    return results[:per_page], len(results) > per_page
+
+
+def _fts_ids(query, category_id, active_only, offset, limit):
+    conditions = [f"{FTS_TABLE} MATCH %s"]
+    params = [match_expression(query)]
+    if active_only:
+        conditions.append("listing.is_active")
+    if category_id is not None:
+        conditions.append("listing.category_id = %s")
+        params.append(category_id)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""SELECT listing.id FROM {FTS_TABLE}
+                JOIN {LISTING_TABLE} AS listing ON listing.id = {FTS_TABLE}.rowid
+                WHERE {" AND ".join(conditions)}
+                ORDER BY {RANK}, listing.id DESC
+                LIMIT %s OFFSET %s""",
+            params + [limit, offset],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def fallback_search(query, category_id=None, active_only=True):
+    """The ``LIKE '%word%'`` search used where FTS5 is unavailable."""
+    listings = AuctionListing.objects.all()
+    for word in re.findall(r"\w+", query):
+        listings = listings.filter(Q(title__icontains=word) | Q(description__icontains=word))
+    if active_only:
+        listings = listings.filter(is_active=True)
+    if category_id is not None:
+        listings = listings.filter(category_id=category_id)
+    return listings.order_by("-id")
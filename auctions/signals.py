@@ -0,0 +1,86 @@
+from django.db import connections
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from . import directory, images, notifications, watchlists
+from .caching import bump_listing_version
+from .models import AuctionListing, Bid, Category, Comments
+from .search import install_fts
+
+
+@receiver(post_save, sender=AuctionListing)
+@receiver(post_delete, sender=AuctionListing)
+def listing_changed(sender, instance, **kwargs):
+    bump_listing_version(instance.pk)
+
+
+@receiver(post_save, sender=AuctionListing)
+def listing_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        if instance.is_active:
+            directory.adjust_active_listings(instance.category_id, 1)
+        images.queue_image(instance, created=True)
+    elif update_fields is None:
+        # A full save (e.g. from the admin) may have moved the listing to another
+        # category or reopened it; targeted saves adjust the counts themselves
+        directory.invalidate_directory()
+        images.queue_image(instance)
+
+
+@receiver(post_delete, sender=AuctionListing)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def categories_changed(sender, **kwargs):
+    directory.invalidate_directory()
+
+
+@receiver(post_save, sender=Bid)
+@receiver(post_delete, sender=Bid)
+@receiver(post_save, sender=Comments)
+@receiver(post_delete, sender=Comments)
+def listing_child_changed(sender, instance, **kwargs):
+    bump_listing_version(instance.listing_id)
+
+
+@receiver(post_save, sender=Comments)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        notifications.comment_posted(instance)
+
+
+@receiver(m2m_changed, sender=AuctionListing.watchlist.through)
+def watchlist_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # instance is the listing and pk_set users, or with reverse the user and pk_set listings
+    if action in ("post_add", "post_remove"):
+        if not pk_set:
+            return
+        user_ids, listing_ids = ({instance.pk}, pk_set) if reverse else (pk_set, {instance.pk})
+        if action == "post_add":
+            # Only newly added rows are reported, so the counts can be bumped
+            watchlists.adjust_watchers(listing_ids, 1 if reverse else len(pk_set))
+        else:
+            watchlists.recount_watchers(listing_ids)
+        watchlists.apply_changes(user_ids, listing_ids, added=action == "post_add")
+    elif action == "pre_clear":
+        # pk_set doesn't say which rows are going, so look them up first; the
+        # listing side recounts in post_clear once its rows are gone
+        if reverse:
+            listing_ids = list(instance.listing_watchlist.values_list("id", flat=True))
+            watchlists.adjust_watchers(listing_ids, -1)
+            watchlists.forget([instance.pk])
+        else:
+            watchlists.forget(list(instance.watchlist.values_list("id", flat=True)))
+            return
+    elif action == "post_clear" and not reverse:
+        listing_ids = [instance.pk]
+        watchlists.recount_watchers(listing_ids)
+    else:
+        return
+    # Listing pages show whether the viewer watches them, and how many do
+    for listing_id in listing_ids:
+        bump_listing_version(listing_id)
+
+
+def install_search_index(sender, using, **kwargs):
+    # Connected to post_migrate in AuctionsConfig.ready()
+    install_fts(connections[using])
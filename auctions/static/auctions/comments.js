@@ -0,0 +1,43 @@
+// "Show older comments" on the listing page.
+// Fetches one older page of the JSON comments feed at a time and puts it above the ones shown.
+document.addEventListener('DOMContentLoaded', () => {
+    const list = document.querySelector('#comments');
+    const older = document.querySelector('#older-comments');
+    if (!list || !older) {
+        return;
+    }
+
+    function item(comment) {
+        const li = document.createElement('li');
+        li.className = 'list-group-item';
+
+        const posted = document.createElement('p');
+        posted.textContent = `Posted by ${comment.author} `;
+        const when = document.createElement('small');
+        when.className = 'text-muted';
+        when.textContent = new Date(comment.created_at).toLocaleString();
+        posted.append(when);
+
+        li.append(comment.message, document.createElement('br'), posted);
+        return li;
+    }
+
+    older.addEventListener('click', () => {
+        older.disabled = true;
+        fetch(older.dataset.feed)
+            .then(response => response.json())
+            .then(data => {
+                // Newest first, so each one goes above the last
+                data.comments.forEach(comment => list.prepend(item(comment)));
+                if (data.next) {
+                    older.dataset.feed = data.next;
+                    older.disabled = false;
+                } else {
+                    older.remove();
+                }
+            })
+            .catch(() => {
+                older.disabled = false;
+            });
+    });
+});
@@ -0,0 +1,111 @@
+// Infinite scroll for the active listings page.
+// Fetches one page of the JSON feed at a time when "Load more" scrolls into view.
+document.addEventListener('DOMContentLoaded', () => {
+    const container = document.querySelector('#listings');
+    const more = document.querySelector('#load-more');
+    if (!container || !more) {
+        return;
+    }
+
+    let loading = false;
+
+    function card(listing) {
+        const col = document.createElement('div');
+        col.className = 'col-md-4 mb-4';
+
+        const body = document.createElement('div');
+        body.className = 'card-body';
+
+        const title = document.createElement('h5');
+        title.className = 'card-title';
+        title.textContent = listing.title;
+        if (listing.watched) {
+            const badge = document.createElement('span');
+            badge.className = 'badge badge-info';
+            badge.textContent = 'Watching';
+            title.append(' ', badge);
+        }
+
+        const description = document.createElement('p');
+        description.className = 'card-text';
+        description.textContent = listing.description;
+
+        const price = document.createElement('p');
+        price.innerHTML = '<strong>Current Price:</strong> ';
+        price.append(`£${listing.current_price ?? 'None'}`);
+
+        const link = document.createElement('a');
+        link.className = 'btn btn-primary';
+        link.href = listing.url;
+        link.textContent = 'View Listing';
+
+        body.append(title, description, price, link);
+
+        const wrapper = document.createElement('div');
+        wrapper.className = 'card';
+        if (listing.image) {
+            wrapper.append(picture(listing));
+        }
+        wrapper.append(body);
+        col.append(wrapper);
+        return col;
+    }
+
+    function picture(listing) {
+        // Same markup as the listing_image template tag
+        const picture = document.createElement('picture');
+        const sizes = '(min-width: 768px) 33vw, 100vw';
+        if (listing.image.webp_srcset) {
+            const source = document.createElement('source');
+            source.type = 'image/webp';
+            source.srcset = listing.image.webp_srcset;
+            source.sizes = sizes;
+            picture.append(source);
+        }
+        const img = document.createElement('img');
+        img.className = 'card-img-top';
+        img.src = listing.image.src;
+        if (listing.image.srcset) {
+            img.srcset = listing.image.srcset;
+            img.sizes = sizes;
+        }
+        img.alt = `Image for ${listing.title}`;
+        img.loading = 'lazy';
+        img.decoding = 'async';
+        picture.append(img);
+        return picture;
+    }
+
+    function loadNextPage() {
+        if (loading || !more.dataset.feed) {
+            return;
+        }
+        loading = true;
+        fetch(more.dataset.feed)
+            .then(response => response.json())
+            .then(data => {
+                data.listings.forEach(listing => container.append(card(listing)));
+                if (data.next) {
+                    more.dataset.feed = data.next;
+                } else {
+                    more.remove();
+                    observer.disconnect();
+                }
+            })
+            .finally(() => {
+                loading = false;
+            });
+    }
+
+    const observer = new IntersectionObserver(entries => {
+        if (entries.some(entry => entry.isIntersecting)) {
+            loadNextPage();
+        }
+    });
+    observer.observe(more);
+
+    more.addEventListener('click', event => {
+        event.preventDefault();
+        loadNextPage();
+    });
+});
@@ -0,0 +1,39 @@
+from django import template
+
+from auctions.caching import cached
+
+register = template.Library()
+
+
+class ListingCacheNode(template.Node):
+
+    def __init__(self, nodelist, listing_id, name):
+        self.nodelist = nodelist
+        self.listing_id = listing_id
+        self.name = name
+
+    def render(self, context):
+        listing_id = self.listing_id.resolve(context)
+        name = self.name.resolve(context)
+        # Async views fetch the fragment before rendering, since rendering it
+        # here may need the database
+        prefetched = context.get("cached_fragments", {}).get(name)
+        if prefetched is not None:
+            return prefetched
+        return cached(listing_id, name, lambda: self.nodelist.render(context))
+
+
+@register.tag
+def listingcache(parser, token):
+    """Cache the enclosed fragment until the listing changes.
+
+    Usage::
+
+        {% listingcache listing.id "comments" %} ... {% endlistingcache %}
+    """
+    bits = token.split_contents()
+    if len(bits) != 3:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' takes a listing id and a fragment name.")
+    nodelist = parser.parse(("endlistingcache",))
+    parser.delete_first_token()
+    return ListingCacheNode(nodelist, parser.compile_filter(bits[1]), parser.compile_filter(bits[2]))
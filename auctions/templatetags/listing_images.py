@@ -0,0 +1,21 @@
+from django import template
+
+from ..images import listing_image_sources
+
+register = template.Library()
+
+
+@register.inclusion_tag("auctions/listing_image.html")
+def listing_image(listing, css_class="", sizes="100vw"):
+    """A lazily loaded listing image with thumbnail ``srcset``s once they exist.
+
+    Usage::
+
+        {% listing_image listing "card-img-top" "(min-width: 768px) 33vw, 100vw" %}
+    """
+    return {
+        "image": listing_image_sources(listing),
+        "title": listing.title,
+        "css_class": css_class,
+        "sizes": sizes,
+    }
@@ -1,3 +1,2102 @@
-from django.test import TestCase
+import asyncio
+import importlib
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.templatetags.static import static
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, reverse
+from django.utils import timezone
+
+from commerce.database import database_config, sqlite_pragmas
+
+from . import (
+    bidding, browse, caching, closing, directory, events, images, ledger, notifications, pagination, ratelimit, scheduling, search,
+    transfer, watchlists,
+)
+from .bench import default_routes, percentile, run_asgi, run_bid_stress, run_routes, seed
+from .models import (
+    User, AuctionListing, Bid, BidRollup, Category, Comments, ListingImage, Notification, UserBidState,
+)
+from .profiling import QueryRecorder, SlowestRequests, slowest_requests
+
+
+def make_listing(seller, category, **kwargs):
+    fields = {
+        "title": "Lamp",
+        "description": "A desk lamp",
+        "starting_bid": Decimal("10.00"),
+        "seller": seller,
+        "category": category,
+    }
+    fields.update(kwargs)
+    return AuctionListing.objects.create(**fields)
+
+
+class AuctionsTestCase(TestCase):
+
+    def setUp(self):
+        # Listing ids are reused once each test rolls back, so cached pages must go too
+        cache.clear()
+
+
+class IndexFeedTests(AuctionsTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        cls.category = Category.objects.create(category_name="Home")
+        cls.listings = [
+            make_listing(cls.seller, cls.category, title=f"Listing {i}") for i in range(30)
+        ]
+        make_listing(cls.seller, cls.category, title="Closed", is_active=False)
+
+    def test_index_shows_first_page_of_active_listings(self):
+        response = self.client.get(reverse("index"))
+        listings = response.context["listings"]
+        self.assertEqual(len(listings), 24)
+        self.assertEqual(listings[0], self.listings[-1])
+        self.assertNotIn("Closed", [listing.title for listing in listings])
+        self.assertEqual(response.context["next_cursor"], listings[-1].id)
+
+    def test_index_follows_cursor(self):
+        first = self.client.get(reverse("index")).context
+        response = self.client.get(reverse("index"), {"before": first["next_cursor"]})
+        self.assertEqual(len(response.context["listings"]), 6)
+        self.assertIsNone(response.context["next_cursor"])
+
+    def test_index_ignores_bad_cursor(self):
+        response = self.client.get(reverse("index"), {"before": "nope"})
+        self.assertEqual(len(response.context["listings"]), 24)
+
+    def test_index_page_query_count_is_constant(self):
+        directory.category_directory()
+        with self.assertNumQueries(2):  # listings, facet counts
+            self.client.get(reverse("index"))
+
+    def test_feed_returns_json_pages(self):
+        data = self.client.get(reverse("listings_feed")).json()
+        self.assertEqual(len(data["listings"]), 24)
+        self.assertEqual(data["listings"][0]["id"], self.listings[-1].id)
+        self.assertEqual(data["listings"][0]["url"], reverse("listing", args=(self.listings[-1].id,)))
+
+        data = self.client.get(data["next"]).json()
+        self.assertEqual(len(data["listings"]), 6)
+        self.assertIsNone(data["next"])
+
+
+class PlaceBidTests(AuctionsTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        cls.bidder = User.objects.create_user("bidder", "bidder@example.com", "password")
+        cls.category = Category.objects.create(category_name="Home")
+
+    def setUp(self):
+        super().setUp()
+        self.listing = make_listing(self.seller, self.category)
+        self.client.force_login(self.bidder)
+
+    def bid(self, amount):
+        return self.client.post(reverse("place_bid", args=(self.listing.id,)), {"bid": amount})
+
+    def test_bid_above_starting_price_is_accepted(self):
+        response = self.bid("12.50")
+        self.assertRedirects(response, reverse("listing", args=(self.listing.id,)))
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.current_price, Decimal("12.50"))
+        self.assertEqual(Bid.objects.get().bidder, self.bidder)
+
+    def test_bid_must_beat_current_price(self):
+        self.bid("12.50")
+        response = self.bid("12.50")
+        self.assertContains(response, "Bid must be higher than the current price.")
+        self.assertEqual(Bid.objects.count(), 1)
+
+    def test_bid_must_beat_starting_price(self):
+        response = self.bid("10.00")
+        self.assertContains(response, "Bid must be higher than the current price.")
+        self.assertFalse(Bid.objects.exists())
+
+    def test_invalid_amounts_are_rejected(self):
+        for amount in ("", "abc", "NaN", "Infinity"):
+            with self.subTest(amount=amount):
+                self.bid(amount)
+        self.assertFalse(Bid.objects.exists())
+
+    def test_amounts_too_large_for_the_column_are_rejected(self):
+        for amount in ("1e10", "99999999999", "100000000", "99999999.999", "1e30"):
+            with self.subTest(amount=amount):
+                self.assertContains(self.bid(amount), "Enter a valid number.")
+        self.assertFalse(Bid.objects.exists())
+        self.bid("99999999.99")
+        self.assertEqual(Bid.objects.get().bid_amount, Decimal("99999999.99"))
+
+    def test_api_rejects_amounts_too_large_for_the_column(self):
+        response = self.client.post(reverse("api_listing_bids", args=(self.listing.id,)),
+                                    json.dumps({"amount": "1e10"}), content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "Enter a valid number."})
+
+    def test_closed_listing_rejects_bids(self):
+        AuctionListing.objects.filter(pk=self.listing.pk).update(is_active=False)
+        response = self.bid("50")
+        self.assertContains(response, "This listing is closed.")
+        self.assertFalse(Bid.objects.exists())
+
+    def test_bid_only_writes_price(self):
+        # A stale copy of the listing must not be able to undo the title edit
+        AuctionListing.objects.filter(pk=self.listing.pk).update(title="Renamed")
+        bidding.place_bid(self.listing.id, self.bidder, Decimal("20"))
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.title, "Renamed")
+
+
+class BidStatsTests(AuctionsTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        cls.alice = User.objects.create_user("alice", "alice@example.com", "password")
+        cls.bob = User.objects.create_user("bob", "bob@example.com", "password")
+        cls.category = Category.objects.create(category_name="Home")
+
+    def setUp(self):
+        super().setUp()
+        self.listing = make_listing(self.seller, self.category)
+        bidding.place_bid(self.listing.id, self.alice, Decimal("11"))
+        self.top = bidding.place_bid(self.listing.id, self.bob, Decimal("15"))
+
+    def test_bids_maintain_highest_bid_and_count(self):
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.highest_bid, self.top)
+        self.assertEqual(self.listing.bid_count, 2)
+
+    def test_rejected_bid_leaves_stats_alone(self):
+        with self.assertRaises(bidding.BidError):
+            bidding.place_bid(self.listing.id, self.alice, Decimal("12"))
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.highest_bid, self.top)
+        self.assertEqual(self.listing.bid_count, 2)
+
+    def test_repair_command_recomputes_stats(self):
+        empty = make_listing(self.seller, self.category, title="No bids")
+        AuctionListing.objects.update(highest_bid=None, bid_count=7)
+
+        call_command("repair_bid_stats", batch_size=1, stdout=StringIO())
+
+        self.listing.refresh_from_db()
+        empty.refresh_from_db()
+        self.assertEqual(self.listing.highest_bid, self.top)
+        self.assertEqual(self.listing.bid_count, 2)
+        self.assertIsNone(empty.highest_bid)
+        self.assertEqual(empty.bid_count, 0)
+
+    def test_closing_uses_highest_bid(self):
+        self.client.force_login(self.seller)
+        response = self.client.post(reverse("close_listing", args=(self.listing.id,)))
+        self.assertEqual(response.context["final_price"], Decimal("15"))
+        self.listing.refresh_from_db()
+        self.assertFalse(self.listing.is_active)
+        self.assertEqual(self.listing.winner, self.bob)
+
+        response = self.client.get(reverse("listing", args=(self.listing.id,)))
+        self.assertEqual(response.context["final_price"], Decimal("15"))
+        self.assertEqual(response.context["winner"], self.bob)
+
+
+class QueryCountTests(AuctionsTestCase):
+    """Page query counts must not grow with comments, bids or watchers."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        cls.viewer = User.objects.create_user("viewer", "viewer@example.com", "password")
+        cls.category = Category.objects.create(category_name="Home")
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.viewer)
+
+    def busy_listing(self, n):
+        listing = make_listing(self.seller, self.category)
+        for i in range(n):
+            user = User.objects.create_user(f"user{User.objects.count()}")
+            Comments.objects.create(message=f"Comment {i}", author=user, listing=listing)
+            bidding.place_bid(listing.id, user, Decimal(100 + i))
+            listing.watchlist.add(user)
+            self.viewer.listing_watchlist.add(make_listing(self.seller, self.category))
+        return listing
+
+    def count_queries(self, url):
+        # The viewer's watchlist is cached on first use and written through after
+        watchlists.watched_ids(self.viewer)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assertListingQueries(self, expected, close=False):
+        counts = []
+        for n in (1, 20):
+            listing = self.busy_listing(n)
+            if close:
+                AuctionListing.objects.filter(pk=listing.pk).update(
+                    is_active=False, winner=listing.watchlist.first()
+                )
+            counts.append(self.count_queries(reverse("listing", args=(listing.id,))))
+        self.assertEqual(counts, [expected, expected])
+
+    def test_active_listing_page(self):
+        # session, user, listing, comments with authors
+        self.assertListingQueries(4)
+
+    def test_closed_listing_page(self):
+        # the winner comes with the listing, so no extra query
+        self.assertListingQueries(4, close=True)
+
+    def test_watchlist_page(self):
+        # session, user, watched listings
+        self.busy_listing(1)
+        small = self.count_queries(reverse("watchlist"))
+        self.busy_listing(20)
+        self.assertEqual([small, self.count_queries(reverse("watchlist"))], [3, 3])
+
+    def test_comments_are_listed_oldest_first(self):
+        listing = self.busy_listing(3)
+        response = self.client.get(reverse("listing", args=(listing.id,)))
+        self.assertEqual(
+            [comment.message for comment in response.context["comments"]],
+            ["Comment 0", "Comment 1", "Comment 2"],
+        )
+        self.assertContains(response, "Posted by user")
+
+
+class ListingCacheTests(AuctionsTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        cls.viewer = User.objects.create_user("viewer", "viewer@example.com", "password")
+        cls.category = Category.objects.create(category_name="Home")
+
+    def setUp(self):
+        super().setUp()
+        self.listing = make_listing(self.seller, self.category)
+        Comments.objects.create(message="First!", author=self.viewer, listing=self.listing)
+        self.url = reverse("listing", args=(self.listing.id,))
+        self.client.force_login(self.viewer)
+
+    def test_repeat_views_skip_listing_and_comment_queries(self):
+        self.client.get(self.url)
+        # session and user; the watchlist is cached too
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertContains(response, "First!")
+        self.assertEqual(response.context["listing"], self.listing)
+
+    def test_new_comment_invalidates(self):
+        self.client.get(self.url)
+        self.client.post(reverse("comments", args=(self.listing.id,)), {"newComment": "Second"})
+        self.assertContains(self.client.get(self.url), "Second")
+
+    def test_new_bid_invalidates(self):
+        self.client.get(self.url)
+        self.client.post(reverse("place_bid", args=(self.listing.id,)), {"bid": "42.00"})
+        self.assertEqual(self.client.get(self.url).context["listing"].current_price, Decimal("42.00"))
+
+    def test_listing_save_invalidates(self):
+        self.client.get(self.url)
+        self.listing.title = "Renamed lamp"
+        self.listing.save()
+        self.assertContains(self.client.get(self.url), "Renamed lamp")
+
+    def test_missing_listing_is_not_cached(self):
+        url = reverse("listing", args=(self.listing.id + 1,))
+        self.assertEqual(self.client.get(url).status_code, 404)
+        make_listing(self.seller, self.category)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_hits_and_misses_are_counted(self):
+        self.client.get(self.url)
+        self.client.get(self.url)
+        self.client.get(self.url)
+        stats = caching.cache_stats()
+        self.assertEqual(stats["listing"], {"hits": 2, "misses": 1, "hit_ratio": 2 / 3})
+        self.assertEqual(stats["comments"]["misses"], 1)
+
+    def test_stats_view_is_staff_only(self):
+        self.assertEqual(self.client.get(reverse("cache_stats")).status_code, 302)
+        self.viewer.is_staff = True
+        self.viewer.save()
+        self.assertEqual(self.client.get(reverse("cache_stats")).json()["listing"]["hits"], 0)
+
+
+class CategoryDirectoryTests(AuctionsTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        cls.home = Category.objects.create(category_name="Home")
+        cls.garden = Category.objects.create(category_name="Garden")
+        make_listing(cls.seller, cls.home)
+        make_listing(cls.seller, cls.home)
+        make_listing(cls.seller, cls.home, is_active=False)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.seller)
+
+    def counts(self):
+        return {
+            category["category_name"]: category["active_listings"]
+            for category in self.client.get(reverse("categories")).context["categories"]
+        }
+
+    def test_categories_page_lists_active_counts(self):
+        self.assertEqual(self.counts(), {"Garden": 0, "Home": 2})
+
+    def test_directory_is_served_from_cache(self):
+        self.client.get(reverse("categories"))
+        # session and user only
+        with self.assertNumQueries(2):
+            self.client.get(reverse("categories"))
+        with self.assertNumQueries(2):
+            self.client.get(reverse("create_listing"))
+
+    def test_form_errors_do_not_requery_categories(self):
+        self.client.get(reverse("create_listing"))
+        with self.assertNumQueries(2):
+            response = self.client.post(reverse("create_listing"), {"title": "Spade"})
+        self.assertEqual(len(response.context["categories"]), 2)
+
+    def test_creating_and_closing_listings_adjusts_counts(self):
+        self.counts()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("create_listing"), {
+                "title": "Spade", "description": "Digs", "starting_bid": "5", "category_name": "Garden",
+            })
+        self.assertEqual(self.counts(), {"Garden": 1, "Home": 2})
+
+        listing = AuctionListing.objects.get(title="Spade")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("close_listing", args=(listing.id,)))
+        self.assertEqual(self.counts(), {"Garden": 0, "Home": 2})
+
+    def test_drifted_counters_expire(self):
+        self.counts()
+        cache.incr(directory._count_key(self.home.id), 5)
+        self.assertEqual(self.counts(), {"Garden": 0, "Home": 7})
+        later = time.time() + settings.AUCTIONS_DIRECTORY_TIMEOUT + 1
+        with mock.patch("django.core.cache.backends.locmem.time.time", return_value=later):
+            self.assertEqual(self.counts(), {"Garden": 0, "Home": 2})
+
+    def test_new_category_appears(self):
+        self.counts()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("create_listing"), {
+                "title": "Chair", "description": "Sits", "starting_bid": "5", "new_category_name": "Furniture",
+            })
+        self.assertEqual(self.counts(), {"Furniture": 1, "Garden": 0, "Home": 2})
+
+    def test_unknown_existing_category_is_rejected(self):
+        response = self.client.post(reverse("create_listing"), {
+            "title": "Chair", "description": "Sits", "starting_bid": "5", "category_name": "Nope",
+        })
+        self.assertContains(response, "Selected category does not exist.")
+        self.assertFalse(AuctionListing.objects.filter(title="Chair").exists())
+
+    def test_category_listings_page(self):
+        response = self.client.get(reverse("category_listings", args=(self.home.id,)))
+        self.assertEqual(response.context["category"]["category_name"], "Home")
+        self.assertEqual(len(response.context["listings"]), 2)
+        missing = reverse("category_listings", args=(self.garden.id + 100,))
+        self.assertEqual(self.client.get(missing).status_code, 404)
+
+
+class AuctionClosingTests(AuctionsTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        cls.bidders = [User.objects.create_user(f"bidder{i}") for i in range(3)]
+        cls.category = Category.objects.create(category_name="Home")
+
+    def setUp(self):
+        super().setUp()
+        self.expired = [make_listing(self.seller, self.category) for _ in range(7)]
+        for listing, bidder in zip(self.expired, self.bidders):
+            bidding.place_bid(listing.id, self.bidders[0], Decimal("11"))
+            bidding.place_bid(listing.id, bidder, Decimal("20"))
+        AuctionListing.objects.update(end_time=timezone.now() - timedelta(minutes=5))
+        self.running = make_listing(self.seller, self.category, end_time=timezone.now() + timedelta(hours=1))
+        self.open_ended = make_listing(self.seller, self.category)
+
+    def test_worker_closes_expired_listings_in_batches(self):
+        call_command("close_expired_auctions", batch_size=3, stdout=StringIO())
+
+        for listing in self.expired:
+            listing.refresh_from_db()
+            self.assertFalse(listing.is_active)
+        self.assertEqual(
+            [listing.winner for listing in self.expired[:3]], self.bidders
+        )
+        self.assertEqual([listing.winner for listing in self.expired[3:]], [None] * 4)
+        self.assertTrue(AuctionListing.objects.get(pk=self.running.pk).is_active)
+        self.assertTrue(AuctionListing.objects.get(pk=self.open_ended.pk).is_active)
+
+    def test_batch_query_count_does_not_grow(self):
+        # In close_expired's order; unordered, which rows come first depends on the plan
+        expired = AuctionListing.objects.filter(
+            is_active=True, end_time__lte=timezone.now()
+        ).order_by("end_time", "id")
+        # savepoint, lock the batch, resolve winners, bulk update, find who to
+        # notify (watchers and sellers, bidders), queue the notifications, release savepoint
+        with self.assertNumQueries(8):
+            self.assertEqual(len(closing.close_listings(expired[:2])), 2)
+        with self.assertNumQueries(8):
+            self.assertEqual(len(closing.close_listings(expired[:5])), 5)
+
+    def test_expired_listing_rejects_bids(self):
+        with self.assertRaisesMessage(bidding.BidError, "This listing is closed."):
+            bidding.place_bid(self.expired[-1].id, self.bidders[0], Decimal("500"))
+
+    def test_seller_close_uses_the_same_path(self):
+        self.client.force_login(self.seller)
+        response = self.client.post(reverse("close_listing", args=(self.expired[0].id,)))
+        self.assertEqual(response.context["winner"], self.bidders[0])
+        self.assertEqual(response.context["final_price"], Decimal("20"))
+        self.assertContains(response, "The listing has been closed successfully.")
+
+    def test_create_listing_validates_end_time(self):
+        self.client.force_login(self.seller)
+        form = {
+            "title": "Chair", "description": "Sits", "starting_bid": "5",
+            "category_name": "Home", "image_url": "",
+        }
+        response = self.client.post(reverse("create_listing"), {**form, "end_time": "2000-01-01T10:00"})
+        self.assertContains(response, "End time must be a date and time in the future.")
+
+        end_time = (timezone.now() + timedelta(days=2)).replace(microsecond=0, tzinfo=None)
+        self.client.post(reverse("create_listing"), {**form, "end_time": end_time.isoformat()})
+        self.assertEqual(
+            AuctionListing.objects.get(title="Chair").end_time, timezone.make_aware(end_time)
+        )
+
+    def test_create_listing_rejects_bids_too_large_for_the_column(self):
+        self.client.force_login(self.seller)
+        form = {
+            "title": "Chair", "description": "Sits", "category_name": "Home", "image_url": "", "end_time": "",
+        }
+        for amount in ("99999999999", "1e20"):
+            response = self.client.post(reverse("create_listing"), {**form, "starting_bid": amount})
+            self.assertContains(response, "Starting bid is too large.")
+        response = self.client.post(reverse("create_listing"), {**form, "starting_bid": "Infinity"})
+        self.assertContains(response, "Starting bid must be a positive number.")
+        self.assertFalse(AuctionListing.objects.filter(title="Chair").exists())
+
+
+class SearchTests(AuctionsTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        cls.home = Category.objects.create(category_name="Home")
+        cls.garden = Category.objects.create(category_name="Garden")
+        cls.described = make_listing(cls.seller, cls.home, title="Chair", description="Comes with a lamp")
+        cls.titled = make_listing(cls.seller, cls.home, title="Brass lamp", description="Shiny")
+        cls.outdoor = make_listing(cls.seller, cls.garden, title="Garden lamp", description="Solar")
+        cls.closed = make_listing(cls.seller, cls.home, title="Old lamp", description="Sold", is_active=False)
+
+    def titles(self, *args, **kwargs):
+        listings, _ = search.search_listings(*args, **kwargs)
+        return [listing.title for listing in listings]
+
+    def test_title_matches_rank_first(self):
+        self.assertEqual(self.titles("lamp")[-1], "Chair")
+        self.assertCountEqual(self.titles("lamp"), ["Brass lamp", "Garden lamp", "Chair"])
+
+    def test_every_word_must_match_as_prefix(self):
+        self.assertEqual(self.titles("bra lam"), ["Brass lamp"])
+        self.assertEqual(self.titles("brass chair"), [])
+
+    def test_filters(self):
+        self.assertEqual(self.titles("lamp", category_id=self.garden.id), ["Garden lamp"])
+        self.assertIn("Old lamp", self.titles("lamp", active_only=False))
+
+    def test_pagination(self):
+        first, has_next = search.search_listings("lamp", per_page=2)
+        second, has_more = search.search_listings("lamp", page=2, per_page=2)
+        self.assertTrue(has_next)
+        self.assertFalse(has_more)
+        self.assertEqual(len({listing.id for listing in first + second}), 3)
+
+    def test_index_follows_edits_and_deletes(self):
+        AuctionListing.objects.filter(pk=self.described.pk).update(description="Comes with a rug")
+        self.assertNotIn("Chair", self.titles("lamp"))
+        self.assertEqual(self.titles("rug"), ["Chair"])
+        self.titled.delete()
+        self.assertEqual(self.titles("brass"), [])
+
+    def test_query_syntax_is_not_interpreted(self):
+        for query in ('lamp OR', '"', 'NEAR(lamp', "*", "title:lamp"):
+            with self.subTest(query=query):
+                search.search_listings(query)
+
+    def test_fallback_finds_the_same_listings(self):
+        self.assertCountEqual(
+            [listing.title for listing in search.fallback_search("lamp")],
+            self.titles("lamp"),
+        )
+
+    def test_missing_triggers_are_reinstalled(self):
+        if not search.fts_available():
+            self.skipTest("FTS5 search needs SQLite")
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TRIGGER {search.FTS_TABLE}_insert")
+        make_listing(self.seller, self.home, title="Unindexed lamp")
+        search.install_fts()
+        self.assertIn("Unindexed lamp", self.titles("lamp"))
+        make_listing(self.seller, self.home, title="Indexed lamp")
+        self.assertIn("Indexed lamp", self.titles("lamp"))
+
+    def test_search_views(self):
+        response = self.client.get(reverse("search"), {"q": "lamp", "category": self.home.id})
+        self.assertEqual([listing.title for listing in response.context["listings"]], ["Brass lamp", "Chair"])
+        data = self.client.get(reverse("search_feed"), {"q": "lamp", "status": "all", "page": "x"}).json()
+        self.assertEqual(len(data["listings"]), 4)
+        self.assertEqual(data["page"], 1)
+        self.assertFalse(data["has_next"])
+
+    def test_out_of_range_page_and_category(self):
+        huge = "99999999999999999999"
+        response = self.client.get(reverse("search"), {"q": "lamp", "page": huge})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["page"], search.MAX_PAGE)
+        self.assertEqual(response.context["listings"], [])
+        response = self.client.get(reverse("search"), {"q": "lamp", "category": huge})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["listings"], [])
+        data = self.client.get(reverse("search_feed"), {"q": "lamp", "category": huge, "page": huge}).json()
+        self.assertEqual((data["listings"], data["page"]), ([], search.MAX_PAGE))
+
+
+class BenchHarnessTests(AuctionsTestCase):
+
+    def test_seed_builds_consistent_data(self):
+        data = seed(users=10, listings=20, bids=3, comments=2, watchers=4, categories=3, chunk=7)
+        self.assertEqual(len(data["listings"]), 20)
+        self.assertEqual(Bid.objects.count(), 60)
+        self.assertEqual(Comments.objects.count(), 40)
+        self.assertEqual(AuctionListing.watchlist.through.objects.count(), 80)
+        listing = AuctionListing.objects.select_related("highest_bid").get(pk=data["listings"][0])
+        self.assertEqual(listing.bid_count, 3)
+        self.assertEqual(listing.current_price, listing.highest_bid.bid_amount)
+
+    def test_run_routes_reports_every_route(self):
+        data = seed(users=5, listings=10, categories=2)
+        user = User.objects.get(pk=data["users"][0])
+        results = run_routes(default_routes(data, random.Random(0)), requests=4, warmup=1, user=user)
+        self.assertEqual(set(results), {
+            "index", "listing", "place_bid", "watchlist", "categories", "category_listings",
+        })
+        self.assertEqual(results["place_bid"]["statuses"], {"302": 4})
+        self.assertEqual(results["index"]["statuses"], {"200": 4})
+        for summary in results.values():
+            self.assertLessEqual(summary["p50_ms"], summary["p99_ms"])
+            self.assertGreater(summary["queries_mean"], 0)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.5), 50)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertEqual(percentile([7], 0.95), 7)
+        self.assertIsNone(percentile([], 0.5))
+
+
+@override_settings(AUCTIONS_PROFILING=True)
+class ProfilingTests(AuctionsTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        cls.listing = make_listing(cls.seller, Category.objects.create(category_name="Home"))
+
+    def setUp(self):
+        super().setUp()
+        slowest_requests.clear()
+
+    def test_requests_are_timed_and_logged(self):
+        with self.assertLogs("auctions.profiling") as logs:
+            response = self.client.get(reverse("listing", args=(self.listing.id,)))
+        self.assertRegex(response["Server-Timing"], r'^total;dur=[\d.]+, sql;dur=[\d.]+;desc="2 queries, 0 duplicates"$')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["url_name"], "listing")
+        self.assertEqual(record["queries"], 2)
+        self.assertEqual(slowest_requests.records(), [record])
+
+    async def test_async_views_count_queries_from_worker_threads(self):
+        # The async ORM runs queries on other threads with connections of their own
+        with self.assertLogs("auctions.profiling") as logs:
+            response = await self.async_client.get(reverse("listing", args=(self.listing.id,)))
+        self.assertIn('desc="2 queries, 0 duplicates"', response["Server-Timing"])
+        self.assertEqual(json.loads(logs.records[0].getMessage())["queries"], 2)
+
+    @override_settings(AUCTIONS_PROFILING=False)
+    def test_disabled_by_default(self):
+        self.assertNotIn("Server-Timing", self.client.get(reverse("index")))
+
+    def test_repeated_queries_are_detected(self):
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for pk in (1, 1, 2):
+                list(User.objects.filter(pk=pk))
+        self.assertEqual(recorder.count, 3)
+        self.assertEqual(recorder.duplicates, 1)
+        self.assertEqual(recorder.similar, 1)
+
+    def test_only_the_slowest_requests_are_kept(self):
+        slowest = SlowestRequests(2)
+        for duration in (5, 1, 9, 3):
+            slowest.add({"duration_ms": duration})
+        self.assertEqual([record["duration_ms"] for record in slowest.records()], [9, 5])
+
+    def test_report_aggregates_by_url_name(self):
+        records = [
+            {"url_name": "listing", "path": "/listing/1/", "duration_ms": ms, "queries": 4,
+             "sql_ms": 1.0, "duplicate_queries": dups}
+            for ms, dups in ((10, 0), (30, 2))
+        ] + [{"url_name": "index", "path": "/", "duration_ms": 5, "queries": 1, "sql_ms": 0.5,
+              "duplicate_queries": 0}]
+        with tempfile.TemporaryDirectory() as directory:
+            log = os.path.join(directory, "profiling.log")
+            with open(log, "w") as output:
+                output.writelines(json.dumps(record) + "\n" for record in records)
+            stdout = StringIO()
+            call_command("profile_report", log=log, json=True, stdout=stdout)
+        summary = json.loads(stdout.getvalue())
+        self.assertEqual([row["url_name"] for row in summary], ["listing", "index"])
+        self.assertEqual(summary[0]["requests"], 2)
+        self.assertEqual(summary[0]["max_ms"], 30)
+        self.assertEqual(summary[0]["duplicate_queries"], 2)
+
+
+class ListingEventTests(AuctionsTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        cls.bidder = User.objects.create_user("bidder", "bidder@example.com", "password")
+        cls.category = Category.objects.create(category_name="Home")
+
+    def setUp(self):
+        super().setUp()
+        self.listing = make_listing(self.seller, self.category)
+        self.channel = events.listing_channel(self.listing.id)
+
+    def test_thousand_subscribers_see_bid_and_close(self):
+        broker = events.get_broker()
+        subscribers = 1000
+        received = []
+        ready = threading.Event()
+
+        async def subscriber():
+            subscription = broker.subscribe(self.channel)
+            try:
+                if broker.subscriber_count(self.channel) == subscribers:
+                    ready.set()
+                return [await subscription.get(), await subscription.get()]
+            finally:
+                subscription.close()
+
+        async def main():
+            received.extend(await asyncio.wait_for(
+                asyncio.gather(*(subscriber() for _ in range(subscribers))), 30
+            ))
+
+        loop_thread = threading.Thread(target=asyncio.run, args=(main(),))
+        loop_thread.start()
+        self.assertTrue(ready.wait(30))
+
+        # Events are published by the ordinary sync code paths once they commit
+        with self.captureOnCommitCallbacks(execute=True):
+            bidding.place_bid(self.listing.id, self.bidder, Decimal("25"))
+        with self.captureOnCommitCallbacks(execute=True):
+            closing.close_listings(AuctionListing.objects.filter(pk=self.listing.pk))
+        loop_thread.join(30)
+
+        self.assertEqual(len(received), subscribers)
+        expected = [
+            {"type": "bid", "price": "25.00", "bid_count": 1},
+            {"type": "closed", "price": "25.00", "bid_count": 1, "winner": "bidder"},
+        ]
+        self.assertEqual(received[0], expected)
+        self.assertTrue(all(events_seen == expected for events_seen in received))
+        self.assertEqual(broker.subscriber_count(self.channel), 0)
+
+    def test_events_wait_for_commit(self):
+        with mock.patch.object(events.InProcessBroker, "publish") as publish:
+            with self.captureOnCommitCallbacks() as callbacks:
+                bidding.place_bid(self.listing.id, self.bidder, Decimal("25"))
+            publish.assert_not_called()
+            for callback in callbacks:
+                callback()
+        publish.assert_called_once_with(self.channel, {"type": "bid", "price": "25.00", "bid_count": 1})
+
+    def test_slow_subscriber_drops_oldest_events(self):
+        broker = events.InProcessBroker(max_pending=2)
+
+        async def main():
+            subscription = broker.subscribe(self.channel)
+            for n in range(3):
+                broker.publish(self.channel, {"n": n})
+            await asyncio.sleep(0)
+            return [await subscription.get(), await subscription.get()]
+
+        self.assertEqual(asyncio.run(main()), [{"n": 1}, {"n": 2}])
+
+    async def test_stream_sends_snapshot_then_events(self):
+        response = await self.async_client.get(reverse("listing_events", args=(self.listing.id,)),
+                                               headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        # Compression would buffer the events
+        self.assertNotIn("Content-Encoding", response)
+        chunks = aiter(response.streaming_content)
+
+        snapshot = (await anext(chunks)).decode()
+        self.assertTrue(snapshot.startswith("event: snapshot\n"))
+        self.assertIn('"price": "10.00"', snapshot)
+
+        events.get_broker().publish(self.channel, {"type": "closed", "price": "12.00", "bid_count": 1, "winner": "bidder"})
+        closed = (await anext(chunks)).decode()
+        self.assertTrue(closed.startswith("event: closed\n"))
+        with self.assertRaises(StopAsyncIteration):
+            await anext(chunks)
+
+    async def test_missing_listing_is_404(self):
+        response = await self.async_client.get(reverse("listing_events", args=(self.listing.id + 1,)))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_listing_page_opens_the_stream_under_asgi(self):
+        response = await self.async_client.get(reverse("listing", args=(self.listing.id,)))
+        self.assertContains(response, reverse("listing_events", args=(self.listing.id,)))
+        with self.settings(AUCTIONS_LIVE_EVENTS=False):
+            response = await self.async_client.get(reverse("listing", args=(self.listing.id,)))
+            self.assertNotContains(response, "EventSource")
+            response = await self.async_client.get(reverse("listing_events", args=(self.listing.id,)))
+            self.assertEqual(response.status_code, 204)
+
+    def test_no_stream_under_wsgi(self):
+        # A WSGI worker can't send a never-ending async stream; it would hang
+        response = self.client.get(reverse("listing", args=(self.listing.id,)))
+        self.assertNotContains(response, "EventSource")
+        response = self.client.get(reverse("listing_events", args=(self.listing.id,)))
+        self.assertEqual(response.status_code, 204)
+
+
+class AsyncViewTests(AuctionsTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        cls.viewer = User.objects.create_user("viewer", "viewer@example.com", "password")
+        cls.category = Category.objects.create(category_name="Home")
+        cls.listing = make_listing(cls.seller, cls.category, title="Oak table")
+        Comments.objects.create(message="Is it solid oak?", author=cls.viewer, listing=cls.listing)
+        cls.listing.watchlist.add(cls.viewer)
+
+    def setUp(self):
+        super().setUp()
+        self.async_client.force_login(self.viewer)
+
+    async def test_read_pages_render(self):
+        for url in (
+            reverse("index"),
+            reverse("listing", args=(self.listing.id,)),
+            reverse("watchlist"),
+            reverse("categories"),
+            reverse("category_listings", args=(self.category.id,)),
+        ):
+            with self.subTest(url=url):
+                response = await self.async_client.get(url)
+                self.assertContains(response, "Home" if url == reverse("categories") else "Oak table")
+
+    async def test_listing_page(self):
+        url = reverse("listing", args=(self.listing.id,))
+        response = await self.async_client.get(url)
+        self.assertTrue(response.context["in_watchlist"])
+        self.assertContains(response, "Is it solid oak?")
+        # The second view renders the comments from the cached fragment
+        response = await self.async_client.get(url)
+        self.assertEqual(response.context["comments"], [])
+        self.assertContains(response, "Is it solid oak?")
+
+    async def test_missing_pages_are_404(self):
+        for url in (reverse("listing", args=(self.listing.id + 1,)),
+                    reverse("category_listings", args=(self.category.id + 1,))):
+            with self.subTest(url=url):
+                self.assertEqual((await self.async_client.get(url)).status_code, 404)
+
+    async def test_watchlist_needs_login(self):
+        await self.async_client.alogout()
+        response = await self.async_client.get(reverse("watchlist"))
+        self.assertRedirects(response, reverse("login"), fetch_redirect_response=False)
+
+    def test_asgi_driver(self):
+        from commerce.asgi import application
+
+        latencies, statuses, seconds = run_asgi(application, [reverse("categories")] * 4, concurrency=2)
+        self.assertEqual(statuses, [200] * 4)
+        self.assertEqual(len(latencies), 4)
+
+
+class TransferTests(AuctionsTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        cls.home = Category.objects.create(category_name="Home")
+
+    def test_csv_import_batches_rows(self):
+        rows = ["title,description,starting_bid,image_url,category"]
+        rows += [f"Lamp {i},Brass lamp,{i + 1}.50,,{'Home' if i % 2 else 'Garden'}" for i in range(10)]
+        rows += ["Broken,No price,,,Home", "Free,Zero price,0,,Home"]
+        errors = []
+        # Two batches of five: per batch one category insert and lookup at most, and one listing insert
+        with self.assertNumQueries(1 + 2 * 4):
+            imported, skipped = transfer.import_listings(
+                StringIO("\n".join(rows)), "csv", self.seller, batch_size=6,
+                on_error=lambda line, message: errors.append(line),
+            )
+        self.assertEqual((imported, skipped), (10, 2))
+        self.assertEqual(errors, [12, 13])
+        self.assertEqual(Category.objects.filter(category_name="Garden").count(), 1)
+        self.assertEqual(self.home.listings.count(), 5)
+        self.assertEqual(AuctionListing.objects.get(title="Lamp 0").starting_bid, Decimal("1.50"))
+
+    def test_jsonl_import_refreshes_the_directory(self):
+        directory.category_directory()
+        stream = StringIO(
+            json.dumps({"title": "Chair", "description": "Oak chair", "starting_bid": 20, "category": "Home"})
+            + "\nnot json\n[1, 2]\n"
+            + json.dumps({"title": ["Stool"], "description": "Pine stool", "starting_bid": 5, "category": "Home"})
+        )
+        errors = []
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(transfer.import_listings(stream, "jsonl", self.seller,
+                                                      on_error=lambda line, message: errors.append((line, message))),
+                             (1, 3))
+        self.assertEqual(errors[1:], [(3, "expected a JSON object"), (4, "title must be a string")])
+        self.assertEqual(directory.find_category(category_id=self.home.id)["active_listings"], 1)
+
+    def test_import_skips_bids_too_large_for_the_column(self):
+        rows = ["title,description,starting_bid,image_url,category",
+                "Lamp,Brass lamp,99999999999,,Home", "Rug,Wool rug,99999999.99,,Home"]
+        errors = []
+        imported, skipped = transfer.import_listings(
+            StringIO("\n".join(rows)), "csv", self.seller,
+            on_error=lambda line, message: errors.append((line, message)),
+        )
+        self.assertEqual((imported, skipped), (1, 1))
+        self.assertEqual(errors, [(2, "starting_bid is too large")])
+        self.assertEqual(AuctionListing.objects.get().title, "Rug")
+
+    def test_export_round_trip(self):
+        bidder = User.objects.create_user("bidder")
+        listing = make_listing(self.seller, self.home, title="Oak table")
+        bidding.place_bid(listing.id, bidder, Decimal("12"))
+
+        with tempfile.TemporaryDirectory() as directory_name:
+            path = os.path.join(directory_name, "listings.jsonl.gz")
+            call_command("export_listings", path, stderr=StringIO())
+            with transfer.open_text(path, "r") as stream:
+                exported = [row for _, row in transfer.read_rows(stream, transfer.file_format(path))]
+        self.assertEqual(len(exported), 1)
+        self.assertEqual(exported[0]["title"], "Oak table")
+        self.assertEqual(exported[0]["current_price"], "12.00")
+        self.assertEqual(exported[0]["seller"], "seller")
+
+        output = StringIO()
+        self.assertEqual(transfer.write_rows(output, "csv", "bids", transfer.export_rows("bids")), 1)
+        bid = listing.bids.get()
+        self.assertEqual(output.getvalue().splitlines()[1],
+                         f"{bid.id},{listing.id},bidder,12.00,{bid.created_at.isoformat(sep=' ')}")
+
+
+class ApiTests(AuctionsTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        cls.bidder = User.objects.create_user("bidder", "bidder@example.com", "password")
+        cls.category = Category.objects.create(category_name="Home")
+
+    def setUp(self):
+        super().setUp()
+        self.listing = make_listing(self.seller, self.category, title="Oak table")
+
+    def post_json(self, url, body, method="post"):
+        return getattr(self.client, method)(url, json.dumps(body), content_type="application/json")
+
+    def test_listings_are_paged_with_a_cursor(self):
+        for i in range(3):
+            make_listing(self.seller, self.category, title=f"Lamp {i}")
+        response = self.client.get(reverse("api_listings"), {"limit": 2})
+        first = response.json()
+        self.assertEqual([row["title"] for row in first["listings"]], ["Lamp 2", "Lamp 1"])
+        self.assertEqual(first["listings"][0]["seller"], "seller")
+        second = self.client.get(first["next"]).json()
+        self.assertEqual([row["title"] for row in second["listings"]], ["Lamp 0", "Oak table"])
+        self.assertIsNone(second["next"])
+
+    def test_next_link_keeps_the_filters(self):
+        make_listing(self.seller, self.category, title="Closed lamp", is_active=False)
+        for i in range(3):
+            make_listing(self.seller, self.category, title=f"Lamp {i}")
+        first = self.client.get(reverse("api_listings"), {"status": "all", "limit": 2}).json()
+        self.assertEqual(len(first["listings"]), 2)
+        second = self.client.get(first["next"]).json()
+        self.assertEqual([row["title"] for row in second["listings"]], ["Lamp 0", "Closed lamp"])
+        self.assertIn("status=all", second["next"])
+
+        self.client.force_login(self.bidder)
+        comments_url = reverse("api_listing_comments", args=(self.listing.id,))
+        for n in range(3):
+            self.post_json(comments_url, {"message": f"Comment {n}"})
+        first = self.client.get(comments_url, {"limit": 2}).json()
+        second = self.client.get(first["next"]).json()
+        self.assertEqual([row["message"] for row in second["comments"]], ["Comment 0"])
+
+    def test_unchanged_listing_is_not_modified(self):
+        url = reverse("api_listing", args=(self.listing.id,))
+        response = self.client.get(url)
+        self.assertEqual(response.json()["title"], "Oak table")
+        self.assertTrue(response["ETag"].startswith('W/"'))
+        self.assertIn("Last-Modified", response)
+
+        with self.assertNumQueries(1):  # Last-Modified only; the ETag comes from the cache
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.content, b"")
+        cached = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(cached.status_code, 304)
+
+        bidding.place_bid(self.listing.id, self.bidder, Decimal("30"))
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()["current_price"], "30.00")
+
+    def test_bids_are_streamed(self):
+        for amount in (15, 20):
+            bidding.place_bid(self.listing.id, self.bidder, Decimal(amount))
+        response = self.client.get(reverse("api_listing_bids", args=(self.listing.id,)))
+        self.assertTrue(response.streaming)
+        bids = json.loads(b"".join(response.streaming_content))["bids"]
+        self.assertEqual([(bid["amount"], bid["bidder"]) for bid in bids], [("20.00", "bidder"), ("15.00", "bidder")])
+
+    def test_writes_need_a_login(self):
+        url = reverse("api_listing_bids", args=(self.listing.id,))
+        self.assertEqual(self.post_json(url, {"amount": "20"}).status_code, 401)
+
+    def test_bid_comment_and_watch(self):
+        self.client.force_login(self.bidder)
+        bids_url = reverse("api_listing_bids", args=(self.listing.id,))
+        self.assertEqual(self.post_json(bids_url, {"amount": "20"}).status_code, 201)
+        rejected = self.post_json(bids_url, {"amount": "15"})
+        self.assertEqual((rejected.status_code, rejected.json()["error"]),
+                         (409, "Bid must be higher than the current price."))
+        for body, message in (({"amount": "abc"}, "Enter a valid number."), ({}, "Please enter a bid amount.")):
+            malformed = self.post_json(bids_url, body)
+            self.assertEqual((malformed.status_code, malformed.json()["error"]), (400, message))
+
+        comments_url = reverse("api_listing_comments", args=(self.listing.id,))
+        self.assertEqual(self.post_json(comments_url, {"message": "Nice"}).status_code, 201)
+        self.assertEqual(self.client.get(comments_url).json()["comments"][0]["author"], "bidder")
+
+        self.post_json(reverse("api_watchlist_item", args=(self.listing.id,)), {}, method="put")
+        watched = self.client.get(reverse("api_watchlist")).json()["listings"]
+        self.assertEqual([row["id"] for row in watched], [self.listing.id])
+
+    def test_create_listing(self):
+        self.client.force_login(self.seller)
+        response = self.post_json(reverse("api_listings"), {
+            "title": "Desk", "description": "Walnut desk", "starting_bid": "40", "category": "Home",
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(AuctionListing.objects.get(pk=response.json()["id"]).category, self.category)
+        missing = self.post_json(reverse("api_listings"), {
+            "title": "Desk", "description": "Walnut desk", "starting_bid": "40", "category": "Nope",
+        })
+        self.assertEqual(missing.status_code, 400)
+        too_large = self.post_json(reverse("api_listings"), {
+            "title": "Desk", "description": "Walnut desk", "starting_bid": "1e20", "category": "Home",
+        })
+        self.assertEqual(too_large.status_code, 400)
+        self.assertEqual(too_large.json()["error"], "starting_bid is too large")
+        for field, value in (("title", 5), ("category", ["Home"]), ("image_url", {}), ("end_time", 1),
+                             ("end_time", "2030-13-45T10:00"), ("starting_bid", True), ("starting_bid", [40])):
+            wrong_type = self.post_json(reverse("api_listings"), {
+                "title": "Desk", "description": "Walnut desk", "starting_bid": 40, "category": "Home", field: value,
+            })
+            self.assertEqual(wrong_type.status_code, 400, field)
+            self.assertIn(field, wrong_type.json()["error"])
+
+
+class NotificationTests(AuctionsTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        cls.alice = User.objects.create_user("alice", "alice@example.com", "password")
+        cls.bob = User.objects.create_user("bob", "bob@example.com", "password")
+        cls.watcher = User.objects.create_user("watcher", "watcher@example.com", "password")
+        cls.category = Category.objects.create(category_name="Home")
+
+    def setUp(self):
+        super().setUp()
+        self.listing = make_listing(self.seller, self.category, title="Lamp")
+        self.listing.watchlist.add(self.watcher)
+
+    def pending(self):
+        return sorted(Notification.objects.filter(sent_at__isnull=True).values_list("user__username", "kind"))
+
+    def test_bids_queue_notifications_without_sending_mail(self):
+        self.client.force_login(self.alice)
+        self.client.post(reverse("place_bid", args=(self.listing.id,)), {"bid": "20"})
+        bidding.place_bid(self.listing.id, self.bob, Decimal("25"))
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(self.pending(), [
+            ("alice", "outbid"),
+            ("seller", "bid"), ("seller", "bid"),
+            ("watcher", "bid"), ("watcher", "bid"),
+        ])
+
+    def test_worker_sends_one_email_per_user_and_listing(self):
+        bidding.place_bid(self.listing.id, self.alice, Decimal("20"))
+        bidding.place_bid(self.listing.id, self.bob, Decimal("25"))
+        Comments.objects.create(message="Still available?", author=self.alice, listing=self.listing)
+        closing.close_listings(AuctionListing.objects.filter(pk=self.listing.pk))
+
+        stdout = StringIO()
+        call_command("send_notifications", batch_size=3, stdout=stdout)
+        self.assertEqual(self.pending(), [])
+        emails = {email.to[0]: email for email in mail.outbox}
+        self.assertEqual(len(mail.outbox), len(emails))
+        self.assertEqual(set(emails), {"seller@example.com", "alice@example.com", "bob@example.com",
+                                       "watcher@example.com"})
+        self.assertEqual(emails["bob@example.com"].subject, "You won: Lamp")
+        self.assertEqual(emails["watcher@example.com"].subject, "4 updates on Lamp")
+        self.assertIn("bob outbid you with £25.00.", emails["alice@example.com"].body)
+        self.assertIn("Sent 4 emails", stdout.getvalue())
+
+    def test_failed_send_leaves_the_batch_queued(self):
+        bidding.place_bid(self.listing.id, self.alice, Decimal("20"))
+        with mock.patch("django.core.mail.backends.locmem.EmailBackend.send_messages", side_effect=OSError):
+            with self.assertRaises(OSError):
+                notifications.deliver_pending()
+        self.assertEqual(len(self.pending()), 2)
+
+
+class BidDashboardTests(AuctionsTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        cls.alice = User.objects.create_user("alice", "alice@example.com", "password")
+        cls.bob = User.objects.create_user("bob", "bob@example.com", "password")
+        cls.category = Category.objects.create(category_name="Home")
+
+    def setUp(self):
+        super().setUp()
+        self.lamp = make_listing(self.seller, self.category, title="Lamp")
+        self.clock = make_listing(self.seller, self.category, title="Clock")
+        bidding.place_bid(self.lamp.id, self.alice, Decimal("11"))
+        bidding.place_bid(self.lamp.id, self.bob, Decimal("12"))
+        bidding.place_bid(self.lamp.id, self.alice, Decimal("13"))
+        bidding.place_bid(self.clock.id, self.alice, Decimal("20"))
+        bidding.place_bid(self.clock.id, self.bob, Decimal("25"))
+
+    def states(self):
+        return set(UserBidState.objects.values_list("listing__title", "user__username", "max_bid", "is_leading"))
+
+    def test_states_follow_the_bids(self):
+        self.assertEqual(self.states(), {
+            ("Lamp", "alice", Decimal("13.00"), True),
+            ("Lamp", "bob", Decimal("12.00"), False),
+            ("Clock", "alice", Decimal("20.00"), False),
+            ("Clock", "bob", Decimal("25.00"), True),
+        })
+
+    def test_dashboard_sections(self):
+        closing.close_listings(AuctionListing.objects.filter(pk=self.clock.pk))
+        self.client.force_login(self.bob)
+        with self.assertNumQueries(3):  # session, user and the bid states
+            response = self.client.get(reverse("my_bids"))
+        titles = {name: [state.listing.title for state in response.context[name]]
+                  for name in ("winning", "outbid", "won", "lost")}
+        self.assertEqual(titles, {"winning": [], "outbid": ["Lamp"], "won": ["Clock"], "lost": []})
+
+    def test_dashboard_needs_login(self):
+        self.assertRedirects(self.client.get(reverse("my_bids")), reverse("login"), fetch_redirect_response=False)
+
+    def test_rebuild_matches_incremental_states(self):
+        expected = self.states()
+        UserBidState.objects.update(is_leading=False, max_bid=0)
+        stdout = StringIO()
+        call_command("rebuild_bid_states", batch_size=3, stdout=stdout)
+        self.assertIn("Rebuilt 4 bid states", stdout.getvalue())
+        self.assertEqual(self.states(), expected)
+
+
+class HttpCachingTests(AuctionsTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        cls.viewer = User.objects.create_user("viewer", "viewer@example.com", "password")
+        cls.category = Category.objects.create(category_name="Home")
+
+    def setUp(self):
+        super().setUp()
+        self.listing = make_listing(self.seller, self.category)
+        self.url = reverse("listing", args=(self.listing.id,))
+        self.client.force_login(self.viewer)
+
+    def test_unchanged_listing_page_is_not_modified(self):
+        response = self.client.get(self.url)
+        etag = response["ETag"]
+        self.assertTrue(etag.startswith(f'W/"{self.listing.id}-'))
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+        self.assertIn("Cookie", response["Vary"])
+
+        with self.assertNumQueries(2):  # session and user only
+            cached = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached["ETag"], etag)
+
+        # Watching the listing changes what the viewer sees
+        self.listing.watchlist.add(self.viewer)
+        watched = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(watched.status_code, 200)
+        bidding.place_bid(self.listing.id, self.seller, Decimal("30"))
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=watched["ETag"]).status_code, 200)
+
+    def test_etag_is_per_user(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.client.force_login(self.seller)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_pending_messages_are_never_revalidated(self):
+        self.client.post(reverse("place_bid", args=(self.listing.id,)), {"bid": "50"})
+        response = self.client.get(self.url)
+        self.assertContains(response, "Your bid was sucessfully placed.")
+        # Only ConditionalGetMiddleware's content hash, which never repeats
+        self.assertFalse(response["ETag"].startswith(f'W/"{self.listing.id}-'))
+        self.assertTrue(self.client.get(self.url)["ETag"].startswith(f'W/"{self.listing.id}-'))
+
+    def test_category_pages_get_content_etags(self):
+        response = self.client.get(reverse("categories"))
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+        cached = self.client.get(reverse("categories"), HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_pages_are_compressed(self):
+        response = self.client.get(reverse("index"), HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+    def reload_urls(self):
+        clear_url_caches()
+        importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+
+    def test_static_files_are_only_served_in_development(self):
+        # The test runner turns DEBUG off, as in production
+        self.assertEqual(self.client.get("/static/auctions/styles.css").status_code, 404)
+
+    def test_hashed_static_files_are_immutable(self):
+        self.addCleanup(self.reload_urls)
+        with tempfile.TemporaryDirectory() as static_root, override_settings(
+            STATIC_ROOT=static_root,
+            STORAGES={**settings.STORAGES, "staticfiles": {
+                "BACKEND": "django.contrib.staticfiles.storage.ManifestStaticFilesStorage",
+            }},
+        ):
+            call_command("collectstatic", interactive=False, verbosity=0)
+            hashed = static("auctions/styles.css")
+            self.assertNotEqual(hashed, "/static/auctions/styles.css")
+            # The URLconf only adds the static route if DEBUG is on when it loads
+            with override_settings(DEBUG=True):
+                self.reload_urls()
+            response = self.client.get(hashed)
+            self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+            self.assertTrue(b"".join(response.streaming_content))
+            response = self.client.get("/static/auctions/styles.css")
+            self.assertEqual(response["Cache-Control"], "no-cache")
+            self.assertTrue(b"".join(response.streaming_content))
+
+
+# Image bytes served by fetch_test_image, keyed by URL
+TEST_IMAGES = {}
+
+
+def fetch_test_image(url):
+    try:
+        return TEST_IMAGES[url]
+    except KeyError:
+        raise images.ImageError(f"No test image at {url}")
+
+
+def png_bytes(width, height):
+    output = BytesIO()
+    images.Image.new("RGB", (width, height), "orange").save(output, "PNG")
+    return output.getvalue()
+
+
+@override_settings(AUCTIONS_IMAGE_FETCHER="auctions.tests.fetch_test_image", AUCTIONS_IMAGE_WIDTHS=(100, 200))
+class ListingImageTests(AuctionsTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        cls.category = Category.objects.create(category_name="Home")
+
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        TEST_IMAGES.clear()
+
+    def test_new_and_changed_urls_are_queued(self):
+        listing = make_listing(self.seller, self.category, image_url="https://example.com/a.png")
+        self.assertEqual(listing.image.source_url, "https://example.com/a.png")
+        ListingImage.objects.filter(listing=listing).update(status=ListingImage.READY)
+
+        listing.save()  # unchanged URL keeps the thumbnails
+        self.assertEqual(ListingImage.objects.get(listing=listing).status, ListingImage.READY)
+        listing.image_url = "https://example.com/b.png"
+        listing.save()
+        image = ListingImage.objects.get(listing=listing)
+        self.assertEqual((image.source_url, image.status), ("https://example.com/b.png", ListingImage.PENDING))
+        listing.image_url = ""
+        listing.save()
+        self.assertFalse(ListingImage.objects.filter(listing=listing).exists())
+
+    def test_listings_without_images_queue_nothing(self):
+        make_listing(self.seller, self.category)
+        self.assertFalse(ListingImage.objects.exists())
+
+    @skipUnless(images.Image, "needs Pillow")
+    def test_worker_writes_thumbnails_and_pages_use_them(self):
+        TEST_IMAGES["https://example.com/big.png"] = png_bytes(400, 300)
+        TEST_IMAGES["https://example.com/small.png"] = png_bytes(150, 100)
+        big = make_listing(self.seller, self.category, title="Big", image_url="https://example.com/big.png")
+        small = make_listing(self.seller, self.category, title="Small", image_url="https://example.com/small.png")
+
+        stdout = StringIO()
+        call_command("process_images", workers=2, stdout=stdout)
+        self.assertIn("Thumbnailed 2 images, 0 failed.", stdout.getvalue())
+        # Never upscaled: the 150px original gets 100px and 150px thumbnails only
+        self.assertEqual(sorted(ListingImage.objects.get(listing=big).thumbnails), ["100", "200"])
+        self.assertEqual(sorted(ListingImage.objects.get(listing=small).thumbnails), ["100", "150"])
+        thumbnail = ListingImage.objects.get(listing=big).thumbnails["200"]["webp"]
+        with images.default_storage.open(thumbnail) as file, images.Image.open(file) as image:
+            self.assertEqual((image.format, image.size), ("WEBP", (200, 150)))
+
+        response = self.client.get(reverse("listing", args=(big.id,)))
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, f"/media/listings/{big.id}/{big.image.pk}-200.jpeg 200w")
+        self.assertContains(response, 'loading="lazy"')
+        self.assertNotContains(response, "https://example.com/big.png")
+
+        feed = self.client.get(reverse("listings_feed")).json()["listings"]
+        self.assertEqual({row["title"]: row["image"]["srcset"].count("w,") for row in feed}, {"Big": 1, "Small": 1})
+
+    @skipUnless(images.Image, "needs Pillow")
+    def test_failures_are_recorded_and_can_be_retried(self):
+        TEST_IMAGES["https://example.com/junk.png"] = b"not an image"
+        listing = make_listing(self.seller, self.category, image_url="https://example.com/junk.png")
+        listing_gone = make_listing(self.seller, self.category, image_url="https://example.com/missing.png")
+
+        self.assertEqual(images.process_pending(), (0, 2))
+        self.assertIn("Not a readable image", ListingImage.objects.get(listing=listing).error)
+        self.assertIn("No test image", ListingImage.objects.get(listing=listing_gone).error)
+        # A failed image falls back to the original URL
+        self.assertContains(self.client.get(reverse("listing", args=(listing.id,))), 'src="https://example.com/junk.png"')
+
+        TEST_IMAGES["https://example.com/junk.png"] = png_bytes(50, 50)
+        with override_settings(AUCTIONS_IMAGE_MAX_PIXELS=49 * 50):
+            call_command("process_images", retry_failed=True, stdout=StringIO())
+        self.assertEqual(ListingImage.objects.get(listing=listing).error, "The image has too many pixels.")
+        call_command("process_images", retry_failed=True, stdout=StringIO())
+        self.assertEqual(ListingImage.objects.get(listing=listing).status, ListingImage.READY)
+        self.assertEqual(ListingImage.objects.get(listing=listing_gone).status, ListingImage.FAILED)
+
+    def test_index_loads_images_with_the_listings(self):
+        for n in range(3):
+            make_listing(self.seller, self.category, image_url=f"https://example.com/{n}.png")
+        directory.category_directory()
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("index"))
+        self.assertContains(response, 'loading="lazy"', count=3)
+
+
+
+class ImageFetchTests(AuctionsTestCase):
+
+    def serve(self, routes):
+        """Serve ``{path: (status, headers, body)}`` on localhost; returns the base URL and the paths hit."""
+        hits = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                hits.append(self.path)
+                status, headers, body = routes[self.path]
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return f"http://127.0.0.1:{server.server_port}", hits
+
+    def test_public_addresses(self):
+        for address in ("8.8.8.8", "2001:4860:4860::8888"):
+            self.assertTrue(images.is_public_address(address), address)
+        for address in ("127.0.0.1", "10.1.2.3", "192.168.0.1", "172.16.0.1", "169.254.169.254", "100.64.0.1",
+                        "0.0.0.0", "224.0.0.1", "::1", "fe80::1", "fc00::1", "::ffff:127.0.0.1"):
+            self.assertFalse(images.is_public_address(address), address)
+
+    def test_internal_hosts_are_refused(self):
+        base, hits = self.serve({"/image.png": (200, {}, b"image")})
+        for url in (f"{base}/image.png", "http://localhost:1/", "http://169.254.169.254/latest/meta-data/",
+                    "http://[::1]:1/", "https://10.0.0.1/"):
+            with self.assertRaisesMessage(images.ImageError, "Image URLs must point to a public address."):
+                images.fetch_url(url)
+        self.assertEqual(hits, [])
+        with self.assertRaisesMessage(images.ImageError, "Only http and https"):
+            images.fetch_url("file:///etc/passwd")
+
+    def test_malformed_urls_fail_the_image_not_the_batch(self):
+        for url in ("http://example.com:abc/x.png", "http://exa mple.com/x.png", "http://[::1/x.png"):
+            with self.assertRaisesMessage(images.ImageError, "Could not fetch the image"):
+                images.fetch_url(url)
+
+        seller = User.objects.create_user("seller")
+        listing = make_listing(seller, Category.objects.create(category_name="Home"),
+                               image_url="http://example.com:abc/x.png")
+        self.assertEqual(images.process_pending(), (0, 1))
+        self.assertEqual(ListingImage.objects.get(listing=listing).status, ListingImage.FAILED)
+
+    def test_redirects_are_checked_too(self):
+        base, hits = self.serve({
+            "/image.png": (200, {}, b"image"),
+            "/internal": (302, {"Location": "/image.png"}, b""),
+            "/ftp": (302, {"Location": "ftp://127.0.0.1/image.png"}, b""),
+        })
+        # Let the first connection through, as if this server were public
+        with mock.patch("auctions.images.is_public_address", return_value=True):
+            self.assertEqual(images.fetch_url(f"{base}/image.png"), b"image")
+        with mock.patch("auctions.images.is_public_address", side_effect=[True, False]):
+            with self.assertRaisesMessage(images.ImageError, "Image URLs must point to a public address."):
+                images.fetch_url(f"{base}/internal")
+        with mock.patch("auctions.images.is_public_address", side_effect=[True]):
+            with self.assertRaisesMessage(images.ImageError, "Only http and https"):
+                images.fetch_url(f"{base}/ftp")
+        self.assertEqual(hits, ["/image.png", "/internal", "/ftp"])
+
+
+class WatchlistCacheTests(AuctionsTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        cls.viewer = User.objects.create_user("viewer", "viewer@example.com", "password")
+        cls.other = User.objects.create_user("other", "other@example.com", "password")
+        cls.category = Category.objects.create(category_name="Home")
+
+    def setUp(self):
+        super().setUp()
+        self.lamp = make_listing(self.seller, self.category, title="Lamp")
+        self.clock = make_listing(self.seller, self.category, title="Clock")
+        self.client.force_login(self.viewer)
+
+    def watcher_counts(self):
+        return dict(AuctionListing.objects.values_list("title", "watcher_count"))
+
+    def test_changes_are_written_through(self):
+        self.assertEqual(watchlists.watched_ids(self.viewer), set())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("addWatchlist", args=(self.lamp.id,)))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.clock.watchlist.add(self.viewer, self.other)
+        with self.assertNumQueries(0):
+            self.assertEqual(watchlists.watched_ids(self.viewer), {self.lamp.id, self.clock.id})
+            self.assertEqual(watchlists.watched_among(self.viewer, [self.clock.id, 999]), {self.clock.id})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("removeWatchlist", args=(self.lamp.id,)))
+        with self.assertNumQueries(0):
+            self.assertFalse(watchlists.is_watching(self.viewer, self.lamp.id))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.viewer.listing_watchlist.clear()
+        self.assertEqual(watchlists.watched_ids(self.viewer), set())
+
+    def test_rolled_back_changes_leave_the_cache_alone(self):
+        watchlists.watched_ids(self.viewer)
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.viewer.listing_watchlist.add(self.lamp)
+                raise RuntimeError
+        self.assertEqual(watchlists.watched_ids(self.viewer), set())
+
+    def test_watcher_counts_are_maintained(self):
+        self.lamp.watchlist.add(self.viewer, self.other)
+        self.lamp.watchlist.add(self.viewer)  # already watching
+        self.other.listing_watchlist.add(self.clock)
+        self.assertEqual(self.watcher_counts(), {"Lamp": 2, "Clock": 1})
+        self.clock.watchlist.remove(self.viewer)  # never watched it
+        self.assertEqual(self.watcher_counts(), {"Lamp": 2, "Clock": 1})
+        self.other.listing_watchlist.clear()
+        self.assertEqual(self.watcher_counts(), {"Lamp": 1, "Clock": 0})
+        self.lamp.watchlist.clear()
+        self.assertEqual(self.watcher_counts(), {"Lamp": 0, "Clock": 0})
+
+    def test_pages_show_watch_state(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("addWatchlist", args=(self.lamp.id,)))
+        index = self.client.get(reverse("index"))
+        self.assertContains(index, "Watching", count=1)
+        self.assertEqual(index.context["watched"], {self.lamp.id})
+        feed = self.client.get(reverse("listings_feed")).json()["listings"]
+        self.assertEqual({row["title"]: row["watched"] for row in feed}, {"Lamp": True, "Clock": False})
+        self.assertContains(self.client.get(reverse("listing", args=(self.lamp.id,))), "1 watching")
+        self.assertEqual([listing.title for listing in self.client.get(reverse("watchlist")).context["listings"]],
+                         ["Lamp"])
+
+
+class CommentPagingTests(AuctionsTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        cls.category = Category.objects.create(category_name="Home")
+
+    def setUp(self):
+        super().setUp()
+        self.listing = make_listing(self.seller, self.category)
+        start = timezone.now() - timedelta(days=1)
+        # Pairs of comments share a timestamp, so ties have to be broken by id
+        Comments.objects.bulk_create(
+            Comments(listing=self.listing, author=self.seller, message=f"Comment {n}",
+                     created_at=start + timedelta(minutes=n // 2))
+            for n in range(45)
+        )
+        self.url = reverse("listing", args=(self.listing.id,))
+
+    def test_listing_page_shows_the_newest_page(self):
+        response = self.client.get(self.url)
+        self.assertEqual([comment.message for comment in response.context["comments"]],
+                         [f"Comment {n}" for n in range(25, 45)])
+        self.assertContains(response, 'id="older-comments"')
+
+    def test_older_pages_follow_the_cursor(self):
+        cursor = self.client.get(self.url).context["comments"].older_cursor
+        url = f"{reverse('comments_feed', args=(self.listing.id,))}?before={cursor}"
+        seen = []
+        while url:
+            with self.assertNumQueries(1):
+                page = self.client.get(url).json()
+            seen += [comment["message"] for comment in page["comments"]]
+            url = page["next"]
+        self.assertEqual(seen, [f"Comment {n}" for n in range(24, -1, -1)])
+
+    def test_page_cost_does_not_grow_with_comments(self):
+        with self.assertNumQueries(2):  # listing, one page of comments
+            self.client.get(self.url)
+
+    @skipUnless(connection.vendor == "sqlite", "EXPLAIN output is SQLite's")
+    def test_older_pages_use_the_index(self):
+        queryset = Comments.objects.filter(listing=self.listing)
+        rows, cursor = pagination.timeline_page(queryset, limit=5)
+        plan = pagination._older_than(queryset, cursor, "created_at").order_by("-created_at", "-id").explain()
+        self.assertIn("comment_listing_created_idx", plan)
+
+
+class BidLedgerTests(AuctionsTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        cls.alice = User.objects.create_user("alice", "alice@example.com", "password")
+        cls.bob = User.objects.create_user("bob", "bob@example.com", "password")
+        cls.category = Category.objects.create(category_name="Home")
+
+    def setUp(self):
+        super().setUp()
+        self.listing = make_listing(self.seller, self.category)
+        self.start = datetime(2026, 1, 5, 12, 0, tzinfo=dt_timezone.utc)
+
+    def bid_at(self, seconds, bidder, amount, listing=None):
+        with mock.patch("auctions.bidding.timezone.now", return_value=self.start + timedelta(seconds=seconds)):
+            return bidding.place_bid((listing or self.listing).id, bidder, Decimal(amount))
+
+    def rollups(self, listing=None):
+        return list(BidRollup.objects.filter(listing=listing or self.listing).order_by("bucket")
+                    .values_list("bucket", "bids", "max_price"))
+
+    def test_bids_are_rolled_up_per_minute(self):
+        self.bid_at(5, self.alice, "11")
+        self.bid_at(30, self.bob, "12")
+        self.bid_at(70, self.alice, "15")
+        self.assertEqual(Bid.objects.order_by("id").first().created_at, self.start + timedelta(seconds=5))
+        self.assertEqual(self.rollups(), [
+            (self.start, 2, Decimal("12.00")),
+            (self.start + timedelta(minutes=1), 1, Decimal("15.00")),
+        ])
+
+        url = reverse("api_listing_history", args=(self.listing.id,))
+        with self.assertNumQueries(1):
+            history = self.client.get(url).json()
+        self.assertEqual(history["bucket_seconds"], 60)
+        self.assertEqual([(bucket["bids"], bucket["max_price"]) for bucket in history["buckets"]],
+                         [(2, "12.00"), (1, "15.00")])
+        recent = self.client.get(url, {"since": (self.start + timedelta(seconds=61)).isoformat()}).json()
+        self.assertEqual(len(recent["buckets"]), 1)
+        self.assertEqual(self.client.get(reverse("api_listing_history", args=(999,))).status_code, 404)
+
+    def test_bids_are_append_only(self):
+        bid = self.bid_at(0, self.alice, "11")
+        bid.bid_amount = Decimal("99")
+        with self.assertRaises(ValueError):
+            bid.save()
+
+    def test_bulk_inserted_bids_can_be_rolled_up(self):
+        Bid.objects.bulk_create([
+            Bid(listing=self.listing, bidder=self.alice, bid_amount=Decimal(amount),
+                created_at=self.start + timedelta(seconds=seconds))
+            for seconds, amount in ((1, "11"), (2, "13"), (90, "14"))
+        ])
+        self.assertEqual(ledger.rollup_bids(Bid.objects.all(), batch_size=2), 3)
+        self.assertEqual(self.rollups(), [
+            (self.start, 2, Decimal("13.00")),
+            (self.start + timedelta(minutes=1), 1, Decimal("14.00")),
+        ])
+
+    def test_compaction_keeps_rollups_and_each_bidders_highest(self):
+        active = make_listing(self.seller, self.category, title="Still open")
+        for n, bidder in enumerate([self.alice, self.bob, self.alice, self.bob, self.alice]):
+            self.bid_at(n * 60, bidder, str(11 + n))
+            self.bid_at(n * 60, bidder, str(11 + n), listing=active)
+        closing.close_listings(AuctionListing.objects.filter(pk=self.listing.pk))
+        rollups, states = self.rollups(), set(UserBidState.objects.values_list("listing", "user", "max_bid"))
+
+        stdout = StringIO()
+        with mock.patch("auctions.management.commands.compact_bids.timezone.now",
+                        return_value=self.start + timedelta(days=40)):
+            call_command("compact_bids", days=30, batch_size=1, stdout=stdout)
+        self.assertIn("Compacted 3 bids on 1 listings.", stdout.getvalue())
+
+        self.assertEqual(sorted(Bid.objects.filter(listing=self.listing).values_list("bid_amount", flat=True)),
+                         [Decimal("14.00"), Decimal("15.00")])
+        self.assertEqual(Bid.objects.filter(listing=active).count(), 5)
+        self.assertEqual(self.rollups(), rollups)
+        # The bid count, the winner and everyone's standing survive a rebuild
+        call_command("repair_bid_stats", stdout=StringIO())
+        self.listing.refresh_from_db()
+        self.assertEqual((self.listing.bid_count, self.listing.winner), (5, self.alice))
+        bidding.rebuild_user_bid_states()
+        self.assertEqual(set(UserBidState.objects.values_list("listing", "user", "max_bid")), states)
+
+
+class FakeClock:
+
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class DeadlineSchedulerTests(TestCase):
+
+    def test_thousands_of_deadlines_close_on_time(self):
+        rng = random.Random(0)
+        start = 1_800_000_000
+        deadlines = {key: start + rng.randrange(3600) for key in range(5000)}
+        # ...and a few hundred that all end in the same second
+        deadlines.update({key: start + 1800 for key in range(5000, 5300)})
+        # A tenth of the auctions get a late bid that extends them (soft close)
+        extend = set(rng.sample(sorted(deadlines), 500))
+        closed_at, loads, batches = {}, [], []
+        clock = FakeClock(start)
+
+        def load(until):
+            loads.append(until)
+            return [(deadline, key) for key, deadline in deadlines.items()
+                    if key not in closed_at and deadline <= until]
+
+        def close(keys, now):
+            batches.append(len(keys))
+            moved = []
+            for key in keys:
+                self.assertLessEqual(deadlines[key], now)
+                if key in extend:
+                    extend.discard(key)
+                    deadlines[key] = now + 120
+                    moved.append((deadlines[key], key))
+                else:
+                    closed_at[key] = now
+            return moved
+
+        scheduler = scheduling.DeadlineScheduler(load, close, clock=clock, sleep=clock.sleep,
+                                                 horizon=300, refresh_interval=30, batch_size=100)
+        scheduler.run(stop=lambda: len(closed_at) == len(deadlines))
+
+        # Every auction closed exactly at its final deadline, extended or not
+        self.assertEqual(closed_at, deadlines)
+        self.assertEqual(len(scheduler), 0)
+        # Deadlines were loaded once per refresh interval, not per wakeup...
+        self.assertLessEqual(len(loads), (max(deadlines.values()) - start) // 30 + 2)
+        # ...and auctions ending together were closed together, within the batch size
+        self.assertLess(len(batches), len(deadlines))
+        self.assertEqual(max(batches), 100)
+
+    def test_refresh_interval_cannot_exceed_horizon(self):
+        with self.assertRaises(ValueError):
+            scheduling.DeadlineScheduler(list, list, horizon=10, refresh_interval=60)
+
+
+class SoftCloseTests(AuctionsTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        cls.bidder = User.objects.create_user("bidder", "bidder@example.com", "password")
+        cls.category = Category.objects.create(category_name="Home")
+
+    def setUp(self):
+        super().setUp()
+        self.now = timezone.now().replace(microsecond=0)
+        self.listing = make_listing(self.seller, self.category, end_time=self.now + timedelta(seconds=30))
+
+    def bid_at(self, when, amount="20"):
+        with mock.patch("auctions.bidding.timezone.now", return_value=when):
+            bidding.place_bid(self.listing.id, self.bidder, Decimal(amount))
+        self.listing.refresh_from_db()
+        return self.listing.end_time
+
+    @override_settings(AUCTIONS_SOFT_CLOSE_SECONDS=60, AUCTIONS_SOFT_CLOSE_EXTENSION=120)
+    def test_late_bids_extend_the_auction(self):
+        self.assertEqual(self.bid_at(self.now), self.now + timedelta(seconds=120))
+        # Outside the window: no change
+        self.assertEqual(self.bid_at(self.now + timedelta(seconds=10), "21"), self.now + timedelta(seconds=120))
+        late = self.now + timedelta(seconds=100)
+        self.assertEqual(self.bid_at(late, "22"), late + timedelta(seconds=120))
+
+    @override_settings(AUCTIONS_SOFT_CLOSE_SECONDS=0)
+    def test_soft_close_can_be_turned_off(self):
+        self.assertEqual(self.bid_at(self.now), self.now + timedelta(seconds=30))
+
+    @override_settings(AUCTIONS_SOFT_CLOSE_SECONDS=60, AUCTIONS_SOFT_CLOSE_EXTENSION=120)
+    def test_scheduler_closes_extended_auctions_when_they_end(self):
+        other = make_listing(self.seller, self.category, title="Clock", end_time=self.now + timedelta(seconds=45))
+        open_ended = make_listing(self.seller, self.category, title="Chair")
+        self.bid_at(self.now)  # now ends at +120
+        clock = FakeClock(self.now.timestamp())
+        scheduler = closing.deadline_scheduler(horizon=300, refresh_interval=30, clock=clock, sleep=clock.sleep)
+
+        closed_at = {}
+        while len(closed_at) < 2:
+            scheduler.run_once()
+            for listing_id in AuctionListing.objects.filter(is_active=False).values_list("id", flat=True):
+                closed_at.setdefault(listing_id, clock() - self.now.timestamp())
+            clock.sleep(max(0.0, scheduler.next_wakeup() - clock()))
+
+        self.assertEqual(closed_at, {other.id: 45, self.listing.id: 120})
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.winner, self.bidder)
+        self.assertTrue(AuctionListing.objects.get(pk=open_ended.pk).is_active)
+
+
+@override_settings(AUCTIONS_RATE_LIMITS={"bids": (5, 60), "comments": (3, 60), "watchlist": (5, 60)})
+class RateLimitTests(AuctionsTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        cls.bidder = User.objects.create_user("bidder", "bidder@example.com", "password")
+        cls.other = User.objects.create_user("other", "other@example.com", "password")
+        cls.category = Category.objects.create(category_name="Home")
+
+    def setUp(self):
+        super().setUp()
+        self.listing = make_listing(self.seller, self.category, starting_bid=Decimal("1.00"))
+        self.amount = Decimal("1.00")
+        # Start at the beginning of a window so the tests don't straddle two
+        self.clock = mock.patch("auctions.ratelimit._now", return_value=600.0)
+        self.now = self.clock.start()
+        self.addCleanup(self.clock.stop)
+
+    def bid(self, client=None, ip="10.0.0.1"):
+        self.amount += 1
+        return (client or self.client).post(
+            reverse("place_bid", args=(self.listing.id,)), {"bid": str(self.amount)}, REMOTE_ADDR=ip
+        )
+
+    def test_requests_over_the_limit_get_429(self):
+        self.client.force_login(self.bidder)
+        self.assertEqual([self.bid().status_code for _ in range(5)], [302] * 5)
+        response = self.bid()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "60")
+        self.assertEqual(Bid.objects.filter(listing=self.listing).count(), 5)
+
+    def test_allowance_refills_over_the_next_window(self):
+        self.client.force_login(self.bidder)
+        for _ in range(5):
+            self.bid()
+        self.now.return_value = 690.0
+        # Half of the last window's five still counts
+        self.assertEqual([self.bid().status_code for _ in range(3)], [302, 302, 429])
+        self.now.return_value = 780.0
+        self.assertEqual([self.bid().status_code for _ in range(5)], [302] * 5)
+
+    def test_rejected_requests_do_not_use_up_the_allowance(self):
+        self.client.force_login(self.bidder)
+        for _ in range(50):
+            self.bid()
+        self.now.return_value = 690.0
+        self.assertEqual([self.bid().status_code for _ in range(3)], [302, 302, 429])
+
+    def test_users_and_addresses_are_limited_separately(self):
+        self.client.force_login(self.bidder)
+        for _ in range(5):
+            self.bid()
+        self.assertEqual(self.bid(ip="10.0.0.2").status_code, 429)
+
+        other = self.client_class()
+        other.force_login(self.other)
+        self.assertEqual(self.bid(other, ip="10.0.0.1").status_code, 429)
+        self.assertEqual(self.bid(other, ip="10.0.0.3").status_code, 302)
+
+    def test_scopes_have_their_own_limits(self):
+        self.client.force_login(self.bidder)
+        url = reverse("comments", args=(self.listing.id,))
+        statuses = [self.client.post(url, {"newComment": "Hi"}).status_code for _ in range(4)]
+        self.assertEqual(statuses, [302, 302, 302, 429])
+        self.assertEqual(self.bid().status_code, 302)
+
+    def test_reads_are_not_limited(self):
+        self.client.force_login(self.bidder)
+        for _ in range(5):
+            self.bid()
+        self.assertEqual(self.client.get(reverse("listing", args=(self.listing.id,))).status_code, 200)
+
+    def test_api_answers_429_with_json(self):
+        self.client.force_login(self.bidder)
+        url = reverse("api_watchlist_item", args=(self.listing.id,))
+        for _ in range(5):
+            self.assertEqual(self.client.put(url).status_code, 200)
+        response = self.client.delete(url)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.json(), {"error": "Too many requests. Please slow down."})
+        self.assertIn("Retry-After", response)
+
+    def test_watchlist_changes_need_a_post(self):
+        self.client.force_login(self.bidder)
+        url = reverse("addWatchlist", args=(self.listing.id,))
+        self.assertEqual({self.client.get(url).status_code for _ in range(10)}, {405})
+        self.assertFalse(self.listing.watchlist.exists())
+        statuses = [self.client.post(url).status_code for _ in range(6)]
+        self.assertEqual(statuses, [302] * 5 + [429])
+        self.assertEqual(self.client.get(reverse("removeWatchlist", args=(self.listing.id,))).status_code, 405)
+        self.assertTrue(self.listing.watchlist.filter(pk=self.bidder.pk).exists())
+
+    @override_settings(AUCTIONS_RATE_LIMITS={})
+    def test_limits_can_be_turned_off(self):
+        self.client.force_login(self.bidder)
+        self.assertEqual({self.bid().status_code for _ in range(20)}, {302})
+
+    @override_settings(AUCTIONS_RATE_LIMITS={"bids": (20, 60)})
+    def test_bidding_holds_up_under_a_flood(self):
+        attacker = self.client_class()
+        attacker.force_login(self.other)
+        self.client.force_login(self.bidder)
+        bid_url = reverse("api_listing_bids", args=(self.listing.id,))
+        anonymous = self.client_class()
+
+        accepted, rejected_queries = [], []
+        for attempt in range(300):
+            # A signed-in bidder and an anonymous script hammer the site from one address
+            for client in (attacker, anonymous):
+                self.amount += 1
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.post(bid_url, json.dumps({"amount": str(self.amount)}),
+                                           content_type="application/json", REMOTE_ADDR="203.0.113.9")
+                if response.status_code == 429:
+                    rejected_queries.append(len(queries))
+            if attempt % 30 == 0:
+                # Meanwhile a real bidder elsewhere keeps bidding
+                accepted.append(self.bid(ip="198.51.100.7").status_code)
+
+        self.assertEqual(accepted, [302] * 10)
+        self.assertEqual(len(rejected_queries), 600 - 20)
+        # Turned away before any work: at most the session and user lookups
+        self.assertLessEqual(max(rejected_queries), 2)
+        # The address allowance went to the first few attempts of either
+        self.assertEqual(Bid.objects.filter(listing=self.listing, bidder=self.other).count(), 10)
+        self.assertEqual(Bid.objects.filter(listing=self.listing, bidder=self.bidder).count(), 10)
+
+    def test_counters_recover_from_eviction(self):
+        keys = ["ip:10.0.0.1"]
+        self.assertIsNone(ratelimit.check("bids", keys))
+        cache.clear()
+        self.assertEqual([ratelimit.check("bids", keys) for _ in range(6)], [None] * 5 + [60])
+
+
+class BrowseTests(AuctionsTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user("seller", "seller@example.com", "password")
+        cls.bidder = User.objects.create_user("bidder", "bidder@example.com", "password")
+        cls.home = Category.objects.create(category_name="Home")
+        cls.garden = Category.objects.create(category_name="Garden")
+        rng = random.Random(3)
+        cls.listings = [
+            make_listing(cls.seller, rng.choice([cls.home, cls.garden]), title=f"Listing {n}",
+                         # Few distinct values, so every sort has ties to break
+                         starting_bid=Decimal(rng.choice(["5.00", "10.00", "49.99", "50.00", "120.00", "600.00"])),
+                         bid_count=rng.randint(0, 3), is_active=n % 5 != 0)
+            for n in range(40)
+        ]
+
+    def params(self, **query):
+        return browse.browse_params(query, category_id=query.pop("category_id", None))
+
+    def walk(self, params, limit=4):
+        # Follow the cursors to the end, as the pages and the feed do
+        seen, before = [], None
+        while True:
+            rows, before = pagination.ordered_page(browse.listings(params, before), limit=limit)
+            seen += rows
+            if before is None:
+                return seen
+
+    def expected(self, params):
+        _, field, descending = browse.SORTS[params["sort"]]
+        matching = [
+            listing for listing in AuctionListing.objects.all()
+            if (params["status"] == "all" or listing.is_active == (params["status"] == "active"))
+            and params["category_id"] in (None, listing.category_id)
+            and (params["min_price"] is None or listing.price >= params["min_price"])
+            and (params["max_price"] is None or listing.price <= params["max_price"])
+        ]
+        return sorted(matching, key=lambda listing: (getattr(listing, field), listing.id), reverse=descending)
+
+    def test_every_sort_and_filter_pages_through_all_matches(self):
+        for sort in browse.SORTS:
+            for query in ({}, {"min_price": "10"}, {"max_price": "50"}, {"min_price": "10", "max_price": "120"},
+                          {"status": "all"}, {"status": "closed", "category_id": self.home.id},
+                          {"category_id": self.garden.id, "min_price": "49.99"}):
+                params = self.params(sort=sort, **query)
+                with self.subTest(sort=sort, **query):
+                    self.assertEqual(self.walk(params), self.expected(params))
+
+    def test_price_follows_bids(self):
+        listing = self.listings[1]
+        bidding.place_bid(listing.id, self.bidder, listing.starting_bid + 1000)
+        listing = AuctionListing.objects.get(pk=listing.pk)
+        self.assertEqual(listing.price, listing.current_price)
+        rows, _ = pagination.ordered_page(browse.listings(self.params(sort="-price")), limit=1)
+        self.assertEqual(rows, [listing])
+
+    def test_junk_parameters_are_ignored(self):
+        params = self.params(sort="nope", status="maybe", min_price="cheap", max_price="-5")
+        self.assertEqual(params, self.params())
+        self.assertEqual(browse.query_string(params), "")
+        self.assertEqual(browse.query_string(self.params(sort="price", min_price="10")), "sort=price&min_price=10")
+
+    def test_facets_come_from_one_query(self):
+        directory.category_directory()
+        params = self.params(min_price="10", max_price="120", category_id=self.home.id)
+        with self.assertNumQueries(1):
+            facets = browse.facet_counts(params)
+        # Cached, and shared with the other categories' pages
+        with self.assertNumQueries(0):
+            self.assertEqual(browse.facet_counts(params), facets)
+            browse.facet_counts({**params, "category_id": self.garden.id})
+
+        active = [listing for listing in self.listings if listing.is_active]
+        # Category counts keep the price range but not the category...
+        self.assertEqual({category["category_name"]: category["count"] for category in facets["categories"]}, {
+            category.category_name: sum(1 for listing in active
+                                        if listing.category_id == category.id and 10 <= listing.starting_bid <= 120)
+            for category in (self.home, self.garden)
+        })
+        # ...and price bands keep the category but not the price range
+        bands = [(band["min_price"], band["max_price"], band["count"]) for band in facets["prices"]]
+        self.assertEqual([(low, high) for low, high, _ in bands], [
+            (None, Decimal("9.99")), (Decimal(10), Decimal("49.99")), (Decimal(50), Decimal("99.99")),
+            (Decimal(100), Decimal("499.99")), (Decimal(500), None),
+        ])
+        home = [listing.starting_bid for listing in active if listing.category_id == self.home.id]
+        self.assertEqual([count for _, _, count in bands], [
+            sum(1 for price in home if (low is None or price >= low) and (high is None or price <= high))
+            for low, high, _ in bands
+        ])
+        self.assertEqual(sum(count for _, _, count in bands), len(home))
+        self.assertEqual([band["selected"] for band in facets["prices"]], [False] * 5)
+
+    def test_category_page_filters_sorts_and_pages(self):
+        url = reverse("category_listings", args=(self.home.id,))
+        params = self.params(sort="price", status="all", category_id=self.home.id)
+        expected = self.expected(params)
+        response = self.client.get(url, {"sort": "price", "status": "all"})
+        self.assertEqual(response.context["listings"], expected[:24])
+        self.assertContains(response, "Listings in Category: Home")
+
+        seen, query = [], {"sort": "price", "status": "all"}
+        while True:
+            response = self.client.get(url, query)
+            seen += response.context["listings"]
+            if not response.context["next_cursor"]:
+                break
+            self.assertContains(response, f'href="?{response.context["next_query"]}"')
+            query = dict(pair.split("=") for pair in response.context["next_query"].split("&"))
+        self.assertEqual(seen, expected)
+
+    def test_index_and_feed_keep_the_filters(self):
+        query = {"sort": "bids", "min_price": "10"}
+        expected = self.expected(self.params(**query))
+        response = self.client.get(reverse("index"), query)
+        self.assertEqual(response.context["listings"], expected[:24])
+        self.assertContains(response, f'{reverse("category_listings", args=(self.home.id,))}?sort=bids&amp;min_price=10')
+        # The filters don't leak into the search box in the navigation bar
+        self.assertContains(response, 'name="q" placeholder="Search listings" value=""')
+
+        feed = self.client.get(f'{reverse("listings_feed")}?{response.context["next_query"]}').json()
+        self.assertEqual([row["id"] for row in feed["listings"]], [listing.id for listing in expected[24:48]])
+        if feed["next"]:
+            self.assertIn("sort=bids", feed["next"])
+
+    def test_index_keeps_a_category_filter(self):
+        query = {"category": self.home.id, "status": "all"}
+        expected = self.expected(self.params(status="all", category_id=self.home.id))
+        response = self.client.get(reverse("index"), query)
+        self.assertIn(f"category={self.home.id}", response.context["next_query"])
+        # The category links carry the other filters only
+        self.assertContains(response, f'{reverse("category_listings", args=(self.garden.id,))}?status=all"')
+        self.assertEqual(response.context["listings"], expected[:24])
+        feed = self.client.get(reverse("listings_feed"), {**query, "before": expected[4].id}).json()
+        self.assertEqual([row["id"] for row in feed["listings"]], [listing.id for listing in expected[5:29]])
+
+        response = self.client.get(reverse("category_listings", args=(self.home.id,)), {"status": "all"})
+        self.assertNotIn("category=", response.context["next_query"])
+
+    @skipUnless(connection.vendor == "sqlite", "EXPLAIN output is SQLite's")
+    def test_browsing_uses_the_indexes(self):
+        cursor = self.listings[-1].id
+        for sort, category_id, index in (
+            ("price", None, "listing_active_price_idx"),
+            ("-price", self.home.id, "listing_cat_active_price_idx"),
+            ("bids", None, "listing_active_bids_idx"),
+            ("bids", self.home.id, "listing_cat_active_bids_idx"),
+            ("newest", None, "listing_active_id_idx"),
+            ("newest", self.home.id, "listing_cat_active_id_idx"),
+        ):
+            with self.subTest(sort=sort, category_id=category_id):
+                params = self.params(sort=sort, category_id=category_id)
+                self.assertIn(index, browse.listings(params).explain())
+                self.assertIn(index, browse.listings(params, before=cursor).explain())
+                self.assertNotIn("TEMP B-TREE", browse.listings(params, before=cursor).explain())
+
+
+class DatabaseConfigTests(TestCase):
+
+    def test_sqlite_connections_are_tuned(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("SQLite only")
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            if not connection.is_in_memory_db():
+                cursor.execute("PRAGMA journal_mode")
+                self.assertEqual(cursor.fetchone()[0], "wal")
+
+    def test_sqlite_is_the_default(self):
+        config = database_config({}, "/srv/commerce")
+        self.assertEqual(config["ENGINE"], "django.db.backends.sqlite3")
+        self.assertEqual(config["NAME"], "/srv/commerce/db.sqlite3")
+        self.assertEqual(config["CONN_MAX_AGE"], 60)
+        self.assertEqual(sqlite_pragmas({"SQLITE_BUSY_TIMEOUT": "100"})["busy_timeout"], "100")
+
+    def test_postgresql_behind_pgbouncer(self):
+        config = database_config({
+            "DATABASE_ENGINE": "postgresql",
+            "DATABASE_HOST": "pgbouncer",
+            "DATABASE_PORT": "6432",
+            "DATABASE_PGBOUNCER": "1",
+            "DATABASE_CONN_MAX_AGE": "0",
+        }, "/srv/commerce")
+        self.assertEqual(config["ENGINE"], "django.db.backends.postgresql")
+        self.assertEqual((config["HOST"], config["PORT"]), ("pgbouncer", "6432"))
+        self.assertTrue(config["DISABLE_SERVER_SIDE_CURSORS"])
+        self.assertEqual(config["CONN_MAX_AGE"], 0)
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            database_config({"DATABASE_ENGINE": "oracle"}, "/srv/commerce")
+
+
+class ConcurrentBidTests(TransactionTestCase):
+
+    def test_concurrent_bids_never_lose_the_highest_price(self):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            self.skipTest("threads cannot share an in-memory SQLite database")
+        seller = User.objects.create_user("seller")
+        bidders = [User.objects.create_user(f"bidder{i}") for i in range(8)]
+        listing = make_listing(seller, Category.objects.create(category_name="Home"),
+                               starting_bid=Decimal("0.00"))
+
+        result = run_bid_stress(listing.id, bidders, bids_per_bidder=25)
+
+        self.assertEqual(result["errors"], [])
+        self.assertEqual(result["accepted"] + result["rejected"], result["attempts"])
+        self.assertAlmostEqual(result["bids_per_second"], result["accepted"] / result["seconds"])
+        listing.refresh_from_db()
+        self.assertEqual(listing.current_price, result["highest_amount"])
+        # Every accepted bid was higher than the one accepted before it
+        amounts = list(Bid.objects.order_by("id").values_list("bid_amount", flat=True))
+        self.assertEqual(len(amounts), result["accepted"])
+        self.assertEqual(amounts, sorted(amounts))
+        self.assertEqual(len(set(amounts)), len(amounts))
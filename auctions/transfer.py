@@ -0,0 +1,214 @@
+"""Streaming bulk import and export of listings and bids.
+
+Files are read and written one row at a time, so memory stays bounded by the
+batch size however large the file is. Imports go through ``bulk_create`` in
+batches, resolving category names against a map fetched once up front and
+creating any missing categories in one insert per batch. Exports walk the
+table with ``iterator(chunk_size=...)``.
+
+Both directions speak CSV and JSON Lines, optionally gzipped (``.gz``).
+"""
+
+import csv
+import gzip
+import itertools
+import json
+import sys
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import bidding, directory
+from .models import AuctionListing, Bid, Category, ListingImage
+
+LISTING_FIELDS = ["title", "description", "starting_bid", "image_url", "category", "end_time"]
+
+EXPORTS = {
+    "listings": (
+        AuctionListing.objects.order_by("id"),
+        {
+            "id": "id",
+            "title": "title",
+            "description": "description",
+            "starting_bid": "starting_bid",
+            "current_price": "current_price",
+            "bid_count": "bid_count",
+            "image_url": "image_url",
+            "category": "category__category_name",
+            "seller": "seller__username",
+            "is_active": "is_active",
+            "end_time": "end_time",
+        },
+    ),
+    "bids": (
+        Bid.objects.order_by("id"),
+        {
+            "id": "id",
+            "listing_id": "listing_id",
+            "bidder": "bidder__username",
+            "bid_amount": "bid_amount",
+            "created_at": "created_at",
+        },
+    ),
+}
+
+
+class RowError(ValueError):
+    pass
+
+
+def open_text(path, mode):
+    """Open ``path`` as text, gunzipping ``.gz`` files; ``-`` is stdin/stdout."""
+    if path == "-":
+        stream = sys.stdin if mode == "r" else sys.stdout
+        return open(stream.fileno(), mode, encoding="utf-8", newline="", closefd=False)
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8", newline="")
+    return open(path, mode, encoding="utf-8", newline="")
+
+
+def file_format(path, default="csv"):
+    name = path[:-3] if path.endswith(".gz") else path
+    if name.endswith(".jsonl") or name.endswith(".ndjson"):
+        return "jsonl"
+    if name.endswith(".csv"):
+        return "csv"
+    return default
+
+
+def read_rows(stream, fmt):
+    """Yield ``(line number, dict)`` for every record in the stream."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for number, line in enumerate(stream, 1):
+            if line.strip():
+                try:
+                    row = json.loads(line)
+                except ValueError as error:
+                    yield number, RowError(f"invalid JSON: {error}")
+                    continue
+                yield number, row if isinstance(row, dict) else RowError("expected a JSON object")
+
+
+def _text(row, name):
+    # CSV fields are always strings; JSON ones can be anything
+    value = row.get(name)
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        raise RowError(f"{name} must be a string")
+    return value.strip()
+
+
+def listing_from_row(row, seller, now):
+    """Validate one import row the way ``create_listing`` validates the form."""
+    if isinstance(row, RowError):
+        raise row
+    title = _text(row, "title")
+    description = _text(row, "description")
+    category = _text(row, "category")
+    if not title or not description or not category:
+        raise RowError("title, description and category are required")
+    if len(title) > 64 or len(description) > 100 or len(category) > 100:
+        raise RowError("title, description or category is too long")
+
+    starting_bid = row.get("starting_bid")
+    # JSON numbers are fine as well as strings; true, lists and objects are not
+    if isinstance(starting_bid, (bool, list, dict)):
+        raise RowError("starting_bid must be a valid number")
+    try:
+        starting_bid = Decimal(str(starting_bid or ""))
+    except InvalidOperation:
+        raise RowError("starting_bid must be a valid number")
+    if not starting_bid.is_finite() or starting_bid <= 0 or starting_bid.as_tuple().exponent < -2:
+        raise RowError("starting_bid must be a positive amount")
+    if starting_bid >= bidding.amount_limit(AuctionListing, "starting_bid"):
+        raise RowError("starting_bid is too large")
+
+    end_time = _text(row, "end_time") or None
+    if end_time is not None:
+        try:
+            end_time = parse_datetime(end_time)
+        except ValueError:  # Well formed but out of range, like month 13
+            end_time = None
+        if end_time is not None and timezone.is_naive(end_time):
+            end_time = timezone.make_aware(end_time)
+        if end_time is None or end_time <= now:
+            raise RowError("end_time must be a date and time in the future")
+
+    listing = AuctionListing(
+        title=title,
+        description=description,
+        starting_bid=starting_bid,
+        image_url=_text(row, "image_url"),
+        seller=seller,
+        end_time=end_time,
+    )
+    return listing, category
+
+
+def import_listings(stream, fmt, seller, batch_size=1000, on_error=None):
+    """Create listings for ``seller`` from a stream of rows.
+
+    Invalid rows are skipped and passed to ``on_error(line, message)``.
+    Returns ``(imported, skipped)``.
+    """
+    categories = dict(Category.objects.values_list("category_name", "id"))
+    now = timezone.now()
+    imported = skipped = 0
+
+    rows = read_rows(stream, fmt)
+    while batch := list(itertools.islice(rows, batch_size)):
+        listings = []
+        for line, row in batch:
+            try:
+                listings.append(listing_from_row(row, seller, now))
+            except RowError as error:
+                skipped += 1
+                if on_error is not None:
+                    on_error(line, str(error))
+
+        with transaction.atomic():
+            missing = {name for _, name in listings if name not in categories}
+            if missing:
+                Category.objects.bulk_create([Category(category_name=name) for name in sorted(missing)])
+                categories.update(Category.objects.filter(category_name__in=missing).values_list("category_name", "id"))
+            for listing, name in listings:
+                listing.category_id = categories[name]
+            created = AuctionListing.objects.bulk_create([listing for listing, _ in listings])
+            # bulk_create skips the signal that queues images for thumbnailing
+            ListingImage.objects.bulk_create(
+                ListingImage(listing=listing, source_url=listing.image_url) for listing in created if listing.image_url
+            )
+        imported += len(listings)
+
+    # bulk_create skips the signals that keep the directory counters current
+    if imported:
+        directory.invalidate_directory()
+    return imported, skipped
+
+
+def export_rows(kind, chunk_size=2000):
+    """Yield every row of ``kind`` ("listings" or "bids") as a dict, oldest first."""
+    queryset, columns = EXPORTS[kind]
+    for values in queryset.values_list(*columns.values()).iterator(chunk_size=chunk_size):
+        yield dict(zip(columns, values))
+
+
+def write_rows(stream, fmt, kind, rows):
+    """Write rows of ``kind`` to the stream; returns how many were written."""
+    written = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(stream, fieldnames=list(EXPORTS[kind][1]))
+        writer.writeheader()
+        for written, row in enumerate(rows, 1):
+            writer.writerow(row)
+    else:
+        for written, row in enumerate(rows, 1):
+            stream.write(json.dumps(row, default=str) + "\n")
+    return written
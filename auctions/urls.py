@@ -1,20 +1,36 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 urlpatterns = [
     path("", views.index, name="index"),
+    path("listings.json", views.listings_feed, name="listings_feed"),
     path("login", views.login_view, name="login"),
     path("logout", views.logout_view, name="logout"),
     path("register", views.register, name="register"),
     path("create", views.create_listing, name="create_listing"),
     path("listing/<int:listing_id>/", views.listing, name="listing"),
+    path("listing/<int:listing_id>/events", views.listing_events, name="listing_events"),
     path("listing/<int:listing_id>/place_bid", views.place_bid, name="place_bid"),
     path("listing/<int:listing_id>/close", views.close_listing, name="close_listing"),
     path("listing/<int:listing_id>/comments", views.comments, name="comments"),
+    path("listing/<int:listing_id>/comments.json", views.comments_feed, name="comments_feed"),
     path("remove_watchlist/<int:listing_id>", views.remove_watchlist, name="removeWatchlist"),
     path("add_to_watchlist/<int:listing_id>", views.add_to_watchlist, name="addWatchlist"),
     path("watchlist", views.display_watchlist, name="watchlist"),
+    path("my-bids", views.my_bids, name="my_bids"),
      path("categories", views.categories, name="categories"), 
     path("categories/<int:category_id>/", views.category_listings, name="category_listings"),
+    path("search", views.search_view, name="search"),
+    path("search.json", views.search_feed, name="search_feed"),
+    path("cache/stats", views.cache_stats, name="cache_stats"),
+    path("profiling/slowest", views.slowest_requests_view, name="slowest_requests"),
+    path("api/listings", api.listings, name="api_listings"),
+    path("api/listings/<int:listing_id>", api.listing, name="api_listing"),
+    path("api/listings/<int:listing_id>/bids", api.listing_bids, name="api_listing_bids"),
+    path("api/listings/<int:listing_id>/history", api.listing_history, name="api_listing_history"),
+    path("api/listings/<int:listing_id>/comments", api.listing_comments, name="api_listing_comments"),
+    path("api/categories", api.categories, name="api_categories"),
+    path("api/watchlist", api.watchlist, name="api_watchlist"),
+    path("api/watchlist/<int:listing_id>", api.watchlist_item, name="api_watchlist_item"),
 ]
\ No newline at end of file
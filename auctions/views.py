@@ -1,18 +1,90 @@
+import asyncio
+import hashlib
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth import authenticate, login, logout
 from django.db import IntegrityError
 from django.contrib import messages
-from django.http import HttpResponse, HttpResponseRedirect
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.handlers.asgi import ASGIRequest
+from django.middleware.csrf import get_token
+from django.http import Http404, HttpResponse, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import SimpleLazyObject
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import require_POST
 from decimal import Decimal, InvalidOperation
 
+from . import bidding, browse, caching, closing, directory, events, images, search, watchlists
+from .profiling import slowest_requests
+from .ratelimit import rate_limit
 from .models import User, AuctionListing, Bid, Comments, Category
+from .pagination import aordered_page, atimeline_page, ordered_page, parse_cursor, timeline_page
+
+LISTINGS_PER_PAGE = 24
+COMMENTS_PER_PAGE = 20
+EVENT_KEEPALIVE_SECONDS = 15
+
+
+async def resolve_user(request):
+    # Async views load the user up front so rendering the page never has to
+    # query the database from the event loop
+    request.user = await request.auser()
+    return request.user
+
+
+async def browse_context(request, params):
+    # One page of listings in the chosen order, plus the facet counts
+    listings, next_cursor = await aordered_page(
+        browse.listings(params, parse_cursor(request.GET.get("before"))).select_related("image"),
+        limit=LISTINGS_PER_PAGE,
+    )
+    return {
+        "listings": listings,
+        "next_cursor": next_cursor,
+        "next_query": browse.query_string(params, before=next_cursor),
+        "params": params,
+        # For the category links, which put the category in the URL instead
+        "filter_query": browse.query_string({**params, "category_id": None}),
+        "facets": await browse.afacet_counts(params),
+        "sorts": {name: label for name, (label, _, _) in browse.SORTS.items()},
+        "statuses": {name: label for name, (label, _) in browse.STATUSES.items()},
+        "watched": await watchlists.awatched_ids(request.user),
+    }
 
 
-def index(request):
-    listings = AuctionListing.objects.all()
-    return render(request, "auctions/index.html", {
-        "listings": listings
+async def index(request):
+    await resolve_user(request)
+    # Only one page of listings is loaded; the next ones come from the feed
+    params = browse.browse_params(request.GET)
+    return render(request, "auctions/index.html", await browse_context(request, params))
+
+
+def listings_feed(request):
+    # JSON variant of the index page so infinite scroll fetches one page at a time
+    params = browse.browse_params(request.GET)
+    rows, next_cursor = ordered_page(
+        browse.listings(params, parse_cursor(request.GET.get("before"))).values(
+            "id", "title", "description", "starting_bid", "current_price", "image_url",
+            "image__status", "image__thumbnails",
+        ),
+        limit=LISTINGS_PER_PAGE,
+    )
+    watched = watchlists.watched_ids(request.user)
+    for row in rows:
+        row["url"] = reverse("listing", args=(row["id"],))
+        row["watched"] = row["id"] in watched
+        row["image"] = images.image_sources(row.pop("image_url"), row.pop("image__status"),
+                                            row.pop("image__thumbnails"))
+    return JsonResponse({
+        "listings": rows,
+        "next": f"{reverse('listings_feed')}?{browse.query_string(params, before=next_cursor)}" if next_cursor else None
     })
 
 
@@ -75,22 +147,22 @@ from django.contrib import messages
 from .models import AuctionListing, Category
 
 def create_listing(request):
+    # The dropdown and every error branch share the cached category directory
+    categories = directory.category_directory()
+
     if request.method == "GET":
-        # Fetch all categories to display in the dropdown
-        categories = Category.objects.all()
         return render(request, "auctions/create_listing.html", {"categories": categories})
 
     if request.method == "POST":
         title = request.POST.get("title")
         description = request.POST.get("description")
         starting_bid = request.POST.get("starting_bid")
-        image_url = request.POST.get("image_url")
+        image_url = request.POST.get("image_url", "")
         category_name = request.POST.get("category_name")  # For existing category
         new_category_name = request.POST.get("new_category_name")  # For new category
 
         # Check for missing required fields
         if not title or not description or not starting_bid:
-            categories = Category.objects.all()
             messages.error(request, "All fields must be completed.")
             return render(request, "auctions/create_listing.html", {"categories": categories})
         
@@ -98,31 +170,42 @@ def create_listing(request):
         try:
             bid_value = Decimal(starting_bid)
         except InvalidOperation:
-            categories = Category.objects.all()
             messages.error(request, "Starting bid must be a valid number.")
             return render(request, "auctions/create_listing.html", {"categories": categories})
 
-        if bid_value <= 0:
-            categories = Category.objects.all()
+        if not bid_value.is_finite() or bid_value <= 0:
             messages.error(request, "Starting bid must be a positive number.")
             return render(request, "auctions/create_listing.html", {"categories": categories})
+
+        if bid_value >= bidding.amount_limit(AuctionListing, "starting_bid"):
+            messages.error(request, "Starting bid is too large.")
+            return render(request, "auctions/create_listing.html", {"categories": categories})
         
+        # Validate the optional end time, which must be in the future
+        end_time = None
+        if request.POST.get("end_time"):
+            end_time = parse_datetime(request.POST["end_time"])
+            if end_time is not None and timezone.is_naive(end_time):
+                end_time = timezone.make_aware(end_time)
+            if end_time is None or end_time <= timezone.now():
+                messages.error(request, "End time must be a date and time in the future.")
+                return render(request, "auctions/create_listing.html", {"categories": categories})
+
         currentUser = request.user
 
         # Determine the category to use or create a new one
         if new_category_name:
             # Create a new category if a new name is provided
             category_instance, created = Category.objects.get_or_create(category_name=new_category_name)
+            category_id = category_instance.id
         elif category_name:
             # Use the existing category if selected
-            try:
-                category_instance = Category.objects.get(category_name=category_name)
-            except Category.DoesNotExist:
-                categories = Category.objects.all()
+            category = directory.find_category(category_name=category_name)
+            if category is None:
                 messages.error(request, "Selected category does not exist.")
                 return render(request, "auctions/create_listing.html", {"categories": categories})
+            category_id = category["id"]
         else:
-            categories = Category.objects.all()
             messages.error(request, "Please select an existing category or enter a new one.")
             return render(request, "auctions/create_listing.html", {"categories": categories})
 
@@ -132,8 +215,9 @@ def create_listing(request):
             description=description,
             starting_bid=bid_value,
             image_url=image_url,
-            category=category_instance,
-            seller=currentUser
+            category_id=category_id,
+            seller=currentUser,
+            end_time=end_time
         )
 
         listing.save()
@@ -144,62 +228,168 @@ def create_listing(request):
     
    
 
-def listing(request, listing_id):
-    listing = get_object_or_404(AuctionListing, pk=listing_id)
-    is_seller = request.user == listing.seller 
-    in_watchlist = request.user in listing.watchlist.all()
-    comments = listing.comments.all()  
+class CommentPage(list):
+    """The newest page of a listing's comments, oldest first, plus the cursor
+    for the page before it (None if there is none)."""
+
+    def __init__(self, rows, older_cursor):
+        super().__init__(reversed(rows))
+        self.older_cursor = older_cursor
+
+
+def listing_comments(listing_id):
+    return Comments.objects.filter(listing_id=listing_id).select_related("author")
 
+
+def live_events(request):
+    # Each open event stream holds a WSGI worker for as long as the listing
+    # is open, so the stream is only offered when served over ASGI
+    return settings.AUCTIONS_LIVE_EVENTS and isinstance(request, ASGIRequest)
+
+
+def listing_page(request, listing, in_watchlist, comments, cached_fragments=None):
+    user = request.user
     context = {
         "listing": listing,
-        "is_seller": is_seller,
+        "live_events": live_events(request),
+        "is_seller": user.is_authenticated and user.pk == listing.seller_id,
         "in_watchlist": in_watchlist,
-        "comments": listing.comments.all() 
+        "comments": comments,
+        "cached_fragments": cached_fragments or {}
     }
 
     if not listing.is_active:
-        highest_bid = listing.bids.order_by('-bid_amount').first()
-        final_price = highest_bid.bid_amount if highest_bid else listing.starting_bid
-        context["final_price"] = final_price
+        context["final_price"] = listing.current_price if listing.bid_count else listing.starting_bid
         context["winner"] = listing.winner
-    
-    return render(request, "auctions/listing.html", context)
-
 
+    return context
+
+
+def listing_context(request, listing):
+    # Everything listing.html needs, in a fixed number of queries however many
+    # comments, bids or watchers the listing has
+    user = request.user
+    return listing_page(
+        request,
+        listing,
+        in_watchlist=watchlists.is_watching(user, listing.id),
+        # Lazy: only loaded when the cached comments fragment has gone stale
+        comments=SimpleLazyObject(
+            lambda: CommentPage(*timeline_page(listing_comments(listing.id), limit=COMMENTS_PER_PAGE))
+        ),
+    )
+
+
+async def alisting_context(request, listing):
+    # Async listing_context(): the watchlist check and the comments run concurrently
+    user = request.user
+
+    async def watching():
+        return listing.id in await watchlists.awatched_ids(user)
+
+    async def comments():
+        fragment = await caching.aget_cached(listing.id, "comments")
+        if fragment is not None:
+            return {"comments": fragment}, []
+        return {}, CommentPage(*await atimeline_page(listing_comments(listing.id), limit=COMMENTS_PER_PAGE))
+
+    in_watchlist, (fragments, comment_list) = await asyncio.gather(watching(), comments())
+    return listing_page(request, listing, in_watchlist, comment_list, fragments)
+
+
+def listing_etag(request, listing_id, version):
+    # The page shows per-user state and embeds a CSRF token, so the tag covers
+    # the user and the CSRF secret as well as the listing's version stamp
+    get_token(request)
+    viewer = f"{request.user.pk}:{request.META['CSRF_COOKIE']}"
+    digest = hashlib.md5(viewer.encode(), usedforsecurity=False).hexdigest()[:12]
+    return f'W/"{listing_id}-{version}-{digest}"'
+
+
+# Pages are per user and always revalidated; unchanged ones come back as 304s
+@cache_control(private=True, no_cache=True)
+async def listing(request, listing_id):
+    await resolve_user(request)
+
+    # Pending messages are part of the page, so it can't be revalidated then
+    etag = None
+    if not len(messages.get_messages(request)):
+        etag = listing_etag(request, listing_id, await caching.alisting_version(listing_id))
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            not_modified["ETag"] = etag
+            return not_modified
+
+    async def load():
+        try:
+            return await AuctionListing.objects.select_related("winner", "image").aget(pk=listing_id)
+        except AuctionListing.DoesNotExist:
+            raise Http404("No such listing.")
 
-def place_bid(request, listing_id):
-    if request.method == "POST":
-        listing = get_object_or_404(AuctionListing, pk=listing_id)
-        bid_amount = request.POST.get("bid")
+    listing = await caching.acached(listing_id, "listing", load)
+    response = render(request, "auctions/listing.html", await alisting_context(request, listing))
+    if etag is not None:
+        response["ETag"] = etag
+    return response
 
-        if not bid_amount:
-            messages.error(request, "Please enter a bid amount.")
-            return render(request, "auctions/listing.html", {"listing": listing})
 
-        try:
-            bid_amount = Decimal(bid_amount)
-        except InvalidOperation:
-            messages.error(request, "Enter a valid number.")
-            return render(request, "auctions/listing.html", {"listing": listing})
+def server_sent_event(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
 
-        
-        minimum_valid_bid = listing.current_price if listing.current_price else listing.starting_bid
 
-        if bid_amount <= minimum_valid_bid:
-            messages.error(request, "Bid must be higher than the current price.")
-            return render(request, "auctions/listing.html", {"listing": listing})
+async def listing_events(request, listing_id):
+    # A Server-Sent Events stream of new bids and the closing of one listing.
+    # Needs an ASGI server: under WSGI the response would never be sent and
+    # each stream would hold a worker, so answer 204, which stops EventSource
+    # from reconnecting.
+    if not live_events(request):
+        return HttpResponse(status=204)
+    if not await AuctionListing.objects.filter(pk=listing_id).aexists():
+        raise Http404("No such listing.")
 
-        
-        bid = Bid(
-            bid_amount=bid_amount,
-            listing=listing,
-            bidder=request.user
-        )
-
-        bid.save()
+    async def stream():
+        subscription = events.get_broker().subscribe(events.listing_channel(listing_id))
+        try:
+            # Subscribed first, so nothing that happens after the snapshot is missed
+            listing = await AuctionListing.objects.select_related("winner").aget(pk=listing_id)
+            yield server_sent_event({
+                "type": "snapshot" if listing.is_active else "closed",
+                "price": str(listing.current_price or listing.starting_bid),
+                "bid_count": listing.bid_count,
+                "winner": listing.winner.username if listing.winner else None,
+            })
+            if not listing.is_active:
+                return
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), EVENT_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment lines keep proxies from closing an idle stream
+                    yield ": keep-alive\n\n"
+                    continue
+                yield server_sent_event(event)
+                if event["type"] == "closed":
+                    return
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@rate_limit("bids")
+def place_bid(request, listing_id):
+    if request.method == "POST":
+        listing = get_object_or_404(AuctionListing.objects.select_related("winner"), pk=listing_id)
 
-        listing.current_price = bid_amount
-        listing.save()
+        try:
+            bid_amount = bidding.parse_bid_amount(request.POST.get("bid"))
+            bidding.place_bid(listing.id, request.user, bid_amount)
+        except bidding.BidError as error:
+            messages.error(request, str(error))
+            return render(request, "auctions/listing.html", listing_context(request, listing))
 
         messages.success(request, "Your bid was sucessfully placed.")
         return redirect("listing", listing_id=listing.id)
@@ -208,39 +398,25 @@ def place_bid(request, listing_id):
 def close_listing(request, listing_id):
     listing = get_object_or_404(AuctionListing, pk=listing_id)
 
-    is_seller = request.user == listing.seller
-
-    if is_seller:
-        listing.is_active = False
-        listing.save()
-
-        highest_bid = listing.bids.order_by('-bid_amount').first()
-        if highest_bid:
-            listing.winner = highest_bid.bidder
-            listing.save()
-            final_price = highest_bid.bid_amount
-        else:
-            final_price = listing.starting_bid
-
-        messages.success(request, "The listing has been closed successfully.")
-        return render(request, "auctions/listing.html", {
-                "listing": listing,
-                "is_seller": is_seller,
-                "final_price": final_price,
-                "winner": listing.winner
-            })
+    if request.user.is_authenticated and request.user.pk == listing.seller_id:
+        closed = closing.close_listings(AuctionListing.objects.filter(pk=listing.pk, is_active=True))
+        if closed:
+            listing = closed[0]
+            messages.success(request, "The listing has been closed successfully.")
+        return render(request, "auctions/listing.html", listing_context(request, listing))
 
     return redirect("listing", listing_id=listing_id)
 
 
+@rate_limit("comments")
 def comments(request, listing_id):
     if request.method == "POST":
-        listing = get_object_or_404(AuctionListing, pk=listing_id)
+        listing = get_object_or_404(AuctionListing.objects.select_related("winner"), pk=listing_id)
         
         message = request.POST.get("newComment")
         if not message:
             messages.error(request, "Please enter comment")
-            return render(request, "auctions/listing.html", {"listing": listing, "comments": listing.comments.all(), "is_seller": request.user == listing.seller})
+            return render(request, "auctions/listing.html", listing_context(request, listing))
         
         currentUser = request.user
 
@@ -254,14 +430,56 @@ def comments(request, listing_id):
 
         messages.success(request, "Message sucessfully posted")
         return redirect("listing", listing_id=listing.id)
+
+
+def comments_feed(request, listing_id):
+    # Older pages of a listing's comments, newest first, for "Show older comments"
+    rows, next_cursor = timeline_page(
+        Comments.objects.filter(listing_id=listing_id).values("id", "message", "author__username", "created_at"),
+        before=parse_cursor(request.GET.get("before")),
+        limit=COMMENTS_PER_PAGE,
+    )
+    return JsonResponse({
+        "comments": [
+            {"id": row["id"], "message": row["message"], "author": row["author__username"],
+             "created_at": row["created_at"]}
+            for row in rows
+        ],
+        "next": f"{reverse('comments_feed', args=(listing_id,))}?before={next_cursor}" if next_cursor else None
+    })
     
-def display_watchlist(request):
-    current_user = request.user
-    listings = current_user.listing_watchlist.all()
+async def display_watchlist(request):
+    current_user = await resolve_user(request)
+    if not current_user.is_authenticated:
+        return redirect("login")
+    # The cached watchlist spares the join against the watchlist table
+    ids = await watchlists.awatched_ids(current_user)
+    listings = [
+        listing async for listing in
+        AuctionListing.objects.filter(pk__in=ids).select_related("image").order_by("-id")
+    ] if ids else []
     return render(request, "auctions/watchlist.html", {
         "listings": listings
     })
 
+async def my_bids(request):
+    current_user = await resolve_user(request)
+    if not current_user.is_authenticated:
+        return redirect("login")
+
+    # One query on the maintained bid states, split into the dashboard sections
+    sections = {"winning": [], "outbid": [], "won": [], "lost": []}
+    async for state in current_user.bid_states.select_related("listing").order_by("-listing_id"):
+        if state.listing.is_active:
+            sections["winning" if state.is_leading else "outbid"].append(state)
+        else:
+            sections["won" if state.is_leading else "lost"].append(state)
+    return render(request, "auctions/my_bids.html", sections)
+
+
+# POST only, or a GET would change the watchlist past the rate limit
+@require_POST
+@rate_limit("watchlist")
 def remove_watchlist(request, listing_id):
     listing = get_object_or_404(AuctionListing, pk=listing_id)
     current_user = request.user
@@ -269,6 +487,8 @@ def remove_watchlist(request, listing_id):
     return HttpResponseRedirect(reverse("listing", args=(listing_id,)))
 
 
+@require_POST
+@rate_limit("watchlist")
 def add_to_watchlist(request, listing_id):
     listing = get_object_or_404(AuctionListing, pk=listing_id)
     current_user = request.user
@@ -276,19 +496,86 @@ def add_to_watchlist(request, listing_id):
     return HttpResponseRedirect(reverse("listing", args=(listing_id, )))
 
 
-def categories(request):
-    # Fetch all categories from the database
-    all_categories = Category.objects.all()
+# ConditionalGetMiddleware tags these pages by content
+@cache_control(private=True, no_cache=True)
+async def categories(request):
+    await resolve_user(request)
+    # Categories and their active listing counts come from the cached directory
+    all_categories = await sync_to_async(directory.category_directory)()
     return render(request, "auctions/categories.html", {"categories": all_categories})
 
-def category_listings(request, category_id):
-    # Fetch the category by ID
-    category = get_object_or_404(Category, pk=category_id)
-    
-    # Get all active listings under this category
-    active_listings = AuctionListing.objects.filter(category=category, is_active=True)
-    
+@cache_control(private=True, no_cache=True)
+async def category_listings(request, category_id):
+    await resolve_user(request)
+    # Look the category up in the cached directory rather than the database
+    category = await sync_to_async(directory.find_category)(category_id=category_id)
+    if category is None:
+        raise Http404("No such category.")
+
+    params = browse.browse_params(request.GET, category_id=category_id)
     return render(request, "auctions/category_listings.html", {
         "category": category,
-        "listings": active_listings
-    })
\ No newline at end of file
+        **await browse_context(request, params),
+    })
+
+
+def search_params(request):
+    # Shared by the HTML and JSON search endpoints
+    try:
+        page = min(max(int(request.GET.get("page", 1)), 1), search.MAX_PAGE)
+    except ValueError:
+        page = 1
+    return {
+        "query": request.GET.get("q", "").strip(),
+        "category_id": parse_cursor(request.GET.get("category")),
+        "active_only": request.GET.get("status") != "all",
+        "page": page,
+    }
+
+
+def search_view(request):
+    params = search_params(request)
+    listings, has_next = search.search_listings(
+        params["query"], params["category_id"], params["active_only"], params["page"]
+    )
+    return render(request, "auctions/search.html", {
+        **params,
+        "listings": listings,
+        "has_next": has_next,
+        "categories": directory.category_directory(),
+        "watched": watchlists.watched_among(request.user, [listing.id for listing in listings]),
+    })
+
+
+def search_feed(request):
+    params = search_params(request)
+    listings, has_next = search.search_listings(
+        params["query"], params["category_id"], params["active_only"], params["page"]
+    )
+    return JsonResponse({
+        "listings": [
+            {
+                "id": listing.id,
+                "title": listing.title,
+                "description": listing.description,
+                "current_price": listing.current_price,
+                "is_active": listing.is_active,
+                "url": reverse("listing", args=(listing.id,)),
+            }
+            for listing in listings
+        ],
+        "page": params["page"],
+        "has_next": has_next
+    })
+
+
+@staff_member_required
+def cache_stats(request):
+    # Hit/miss counters of the listing cache, for tuning its timeout and size
+    return JsonResponse(caching.cache_stats())
+
+
+@staff_member_required
+def slowest_requests_view(request):
+    # The slowest requests this process has served while profiling was on
+    return JsonResponse({"requests": slowest_requests.records()})
@@ -0,0 +1,106 @@
+"""Cached per-user watchlists and per-listing watcher counts.
+
+Each user's watchlist is cached as a set of listing ids, so "is this listing
+watched?" is a set lookup and list pages can mark every card they show with
+one cache read instead of querying the join table per listing. The sets are
+written through: ``auctions.signals`` applies every add and remove to the
+cached set once the change commits, whether it came from the site, the API or
+the admin, and a set missing from the cache is rebuilt with one query.
+
+``AuctionListing.watcher_count`` is kept current by the same signal handler,
+so pages can show how many people watch a listing without counting them.
+"""
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import AuctionListing
+
+Watch = AuctionListing.watchlist.through
+
+
+def _key(user_id):
+    return f"auctions:watchlist:{user_id}"
+
+
+def _timeout():
+    return getattr(settings, "AUCTIONS_CACHE_TIMEOUT", 600)
+
+
+def _load(user_id):
+    ids = frozenset(Watch.objects.filter(user_id=user_id).values_list("auctionlisting_id", flat=True))
+    cache.set(_key(user_id), ids, _timeout())
+    return ids
+
+
+def watched_ids(user):
+    """The ids of every listing ``user`` watches; empty for anonymous users."""
+    if not user.is_authenticated:
+        return frozenset()
+    ids = cache.get(_key(user.pk))
+    return _load(user.pk) if ids is None else ids
+
+
+async def awatched_ids(user):
+    if not user.is_authenticated:
+        return frozenset()
+    ids = await cache.aget(_key(user.pk))
+    return await sync_to_async(_load)(user.pk) if ids is None else ids
+
+
+def is_watching(user, listing_id):
+    return listing_id in watched_ids(user)
+
+
+def watched_among(user, listing_ids):
+    """Which of ``listing_ids`` the user watches, from a single cache read."""
+    return watched_ids(user).intersection(listing_ids)
+
+
+def apply_changes(user_ids, listing_ids, added):
+    """Write an add or remove through to the cached sets once it commits.
+
+    Sets that are not cached are left alone; the next read loads them.
+    """
+    def write():
+        keys = [_key(user_id) for user_id in user_ids]
+        updated = {
+            key: ids.union(listing_ids) if added else ids.difference(listing_ids)
+            for key, ids in cache.get_many(keys).items()
+        }
+        if updated:
+            cache.set_many(updated, _timeout())
+
+    transaction.on_commit(write)
+
+
+def forget(user_ids):
+    """Drop cached sets, e.g. when a whole watchlist is cleared."""
+    keys = [_key(user_id) for user_id in user_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def recount_watchers(listing_ids):
+    """Set ``watcher_count`` of the listings from the join table.
+
+    Used after removals, where the signal's ``pk_set`` may name rows that were
+    never there; additions only report new rows and use ``adjust_watchers``.
+    """
+    AuctionListing.objects.filter(pk__in=listing_ids).update(
+        watcher_count=Coalesce(Subquery(
+            Watch.objects.filter(auctionlisting_id=OuterRef("pk")).values("auctionlisting_id")
+            .annotate(watchers=Count("id")).values("watchers")
+        ), 0),
+        updated_at=timezone.now(),
+    )
+
+
+def adjust_watchers(listing_ids, delta):
+    AuctionListing.objects.filter(pk__in=listing_ids).update(
+        watcher_count=F("watcher_count") + delta, updated_at=timezone.now()
+    )
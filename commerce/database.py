@@ -0,0 +1,91 @@
+"""Database configuration, driven by the environment.
+
+SQLite (the default) is tuned for a site that takes concurrent bids:
+
+* ``journal_mode=WAL`` lets readers carry on while a bid is being written,
+  instead of every write locking the whole file;
+* ``busy_timeout`` makes a writer wait for the lock rather than fail at once
+  with "database is locked";
+* ``synchronous=NORMAL`` is safe with WAL and skips an fsync per commit;
+* ``mmap_size`` serves reads from memory-mapped pages.
+
+The PRAGMAs are applied to every new connection by ``configure_connection``,
+which ``AuctionsConfig.ready`` connects to ``connection_created``, and
+connections are kept open for ``DATABASE_CONN_MAX_AGE`` seconds so that
+requests do not reopen the file.
+
+Switching to PostgreSQL::
+
+    DATABASE_ENGINE=postgresql
+    DATABASE_NAME=commerce DATABASE_USER=commerce DATABASE_PASSWORD=...
+    DATABASE_HOST=localhost DATABASE_PORT=5432
+
+needs ``psycopg`` (or ``psycopg2``) installed. Django keeps one persistent
+connection per worker thread; to share a smaller pool between many workers
+put PgBouncer in front of the database in transaction pooling mode, point
+DATABASE_HOST/DATABASE_PORT at it and set ``DATABASE_PGBOUNCER=1``, which
+turns off server-side cursors (they do not survive transaction pooling).
+
+Under ASGI each request runs its queries on a thread of its own, so
+persistent connections are not reused there: set ``DATABASE_CONN_MAX_AGE=0``
+when serving through ``commerce.asgi`` and pool with PgBouncer instead.
+"""
+
+import os
+
+from django.conf import settings
+
+PRAGMA_VARIABLES = {
+    # Applied in this order; busy_timeout first so the switch to WAL waits for locks
+    "busy_timeout": ("SQLITE_BUSY_TIMEOUT", "5000"),
+    "journal_mode": ("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": ("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": ("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)),
+}
+
+
+def database_config(environ, base_dir):
+    """The ``default`` entry of ``DATABASES`` for the given environment."""
+    engine = environ.get("DATABASE_ENGINE", "sqlite")
+    config = {
+        "CONN_MAX_AGE": int(environ.get("DATABASE_CONN_MAX_AGE", 60)),
+        # A persistent connection is checked before reuse, so a dropped one is replaced
+        "CONN_HEALTH_CHECKS": True,
+    }
+
+    if engine == "sqlite":
+        config.update({
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": environ.get("DATABASE_NAME", os.path.join(base_dir, "db.sqlite3")),
+            # A file rather than the default in-memory database so tests can use
+            # several connections at once (the concurrent bidding tests need this)
+            "TEST": {
+                "NAME": os.path.join(base_dir, "test_db.sqlite3"),
+            },
+        })
+    elif engine == "postgresql":
+        config.update({
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": environ.get("DATABASE_NAME", "commerce"),
+            "USER": environ.get("DATABASE_USER", ""),
+            "PASSWORD": environ.get("DATABASE_PASSWORD", ""),
+            "HOST": environ.get("DATABASE_HOST", ""),
+            "PORT": environ.get("DATABASE_PORT", ""),
+            "DISABLE_SERVER_SIDE_CURSORS": environ.get("DATABASE_PGBOUNCER", "") == "1",
+        })
+    else:
+        raise ValueError(f"Unsupported DATABASE_ENGINE {engine!r}; use 'sqlite' or 'postgresql'.")
+    return config
+
+
+def sqlite_pragmas(environ):
+    """``name -> value`` for the PRAGMAs run on every new SQLite connection."""
+    return {name: environ.get(variable, default) for name, (variable, default) in PRAGMA_VARIABLES.items()}
+
+
+def configure_connection(sender, connection, **kwargs):
+    """``connection_created`` receiver that applies ``settings.SQLITE_PRAGMAS``."""
+    if connection.vendor != "sqlite":
+        return
+    for name, value in getattr(settings, "SQLITE_PRAGMAS", {}).items():
+        connection.connection.execute(f"PRAGMA {name} = {value}")
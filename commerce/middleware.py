@@ -0,0 +1,16 @@
+"""Project-wide middleware."""
+
+from django.middleware import gzip
+
+
+class GZipMiddleware(gzip.GZipMiddleware):
+    """``GZipMiddleware`` that leaves server-sent event streams alone.
+
+    The compressor holds output back until it has a block's worth, so each
+    event would sit in its buffer instead of reaching the browser.
+    """
+
+    def process_response(self, request, response):
+        if response.get("Content-Type", "").startswith("text/event-stream"):
+            return response
+        return super().process_response(request, response)
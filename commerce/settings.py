@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/3.0/ref/settings/
 import os
 from django.contrib.messages import constants as messages
 
+from commerce.database import database_config, sqlite_pragmas
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -24,9 +26,9 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SECRET_KEY = '6ps8j!crjgrxt34cqbqn7x&b3y%(fny8k8nh21+qa)%ws3fh!q'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get('DJANGO_DEBUG', '1') == '1'
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [host for host in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',') if host]
 
 
 # Application definition
@@ -51,8 +53,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover every other middleware; inactive unless
+    # AUCTIONS_PROFILING is set
+    'auctions.profiling.RequestProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Compresses whatever the middleware below produces, except event streams
+    'commerce.middleware.GZipMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    # Tags responses that have no ETag with a content hash and answers
+    # If-None-Match/If-Modified-Since with 304s
+    'django.middleware.http.ConditionalGetMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -84,14 +94,95 @@ WSGI_APPLICATION = 'commerce.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.0/ref/settings/#databases
 
+# SQLite with WAL and persistent connections by default; see commerce/database.py
+# for the environment variables, the PRAGMAs and switching to PostgreSQL.
+
 DATABASES = {
+    'default': database_config(os.environ, BASE_DIR),
+}
+
+SQLITE_PRAGMAS = sqlite_pragmas(os.environ)
+
+AUTH_USER_MODEL = 'auctions.User'
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+# Local memory by default (and in tests); point CACHE_BACKEND/CACHE_LOCATION at
+# any Django cache backend, e.g. memcached or redis, in production.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'auctions'),
     }
 }
 
-AUTH_USER_MODEL = 'auctions.User'
+# Seconds a cached listing or listing fragment is kept before it is rebuilt
+AUCTIONS_CACHE_TIMEOUT = int(os.environ.get('AUCTIONS_CACHE_TIMEOUT', 600))
+
+# Seconds the browse pages' facet counts are cached; they may lag this far behind
+AUCTIONS_FACET_TIMEOUT = int(os.environ.get('AUCTIONS_FACET_TIMEOUT', 60))
+
+# Seconds before the category directory and its active-listing counters are
+# recounted, correcting any drift in the counters
+AUCTIONS_DIRECTORY_TIMEOUT = int(os.environ.get('AUCTIONS_DIRECTORY_TIMEOUT', 3600))
+
+# Live listing events
+# Served as Server-Sent Events from /listing/<id>/events, which needs an ASGI
+# server (commerce.asgi); under WSGI (runserver) listing pages don't open the
+# stream and the endpoint answers 204. AUCTIONS_LIVE_EVENTS=0 turns it off
+# under ASGI too. The in-process broker only reaches streams held by the same
+# process; with several workers use auctions.events.RedisBroker and point
+# AUCTIONS_EVENT_REDIS_URL at any Redis-compatible server.
+
+AUCTIONS_LIVE_EVENTS = os.environ.get('AUCTIONS_LIVE_EVENTS', '1') == '1'
+
+AUCTIONS_EVENT_BROKER = os.environ.get('AUCTIONS_EVENT_BROKER', 'auctions.events.InProcessBroker')
+AUCTIONS_EVENT_REDIS_URL = os.environ.get('AUCTIONS_EVENT_REDIS_URL', 'redis://localhost:6379/0')
+
+
+# Email
+# Notifications are queued in the database and sent by `manage.py
+# send_notifications`; they are printed to the console unless EMAIL_BACKEND
+# points at a real backend (configure EMAIL_HOST etc. for SMTP).
+
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'localhost')
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'auctions@localhost')
+
+
+# Request profiling
+# Set AUCTIONS_PROFILING=1 to time every request and count its SQL queries.
+# Results go to Server-Timing headers, to AUCTIONS_PROFILING_LOG as JSON lines
+# (summarise them with `manage.py profile_report`) and, for the slowest
+# AUCTIONS_PROFILING_SLOWEST requests, to the staff-only profiling/slowest page.
+
+AUCTIONS_PROFILING = os.environ.get('AUCTIONS_PROFILING', '') == '1'
+AUCTIONS_PROFILING_LOG = os.environ.get('AUCTIONS_PROFILING_LOG', os.path.join(BASE_DIR, 'profiling.log'))
+AUCTIONS_PROFILING_SLOWEST = int(os.environ.get('AUCTIONS_PROFILING_SLOWEST', 50))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'profiling': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': AUCTIONS_PROFILING_LOG,
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 3,
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'auctions.profiling': {
+            'handlers': ['profiling'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
@@ -130,5 +221,69 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/3.0/howto/static-files/
 
 STATIC_URL = '/static/'
+STATIC_ROOT = os.environ.get('STATIC_ROOT', os.path.join(BASE_DIR, 'staticfiles'))
+
+# Outside DEBUG, `manage.py collectstatic` writes content-hashed copies of the
+# static files (styles.abc123.css) and {% static %} links to them. A hashed
+# name changes whenever the file does, so it can be cached as immutable for a
+# year; anything else under STATIC_URL must be revalidated. In production the
+# web server or CDN serves STATIC_ROOT and should send those headers; while
+# DEBUG is on, commerce.staticfiles serves it with them.
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+            else 'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'
+        ),
+    },
+}
+
+# Soft close
+# A bid placed less than AUCTIONS_SOFT_CLOSE_SECONDS before an auction ends
+# moves the end to AUCTIONS_SOFT_CLOSE_EXTENSION seconds after the bid. 0 turns
+# it off. `manage.py close_expired_auctions --loop` closes auctions as they end.
+
+AUCTIONS_SOFT_CLOSE_SECONDS = int(os.environ.get('AUCTIONS_SOFT_CLOSE_SECONDS', 120))
+AUCTIONS_SOFT_CLOSE_EXTENSION = int(os.environ.get('AUCTIONS_SOFT_CLOSE_EXTENSION', 120))
+
+
+# Bid history
+# Each accepted bid is counted in a per-listing rollup bucket of this many
+# seconds (bids, highest price) for price charts. `manage.py compact_bids`
+# deletes old raw bids of closed listings; the rollups keep their totals.
+
+AUCTIONS_BID_BUCKET_SECONDS = 60
+
+
+# Rate limiting
+# (requests, seconds) per scope, counted separately for each signed-in user
+# and each client IP address; over the limit the site answers 429 with a
+# Retry-After header. Counters live in the cache, so every worker must share a
+# cache backend (the default local memory cache limits per process). Remove a
+# scope, or set AUCTIONS_RATE_LIMITS = {}, to turn its limit off.
+
+AUCTIONS_RATE_LIMITS = {
+    "bids": (30, 60),
+    "comments": (10, 60),
+    "watchlist": (60, 60),
+}
+
+
+# Listing image thumbnails
+# `manage.py process_images` fetches listing images and writes WebP/JPEG
+# thumbnails at each width to MEDIA_ROOT (needs Pillow). In production serve
+# MEDIA_URL from the web server or CDN; runserver serves it while DEBUG is on.
+
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.environ.get('MEDIA_ROOT', os.path.join(BASE_DIR, 'media'))
+AUCTIONS_IMAGE_FETCHER = 'auctions.images.fetch_url'
+AUCTIONS_IMAGE_WIDTHS = (320, 640, 1024)
+AUCTIONS_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+# Width times height; larger images are refused before they are decoded
+AUCTIONS_IMAGE_MAX_PIXELS = 40_000_000
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -0,0 +1,33 @@
+"""Serve collected static files in development, with long-lived caching for hashed names."""
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.utils.cache import patch_cache_control
+from django.views.static import serve
+
+ONE_YEAR = 365 * 24 * 60 * 60
+
+
+# The manifest last seen, its size and the set of its hashed names, so a lookup
+# doesn't scan the manifest; rebuilt when the storage loads or extends it
+_hashed_names = ({}, 0, frozenset())
+
+
+def is_hashed(path):
+    """Whether ``path`` is a content-hashed name from the staticfiles manifest."""
+    global _hashed_names
+    hashed_files = getattr(staticfiles_storage, "hashed_files", {})
+    manifest, size, names = _hashed_names
+    if manifest is not hashed_files or size != len(hashed_files):
+        names = frozenset(hashed_files.values())
+        _hashed_names = (hashed_files, len(hashed_files), names)
+    return path in names and path not in hashed_files
+
+
+def serve_static(request, path):
+    response = serve(request, path, document_root=settings.STATIC_ROOT)
+    if is_hashed(path):
+        patch_cache_control(response, public=True, max_age=ONE_YEAR, immutable=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
@@ -13,10 +13,22 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
+
+from commerce.staticfiles import serve_static
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("", include("auctions.urls"))
-]
\ No newline at end of file
+]
+
+# Collected static files with their cache headers, for development only: in
+# production the web server serves STATIC_ROOT (runserver uses its own handler)
+if settings.DEBUG:
+    urlpatterns.insert(1, re_path(rf"^{settings.STATIC_URL.strip('/')}/(?P<path>.+)$", serve_static))
+
+# Listing thumbnails; static() adds nothing unless DEBUG is on
+urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file